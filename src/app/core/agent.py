@@ -1,11 +1,26 @@
-from typing import Optional
+import asyncio
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
 from langchain_openai import ChatOpenAI
 from langchain_community.agent_toolkits import SQLDatabaseToolkit
 from langchain_community.utilities import SQLDatabase
 from langgraph.prebuilt import create_react_agent
-from langgraph.checkpoint.memory import MemorySaver
-from langfuse.langchain import CallbackHandler
-from langfuse import get_client
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.graph.message import REMOVE_ALL_MESSAGES
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage, RemoveMessage, SystemMessage, ToolMessage
+from app.core.checkpoint import BoundedMemorySaver
+from app.core.examples import ExampleStore, verified_query
+from app.core.history import ConversationHistory
+from app.core.optimizer import PriceOptimizer, create_price_optimization_tool
+from app.core.pricing import PricingSimulator, create_price_simulation_tool
+from app.core.router import QuestionRouter
+from app.utils.cache import LRUCache, normalize_question
+from app.utils.database import get_data_version
+from app.utils.metrics import QUESTION_SECONDS, MetricsCallbackHandler
+from app.utils.schema import SchemaSnapshot
+from app.utils.sql_validator import SQLValidator, create_query_checker_tool
+from app.utils.tracing import Tracer, get_tracer
 
 class RetailAgent:
     """A class to handle retail database interactions using a language model."""
@@ -89,6 +104,51 @@ COLUMN: unit_price - Competitor’s selling price for the product.
 COLUMN: promotion - Competitor’s promotion or offer label (e.g., "BOGO","NONE" or discount value).
 
 COLUMN: discount_pct - Discount percentage applied by the competitor, if available.
+"""
+
+    rollup_information = """
+TABLE: sku_summary - Lifetime totals per SKU, pre-aggregated from historical_data.
+
+COLUMN: sku_id, product_name, category - Identify the SKU.
+
+COLUMN: first_date, last_date, months - First and last month of sales and number of months.
+
+COLUMN: units_sold, revenue, profit - Totals over all months.
+
+#########################################################################################
+
+TABLE: sku_yearly_summary - Yearly totals per SKU, pre-aggregated from historical_data.
+
+COLUMN: sku_id, product_name, category - Identify the SKU.
+
+COLUMN: year - Calendar year (integer, e.g. 2025).
+
+COLUMN: units_sold, revenue, profit - Totals for the year.
+
+#########################################################################################
+
+TABLE: category_monthly_summary - Monthly totals per category, pre-aggregated from historical_data.
+
+COLUMN: category - Category or department.
+
+COLUMN: date - Month start (YYYY-MM-DD).
+
+COLUMN: sku_count - Number of SKUs sold in the category that month.
+
+COLUMN: units_sold, revenue, profit - Totals for the category and month.
+
+#########################################################################################
+
+TABLE: category_yearly_summary - Yearly totals per category, pre-aggregated from historical_data.
+
+COLUMN: category - Category or department.
+
+COLUMN: year - Calendar year (integer, e.g. 2025).
+
+COLUMN: units_sold, revenue, profit - Totals for the category and year.
+
+Prefer these summary tables over aggregating historical_data whenever they can answer
+the question; they hold a few rows per SKU or category instead of one per SKU and month.
 """
 
     extra_details_about_data = """
@@ -98,20 +158,92 @@ COLUMN: discount_pct - Discount percentage applied by the competitor, if availab
     4. All the price and revenue information is in INR.
     """
 
-    def __init__(self, db: SQLDatabase, model_name: str = "gpt-4-turbo-preview"):
+    # Tools that only rediscover what the schema snapshot already tells the model
+    discovery_tools = ("sql_db_list_tables", "sql_db_schema")
+
+    def __init__(
+        self,
+        db: SQLDatabase,
+        model_name: str = "gpt-4-turbo-preview",
+        max_concurrency: int = 16,
+        checkpointer: Optional[BaseCheckpointSaver] = None,
+        max_messages_per_thread: int = 40,
+        response_cache: Optional[LRUCache] = None,
+        skip_discovery: bool = False,
+        router: Optional[QuestionRouter] = None,
+        pricing: Optional[PricingSimulator] = None,
+        optimizer: Optional[PriceOptimizer] = None,
+        llm: Optional[BaseChatModel] = None,
+        tracer: Optional[Tracer] = None,
+        history: Optional[ConversationHistory] = None,
+        example_store: Optional[ExampleStore] = None,
+        examples_top_k: int = 3,
+    ):
         """
         Initialize the RetailAgent.
         
         Args:
             db (SQLDatabase): The database instance to connect to
             model_name (str): The name of the OpenAI model to use
+            max_concurrency (int): Maximum number of questions answered concurrently by aget_response
+            checkpointer (BaseCheckpointSaver): Conversation store, defaults to a BoundedMemorySaver
+            max_messages_per_thread (int): Messages kept in a conversation thread before older turns are dropped
+            response_cache (LRUCache): Cache of answers to opening questions, None to disable
+            skip_discovery (bool): Put a schema snapshot in the prompt and drop the table listing and schema tools
+            router (QuestionRouter): Answers templated questions without the model, None to disable
+            pricing (PricingSimulator): Price scenario engine behind the simulation tool, defaults to one on db
+            optimizer (PriceOptimizer): Price optimizer behind the optimization tool, defaults to one on pricing
+            llm (BaseChatModel): Chat model to use instead of ChatOpenAI(model_name), e.g. a RoutingChatModel or a local stand-in
+            tracer (Tracer): Samples and exports traces of agent runs, defaults to get_tracer()
+            history (ConversationHistory): Bounds the earlier turns sent to the model, defaults to ConversationHistory()
+            example_store (ExampleStore): Records answered questions with their SQL and shows similar ones to the model, None to disable
+            examples_top_k (int): Maximum number of examples shown to the model per question
         """
         self.db = db
         self.model_name = model_name
+        self.llm = llm
+        self.max_concurrency = max_concurrency
+        self.checkpointer = checkpointer if checkpointer is not None else BoundedMemorySaver()
+        self.max_messages_per_thread = max_messages_per_thread
+        self.history = history if history is not None else ConversationHistory()
+        self.example_store = example_store
+        self.examples_top_k = examples_top_k
+        self.response_cache = response_cache
+        self.skip_discovery = skip_discovery
+        self.router = router
+        self.pricing = pricing if pricing is not None else PricingSimulator(db)
+        self.optimizer = optimizer if optimizer is not None else PriceOptimizer(self.pricing)
+        self.tracer = tracer if tracer is not None else get_tracer()
+        self.metrics_handler = MetricsCallbackHandler()
+        # Only skip_discovery prompts carry the schema; otherwise the model reads it through the discovery tools
+        self.schema_snapshot = SchemaSnapshot(db) if skip_discovery else None
+        self._semaphore: Optional[asyncio.Semaphore] = None
         self.agent = self._create_agent()
 
-    def _create_system_message(self) -> str:
-        """Create the system message for the agent."""
+    def _create_system_message(self, examples: Sequence[Tuple[str, str, float]] = ()) -> str:
+        """Create the system message for the agent, with similar questions answered before, if any."""
+        schema = ""
+        if self.schema_snapshot is not None:
+            discovery_instructions = """The complete schema of the database, with row counts and sample rows, is
+        given below. Do NOT list the tables or query their schema; write the query
+        directly from this schema."""
+            schema = f"""Live schema of the database:
+        {self.schema_snapshot.describe()}"""
+        else:
+            discovery_instructions = """To start you should ALWAYS look at the tables in the database to see what you
+        can query. Do NOT skip this step."""
+        schema_instructions = "" if self.skip_discovery else "Then you should query the schema of the most relevant tables."
+        # Rollups only exist in databases built by the data pipeline
+        database_information = self.database_information
+        tables = self.schema_snapshot.tables if self.schema_snapshot is not None else self.db.get_usable_table_names()
+        if "sku_yearly_summary" in tables:
+            database_information += "\n#########################################################################################\n" + self.rollup_information
+        example_instructions = ""
+        if examples:
+            listed = "\n".join(f"        Question: {question}\n        SQL: {sql}" for question, sql, _ in examples)
+            example_instructions = f"""Similar questions were answered correctly before with this SQL. Reuse
+        their tables, joins and filters when they fit, changing the values as needed:
+{listed}"""
         return f"""
         You are an agent designed to interact with a SQL database.
         Given an input question, create a syntactically correct SQLite query to run,
@@ -125,59 +257,315 @@ COLUMN: discount_pct - Discount percentage applied by the competitor, if availab
         examples in the database. Never query for all the columns from a specific table,
         only ask for the relevant columns given the question.
 
-        You MUST double check your query before executing it. If you get an error while
-        executing a query, rewrite the query and try again.
+        You MUST double check your query with sql_db_query_checker before executing it.
+        If the checker or the query returns an error, use the suggested fix to rewrite
+        the query and try again. Queries that scan whole large tables without a filter,
+        LIMIT or aggregation are refused, long-running queries are stopped, and large
+        results are truncated, so filter and aggregate in SQL.
+
+        For "what if we change the price" questions, use simulate_price_change instead of
+        computing elasticity effects in SQL. Pass every candidate price change and the
+        whole scope (category, product or SKUs) in a single call. For "what price should
+        we set" questions, use optimize_prices, which finds the profit-maximizing price of
+        every SKU within the allowed band without selling more than the stock.
 
         DO NOT make any DML statements (INSERT, UPDATE, DELETE, DROP etc.) to the
         database.
 
-        To start you should ALWAYS look at the tables in the database to see what you
-        can query. Do NOT skip this step.
+        {discovery_instructions}
 
         Use this description of tables and columns for reference.
-        {self.database_information}
+        {database_information}
+
+        {schema}
 
-        Then you should query the schema of the most relevant tables.
+        {schema_instructions}
+
+        {example_instructions}
 
         Business context:
         Product usually means product-category combination.
         """
 
+    def _build_prompt(self, state) -> list:
+        """Prepend the system message, picking up schema changes since the last call."""
+        if self.schema_snapshot is not None:
+            self.schema_snapshot.refresh_if_changed()
+        examples = []
+        if self.example_store is not None:
+            question = next((m.content for m in reversed(state["messages"]) if isinstance(m, HumanMessage)), "")
+            examples = self.example_store.search(str(question), self.examples_top_k)
+        return [SystemMessage(content=self._create_system_message(examples)), *state["messages"]]
+
     def _create_agent(self):
         """Create and configure the retail agent."""
-        llm = ChatOpenAI(model=self.model_name)
+        llm = self.llm if self.llm is not None else ChatOpenAI(model=self.model_name)
         toolkit = SQLDatabaseToolkit(db=self.db, llm=llm)
-        tools = toolkit.get_tools()
-        memory = MemorySaver()
-        langfuse_handler = CallbackHandler()
+        # The toolkit's checker spends a model call per query; validate locally instead.
+        query_checker = create_query_checker_tool(SQLValidator(self.db))
+        tools = [query_checker if tool.name == query_checker.name else tool for tool in toolkit.get_tools()]
+        if self.skip_discovery:
+            tools = [tool for tool in tools if tool.name not in self.discovery_tools]
+        tools.append(create_price_simulation_tool(self.pricing))
+        tools.append(create_price_optimization_tool(self.optimizer))
         data_agent = create_react_agent(
             name="Retail_Data_Agent",
             model=llm,
             tools=tools,
-            prompt=self._create_system_message(),
-            checkpointer = memory
+            prompt=self._build_prompt,
+            pre_model_hook=self._trim_thread_messages,
+            checkpointer=self.checkpointer
         )
-        data_agent = data_agent.with_config({"callbacks": [langfuse_handler]})
         return data_agent
 
-    def get_response(self, question: str) -> str:
+    def _run_config(self, config: dict, session_id: str) -> dict:
+        """Add the per-run callbacks: metrics always, tracing only when the question is sampled."""
+        tracing = self.tracer.callbacks()
+        run_config = {**config, "callbacks": [self.metrics_handler, *tracing]}
+        if tracing:
+            run_config["metadata"] = {"langfuse_session_id": session_id}
+        return run_config
+
+    def _trim_thread_messages(self, state) -> dict:
+        """
+        Bound the stored conversation and the model input of every turn.
+
+        Once the thread holds more than max_messages_per_thread messages, its oldest
+        turns are removed from the thread state itself and folded into the stored
+        summary. The model gets the history's compact view of the rest: the summary,
+        the last few turns without stale tool output, and the current turn.
+        """
+        messages = state["messages"]
+        trimmed = self.history.trim(messages, self.max_messages_per_thread)
+        if trimmed is None:
+            return {"llm_input_messages": self.history.model_input(messages)}
+        return {
+            "messages": [RemoveMessage(id=REMOVE_ALL_MESSAGES), *trimmed],
+            "llm_input_messages": self.history.model_input(trimmed),
+        }
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        """Create the concurrency limiter lazily so it binds to the running event loop."""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    def _response_cache_key(self, question: str, is_new_thread: bool) -> Optional[str]:
+        """
+        Return the response cache key for a question, or None if it must not be cached.
+
+        Only the opening question of a conversation is cached: follow-ups depend on the
+        thread's history. The cache is bound to the database's data version, so any
+        change to the tables invalidates every cached answer.
+        """
+        if self.response_cache is None or not is_new_thread:
+            return None
+        version = get_data_version(self.db)
+        if version is None:
+            return None
+        self.response_cache.sync_version(version)
+        return normalize_question(question)
+
+    def _local_answer(self, question: str, is_new_thread: bool) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+        """
+        Try to answer without running the agent, first from the fast path, then from the cache.
+
+        Returns:
+            tuple: (answer, source, cache_key); answer and source are None on a miss and
+            cache_key is where the agent's answer should be stored, if anywhere
+        """
+        if self.router is not None:
+            answer = self.router.route(question)
+            if answer is not None:
+                return answer, "fast_path", None
+        cache_key = self._response_cache_key(question, is_new_thread)
+        if cache_key is not None:
+            answer = self.response_cache.get(cache_key)
+            if answer is not None:
+                return answer, "cache", cache_key
+        return None, None, cache_key
+
+    def _cached_turn(self, question: str, answer: str, messages: Sequence[BaseMessage]) -> dict:
+        """
+        State update that records a locally answered turn so follow-ups keep their context.
+
+        These turns skip the agent and its pre-model hook, so the thread is trimmed here
+        to max_messages_per_thread the same way.
+
+        Args:
+            question (str): The question answered locally
+            answer (str): Its answer
+            messages (list): The thread's messages before this turn
+        """
+        turn = [HumanMessage(content=question), AIMessage(content=answer)]
+        trimmed = self.history.trim([*messages, *turn], self.max_messages_per_thread)
+        if trimmed is None:
+            return {"messages": turn}
+        return {"messages": [RemoveMessage(id=REMOVE_ALL_MESSAGES), *trimmed]}
+
+    def _store_answer(self, cache_key: Optional[str], answer: str) -> None:
+        if cache_key is not None and answer not in ("I don't know", "No response received"):
+            self.response_cache.put(cache_key, answer)
+
+    def _record_example(self, question: str, messages: Sequence[BaseMessage], is_new_thread: bool) -> None:
+        """
+        Store the SQL that answered a question as an example for later questions.
+
+        Only opening questions are stored: follow-ups like "and last year?" only make
+        sense with the conversation before them.
+        """
+        if self.example_store is None or not is_new_thread:
+            return
+        query = verified_query(messages)
+        if query is not None:
+            self.example_store.add(question, query)
+
+    @staticmethod
+    def _final_answer(step) -> Optional[str]:
+        """Return the answer text if this stream step holds the final message, else None."""
+        if step['messages'][-1].response_metadata.get('finish_reason') == 'stop':
+            try:
+                return step['messages'][-1].content
+            except:
+                return "I don't know"
+        return None
+
+    def get_response(self, question: str, session_id: str = "1") -> str:
         """
         Get response from the retail agent for a given question.
         
         Args:
             question (str): The question to ask the agent
+            session_id (str): Conversation thread the question belongs to
             
         Returns:
             str: The agent's response or "I don't know" if unable to process
         """
+        started = time.perf_counter()
+        config = {"configurable": {"thread_id": session_id}}
+        is_new_thread = self.checkpointer.get_tuple(config) is None
+        answer, source, cache_key = self._local_answer(question, is_new_thread)
+        if answer is not None:
+            messages = self.agent.get_state(config).values.get("messages", [])
+            self.agent.update_state(config, self._cached_turn(question, answer, messages), as_node="agent")
+            QUESTION_SECONDS.observe(time.perf_counter() - started, source=source)
+            return answer
+        answer = "No response received"
         for step in self.agent.stream(
             {"messages": [{"role": "user", "content": question}]},
-            {"configurable": {"thread_id": "1"}},
+            self._run_config(config, session_id),
             stream_mode="values",
         ):
-            if step['messages'][-1].response_metadata.get('finish_reason') == 'stop':
-                try:
-                    return step['messages'][-1].content
-                except:
-                    return "I don't know"
-        return "No response received"
+            final_answer = self._final_answer(step)
+            if final_answer is not None:
+                answer = final_answer
+                self._store_answer(cache_key, answer)
+                self._record_example(question, step["messages"], is_new_thread)
+                break
+        QUESTION_SECONDS.observe(time.perf_counter() - started, source="agent")
+        return answer
+
+    async def aget_response(self, question: str, session_id: str = "1") -> str:
+        """
+        Async version of get_response that never blocks the event loop.
+
+        The graph is driven with astream, so LLM calls use the async OpenAI client and
+        the synchronous SQL tools run in the default thread pool. At most
+        max_concurrency questions are in flight at once; the rest wait their turn.
+
+        Args:
+            question (str): The question to ask the agent
+            session_id (str): Conversation thread the question belongs to
+
+        Returns:
+            str: The agent's response or "I don't know" if unable to process
+        """
+        started = time.perf_counter()
+        config = {"configurable": {"thread_id": session_id}}
+        is_new_thread = await self.checkpointer.aget_tuple(config) is None
+        answer, source, cache_key = await asyncio.to_thread(self._local_answer, question, is_new_thread)
+        if answer is not None:
+            messages = (await self.agent.aget_state(config)).values.get("messages", [])
+            await self.agent.aupdate_state(config, self._cached_turn(question, answer, messages), as_node="agent")
+            QUESTION_SECONDS.observe(time.perf_counter() - started, source=source)
+            return answer
+        answer = "No response received"
+        async with self._get_semaphore():
+            async for step in self.agent.astream(
+                {"messages": [{"role": "user", "content": question}]},
+                self._run_config(config, session_id),
+                stream_mode="values",
+            ):
+                final_answer = self._final_answer(step)
+                if final_answer is not None:
+                    answer = final_answer
+                    self._store_answer(cache_key, answer)
+                    await asyncio.to_thread(self._record_example, question, step["messages"], is_new_thread)
+                    break
+        QUESTION_SECONDS.observe(time.perf_counter() - started, source="agent")
+        return answer
+
+    async def astream_response(self, question: str, session_id: str = "1") -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream the agent's progress for a question as a sequence of events.
+
+        Events are dicts with a "type" key:
+            tool_call   - the agent invoked a tool ("tool", "input")
+            tool_result - a tool returned ("tool", "output")
+            token       - a piece of the answer text ("content")
+            answer      - the complete final answer ("content"), with a "source" of
+                          "fast_path" or "cache" when the agent did not run
+
+        Args:
+            question (str): The question to ask the agent
+            session_id (str): Conversation thread the question belongs to
+
+        Yields:
+            dict: The next event
+        """
+        started = time.perf_counter()
+        config = {"configurable": {"thread_id": session_id}}
+        is_new_thread = await self.checkpointer.aget_tuple(config) is None
+        answer, source, cache_key = await asyncio.to_thread(self._local_answer, question, is_new_thread)
+        if answer is not None:
+            messages = (await self.agent.aget_state(config)).values.get("messages", [])
+            await self.agent.aupdate_state(config, self._cached_turn(question, answer, messages), as_node="agent")
+            QUESTION_SECONDS.observe(time.perf_counter() - started, source=source)
+            yield {"type": "answer", "content": answer, "source": source}
+            return
+        answer = None
+        turn: List[BaseMessage] = [HumanMessage(content=question)]
+        async with self._get_semaphore():
+            async for mode, chunk in self.agent.astream(
+                {"messages": [{"role": "user", "content": question}]},
+                self._run_config(config, session_id),
+                stream_mode=["updates", "messages"],
+            ):
+                if mode == "messages":
+                    message, metadata = chunk
+                    if (
+                        metadata.get("langgraph_node") == "agent"
+                        and isinstance(message, (AIMessage, AIMessageChunk))
+                        and isinstance(message.content, str)
+                        and message.content
+                    ):
+                        yield {"type": "token", "content": message.content}
+                    continue
+                for node, update in chunk.items():
+                    for message in (update or {}).get("messages", []):
+                        if isinstance(message, (AIMessage, ToolMessage)):
+                            turn.append(message)
+                        if isinstance(message, ToolMessage):
+                            yield {"type": "tool_result", "tool": message.name, "output": message.content}
+                        elif isinstance(message, AIMessage):
+                            for tool_call in message.tool_calls:
+                                yield {"type": "tool_call", "tool": tool_call["name"], "input": tool_call["args"]}
+                            if message.response_metadata.get('finish_reason') == 'stop':
+                                answer = message.content
+        if answer is None:
+            answer = "No response received"
+        else:
+            self._store_answer(cache_key, answer)
+            await asyncio.to_thread(self._record_example, question, turn, is_new_thread)
+        QUESTION_SECONDS.observe(time.perf_counter() - started, source="agent")
+        yield {"type": "answer", "content": answer}
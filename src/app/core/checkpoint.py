@@ -0,0 +1,384 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, Optional, Sequence, Set, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import BaseCheckpointSaver, ChannelVersions, Checkpoint, CheckpointMetadata, CheckpointTuple
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.checkpoint.serde.base import SerializerProtocol
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+
+class BoundedMemorySaver(MemorySaver):
+    """
+    An in-memory checkpointer that keeps memory flat under long-running traffic.
+
+    Threads (conversation sessions) are tracked in least-recently-used order. A thread is
+    evicted when more than max_threads are alive or when it has been idle for longer
+    than ttl_seconds. Within a thread only the latest max_checkpoints_per_thread
+    checkpoints, and the channel blobs they reference, are kept.
+    """
+
+    def __init__(
+        self,
+        max_threads: int = 1000,
+        ttl_seconds: Optional[float] = 3600,
+        max_checkpoints_per_thread: int = 2,
+    ):
+        """
+        Initialize the BoundedMemorySaver.
+
+        Args:
+            max_threads (int): Maximum number of live threads before the least recently used is evicted
+            ttl_seconds (float): Idle time after which a thread is evicted, None to disable
+            max_checkpoints_per_thread (int): Number of most recent checkpoints kept per thread
+        """
+        super().__init__()
+        self.max_threads = max_threads
+        self.ttl_seconds = ttl_seconds
+        self.max_checkpoints_per_thread = max(1, max_checkpoints_per_thread)
+        self._last_access: "OrderedDict[str, float]" = OrderedDict()
+        # Blob keys (channel, version) per thread and namespace, so pruning and eviction never scan all blobs
+        self._blob_keys: Dict[str, Dict[str, Set[Tuple[str, Any]]]] = {}
+        self._lock = threading.RLock()
+        self.evictions = {"lru": 0, "ttl": 0}
+        self.pruned_checkpoints = 0
+
+    def _touch(self, thread_id: str) -> None:
+        self._last_access[thread_id] = time.monotonic()
+        self._last_access.move_to_end(thread_id)
+
+    def _evict(self) -> None:
+        """Drop expired threads, then the least recently used ones above max_threads."""
+        if self.ttl_seconds is not None:
+            deadline = time.monotonic() - self.ttl_seconds
+            while self._last_access:
+                thread_id, last_access = next(iter(self._last_access.items()))
+                if last_access > deadline:
+                    break
+                self._drop_thread(thread_id)
+                self.evictions["ttl"] += 1
+        while len(self._last_access) > self.max_threads:
+            thread_id = next(iter(self._last_access))
+            self._drop_thread(thread_id)
+            self.evictions["lru"] += 1
+
+    def _drop_thread(self, thread_id: str) -> None:
+        self._last_access.pop(thread_id, None)
+        for checkpoint_ns, keys in self._blob_keys.pop(thread_id, {}).items():
+            for channel, version in keys:
+                self.blobs.pop((thread_id, checkpoint_ns, channel, version), None)
+        for checkpoint_ns, checkpoints in self.storage.pop(thread_id, {}).items():
+            for checkpoint_id in checkpoints:
+                self.writes.pop((thread_id, checkpoint_ns, checkpoint_id), None)
+
+    def _prune_thread(self, thread_id: str, checkpoint_ns: str) -> None:
+        """Keep only the newest checkpoints of a thread and the blobs they still reference."""
+        checkpoints = self.storage[thread_id][checkpoint_ns]
+        if len(checkpoints) <= self.max_checkpoints_per_thread:
+            return
+        # Checkpoint ids are time-ordered, so sorting them sorts by age.
+        ordered = sorted(checkpoints)
+        stale = ordered[: -self.max_checkpoints_per_thread]
+        for checkpoint_id in stale:
+            del checkpoints[checkpoint_id]
+            self.writes.pop((thread_id, checkpoint_ns, checkpoint_id), None)
+        self.pruned_checkpoints += len(stale)
+
+        referenced = set()
+        for saved_checkpoint, _, _ in checkpoints.values():
+            versions = self.serde.loads_typed(saved_checkpoint)["channel_versions"]
+            referenced.update(versions.items())
+        keys = self._blob_keys.get(thread_id, {}).get(checkpoint_ns, set())
+        for channel, version in keys - referenced:
+            self.blobs.pop((thread_id, checkpoint_ns, channel, version), None)
+        keys &= referenced
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        with self._lock:
+            self._evict()
+            if thread_id in self._last_access:
+                self._touch(thread_id)
+            return super().get_tuple(config)
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        with self._lock:
+            next_config = super().put(config, checkpoint, metadata, new_versions)
+            checkpoint_ns = config["configurable"]["checkpoint_ns"]
+            self._blob_keys.setdefault(thread_id, {}).setdefault(checkpoint_ns, set()).update(new_versions.items())
+            self._touch(thread_id)
+            self._prune_thread(thread_id, checkpoint_ns)
+            self._evict()
+            return next_config
+
+    def put_writes(self, config: RunnableConfig, writes, task_id: str, task_path: str = "") -> None:
+        with self._lock:
+            super().put_writes(config, writes, task_id, task_path)
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            self._drop_thread(thread_id)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the number of live threads and how many were evicted or pruned so far."""
+        with self._lock:
+            return {
+                "backend": "memory",
+                "live_threads": len(self._last_access),
+                "max_threads": self.max_threads,
+                "ttl_seconds": self.ttl_seconds,
+                "evicted_lru": self.evictions["lru"],
+                "evicted_ttl": self.evictions["ttl"],
+                "pruned_checkpoints": self.pruned_checkpoints,
+            }
+
+
+class CompressedSerializer(SerializerProtocol):
+    """
+    Serializer that zlib-compresses the output of another serializer.
+
+    Conversation checkpoints repeat the whole message history, so they compress well.
+    Values smaller than min_bytes are stored as is; compressed values get a "+zlib"
+    suffix on their type, so both kinds (and rows written before compression) load back.
+    """
+
+    suffix = "+zlib"
+
+    def __init__(self, serde: Optional[SerializerProtocol] = None, level: int = 6, min_bytes: int = 512):
+        self.serde = serde if serde is not None else JsonPlusSerializer()
+        self.level = level
+        self.min_bytes = min_bytes
+
+    def dumps_typed(self, obj: Any) -> Tuple[str, bytes]:
+        type_, data = self.serde.dumps_typed(obj)
+        if len(data) < self.min_bytes:
+            return type_, data
+        return type_ + self.suffix, zlib.compress(data, self.level)
+
+    def loads_typed(self, data: Tuple[str, bytes]) -> Any:
+        type_, payload = data
+        if type_.endswith(self.suffix):
+            return self.serde.loads_typed((type_[: -len(self.suffix)], zlib.decompress(payload)))
+        return self.serde.loads_typed(data)
+
+
+class SQLiteCheckpointSaver(SqliteSaver):
+    """
+    A checkpointer on a local SQLite file that several worker processes can share.
+
+    Conversation state survives restarts and every uvicorn worker sees the same
+    threads, so follow-up questions need no sticky sessions. The file is kept separate
+    from the retail database and opened in WAL mode with a busy timeout, so workers
+    wait for each other's writes instead of failing. Checkpoints are stored
+    zlib-compressed, and only the latest max_checkpoints_per_thread of each thread are
+    kept. A background thread deletes threads idle for longer than ttl_seconds and the
+    least recently used ones above max_threads. The async methods run the synchronous
+    ones in a worker thread, so the event loop never waits on the file.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_threads: int = 100000,
+        ttl_seconds: Optional[float] = 7 * 24 * 3600,
+        max_checkpoints_per_thread: int = 2,
+        prune_interval_seconds: Optional[float] = 60,
+        busy_timeout_seconds: float = 10,
+    ):
+        """
+        Initialize the SQLiteCheckpointSaver.
+
+        Args:
+            path (str): SQLite file holding the checkpoints, created if missing
+            max_threads (int): Maximum number of threads kept before the least recently used are deleted
+            ttl_seconds (float): Idle time after which a thread is deleted, None to keep threads forever
+            max_checkpoints_per_thread (int): Number of most recent checkpoints kept per thread
+            prune_interval_seconds (float): Seconds between background prunes, None to only prune on prune()
+            busy_timeout_seconds (float): How long a write waits for another worker's write to finish
+        """
+        conn = sqlite3.connect(path, check_same_thread=False, timeout=busy_timeout_seconds)
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        super().__init__(conn, serde=CompressedSerializer())
+        self.path = path
+        self.max_threads = max_threads
+        self.ttl_seconds = ttl_seconds
+        self.max_checkpoints_per_thread = max(1, max_checkpoints_per_thread)
+        self.evictions = {"lru": 0, "ttl": 0}
+        self.pruned_checkpoints = 0
+        self._stop = threading.Event()
+        self._pruner: Optional[threading.Thread] = None
+        if prune_interval_seconds:
+            self._pruner = threading.Thread(
+                target=self._prune_periodically, args=(prune_interval_seconds,), name="checkpoint-prune", daemon=True
+            )
+            self._pruner.start()
+
+    def setup(self) -> None:
+        if self.is_setup:
+            return
+        super().setup()
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS thread_access (
+                thread_id TEXT PRIMARY KEY,
+                last_access REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS thread_access_last_access ON thread_access (last_access);
+            """
+        )
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        next_config = super().put(config, checkpoint, metadata, new_versions)
+        thread_id = str(config["configurable"]["thread_id"])
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        with self.cursor() as cur:
+            cur.execute(
+                "INSERT INTO thread_access (thread_id, last_access) VALUES (?, ?) "
+                "ON CONFLICT (thread_id) DO UPDATE SET last_access = excluded.last_access",
+                (thread_id, time.time()),
+            )
+            # Checkpoint ids are time-ordered, so everything below the newest ones is stale
+            cutoff = cur.execute(
+                "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                "ORDER BY checkpoint_id DESC LIMIT 1 OFFSET ?",
+                (thread_id, checkpoint_ns, self.max_checkpoints_per_thread - 1),
+            ).fetchone()
+            if cutoff is not None:
+                for table in ("writes", "checkpoints"):
+                    cur.execute(
+                        f"DELETE FROM {table} WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id < ?",
+                        (thread_id, checkpoint_ns, cutoff[0]),
+                    )
+                self.pruned_checkpoints += cur.rowcount
+        return next_config
+
+    def delete_thread(self, thread_id: str) -> None:
+        super().delete_thread(thread_id)
+        with self.cursor() as cur:
+            cur.execute("DELETE FROM thread_access WHERE thread_id = ?", (str(thread_id),))
+
+    def _delete_threads(self, cur: sqlite3.Cursor, selection: str, parameters: Sequence[Any]) -> int:
+        """Delete the threads whose ids the selection query returns; returns how many were deleted."""
+        cur.execute("CREATE TEMP TABLE IF NOT EXISTS stale_threads (thread_id TEXT PRIMARY KEY)")
+        cur.execute("DELETE FROM stale_threads")
+        cur.execute(f"INSERT INTO stale_threads {selection}", parameters)
+        for table in ("writes", "checkpoints", "thread_access"):
+            cur.execute(f"DELETE FROM {table} WHERE thread_id IN (SELECT thread_id FROM stale_threads)")
+        return cur.rowcount
+
+    def prune(self) -> None:
+        """Delete expired threads, then the least recently used ones above max_threads."""
+        with self.cursor() as cur:
+            if self.ttl_seconds is not None:
+                self.evictions["ttl"] += self._delete_threads(
+                    cur, "SELECT thread_id FROM thread_access WHERE last_access < ?", (time.time() - self.ttl_seconds,)
+                )
+            self.evictions["lru"] += self._delete_threads(
+                cur,
+                "SELECT thread_id FROM thread_access ORDER BY last_access DESC LIMIT -1 OFFSET ?",
+                (self.max_threads,),
+            )
+
+    def _prune_periodically(self, interval: float) -> None:
+        while not self._stop.wait(interval):
+            try:
+                self.prune()
+            except sqlite3.Error:
+                # Another worker holding the write lock for too long only delays pruning
+                continue
+
+    def close(self) -> None:
+        """Stop background pruning and close the database connection."""
+        self._stop.set()
+        if self._pruner is not None:
+            self._pruner.join()
+        with self.lock:
+            self.conn.close()
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config: Optional[RunnableConfig], *, filter=None, before=None, limit=None) -> AsyncIterator[CheckpointTuple]:
+        checkpoints = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for checkpoint in checkpoints:
+            yield checkpoint
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config: RunnableConfig, writes, task_id: str, task_path: str = "") -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+    async def aget_delta_channel_history(self, *, config: RunnableConfig, channels: Sequence[str]):
+        return await asyncio.to_thread(self.get_delta_channel_history, config=config, channels=channels)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the number of stored threads and how many were evicted or pruned by this worker."""
+        with self.cursor(transaction=False) as cur:
+            live_threads = cur.execute("SELECT COUNT(*) FROM thread_access").fetchone()[0]
+        return {
+            "backend": "sqlite",
+            "live_threads": live_threads,
+            "max_threads": self.max_threads,
+            "ttl_seconds": self.ttl_seconds,
+            "evicted_lru": self.evictions["lru"],
+            "evicted_ttl": self.evictions["ttl"],
+            "pruned_checkpoints": self.pruned_checkpoints,
+            "file_bytes": os.path.getsize(self.path) if os.path.exists(self.path) else 0,
+        }
+
+
+def get_checkpointer() -> BaseCheckpointSaver:
+    """
+    Create the conversation checkpointer configured by the environment.
+
+    CHECKPOINT_BACKEND is "memory" (default, per worker and lost on restart) or
+    "sqlite" (the CHECKPOINT_PATH file, shared by every worker on the host).
+    SESSION_MAX_THREADS and SESSION_TTL_SECONDS bound the stored threads for both.
+    """
+    max_threads = int(os.getenv("SESSION_MAX_THREADS", "1000"))
+    ttl_seconds = float(os.getenv("SESSION_TTL_SECONDS", "3600"))
+    backend = os.getenv("CHECKPOINT_BACKEND", "memory").lower()
+    if backend == "memory":
+        return BoundedMemorySaver(max_threads=max_threads, ttl_seconds=ttl_seconds)
+    if backend == "sqlite":
+        return SQLiteCheckpointSaver(
+            os.getenv("CHECKPOINT_PATH", "checkpoints.sqlite"),
+            max_threads=max_threads,
+            ttl_seconds=ttl_seconds,
+            prune_interval_seconds=float(os.getenv("CHECKPOINT_PRUNE_INTERVAL_SECONDS", "60")),
+        )
+    raise ValueError(f"Unknown CHECKPOINT_BACKEND {backend!r}, expected 'memory' or 'sqlite'")
+
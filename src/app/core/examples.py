@@ -0,0 +1,308 @@
+import heapq
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+
+from app.utils.cache import normalize_question
+from app.utils.sql_text import canonicalize_sql
+
+_WORD = re.compile(r"[a-z0-9]+")
+# Words that say nothing about which tables, columns or filters a question needs
+_STOPWORDS = frozenset("""
+a an and are as at be by can do does for from give have how i in is it list me of on or our please show
+tell that the their them these this those to us was we were what when where which who why will with you
+""".split())
+# Notes the query guard and the result formatter add to results they cut short
+_TRUNCATION_NOTE = re.compile(r"^\((?:Showing |Result cut at )", re.MULTILINE)
+
+
+def tokenize(text: str) -> List[str]:
+    """Split a question into lowercase terms, without stopwords or numbers and with plural "s" removed."""
+    terms = []
+    for word in _WORD.findall(text.lower()):
+        # Numbers are values to change, not a sign of a similar question
+        if word in _STOPWORDS or word.isdigit():
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        terms.append(word)
+    return terms
+
+
+def verified_query(messages: Sequence[BaseMessage]) -> Optional[str]:
+    """
+    Return the SQL that answered the last turn of a conversation, if it can be trusted.
+
+    That is the last sql_db_query call of a turn that ended with an answer rather than
+    a tool call, provided sql_db_query_checker approved that query in the same turn
+    and it returned rows in full. Results cut short by the query guard or the result
+    formatter only show part of the answer, so their SQL is not kept.
+    """
+    turn_start = max((i for i, message in enumerate(messages) if isinstance(message, HumanMessage)), default=0)
+    turn = messages[turn_start:]
+    if not turn or not isinstance(turn[-1], AIMessage) or turn[-1].tool_calls:
+        return None
+    calls = {
+        call["id"]: (call["name"], call["args"].get("query"))
+        for message in turn if isinstance(message, AIMessage)
+        for call in message.tool_calls if call["name"] in ("sql_db_query", "sql_db_query_checker")
+    }
+    results = [
+        (*calls[message.tool_call_id], str(message.content))
+        for message in turn if isinstance(message, ToolMessage) and message.tool_call_id in calls
+    ]
+    answered = [(query, content) for name, query, content in results if name == "sql_db_query"]
+    if not answered or not answered[-1][0]:
+        return None
+    query, content = answered[-1]
+    if not content.strip() or content.startswith("Error") or _TRUNCATION_NOTE.search(content):
+        return None
+    checked = {
+        canonicalize_sql(checked_query)
+        for name, checked_query, result in results
+        if name == "sql_db_query_checker" and checked_query and _checker_approved(result)
+    }
+    return query if canonicalize_sql(query) in checked else None
+
+
+def _checker_approved(result: str) -> bool:
+    try:
+        return json.loads(result).get("valid") is True
+    except (ValueError, AttributeError):
+        return False
+
+
+class ExampleStore:
+    """
+    Questions the agent answered with SQL, kept for few-shot prompting.
+
+    Examples are stored in a SQLite file and indexed in memory with BM25 over the
+    question's words, so the most similar earlier questions and their SQL can be shown
+    to the model without any outside service. Adding an example updates the index in
+    place, costing only its own terms. Asking the same question again replaces its SQL.
+    Every worker keeps its own index and picks up the examples other workers added to
+    the file at most sync_interval_seconds later.
+    """
+
+    def __init__(
+        self,
+        path: str = ":memory:",
+        k1: float = 1.2,
+        b: float = 0.75,
+        min_match: float = 0.5,
+        max_sql_chars: int = 1000,
+        sync_interval_seconds: float = 5.0,
+    ):
+        """
+        Initialize the ExampleStore.
+
+        Args:
+            path (str): SQLite file holding the examples, created if missing
+            k1 (float): BM25 term frequency saturation
+            b (float): BM25 document length normalization
+            min_match (float): Share of the question's known terms, weighted by rarity, an example must contain to be returned
+            max_sql_chars (int): Longest SQL stored, longer queries are not kept as examples
+            sync_interval_seconds (float): Seconds between reads of examples added by other workers
+        """
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.min_match = min_match
+        self.max_sql_chars = max_sql_chars
+        self.sync_interval_seconds = sync_interval_seconds
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode = WAL")
+            self._conn.execute("PRAGMA synchronous = NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS examples (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                question TEXT NOT NULL,
+                normalized TEXT NOT NULL UNIQUE,
+                sql TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+        self._lock = threading.Lock()
+        # BM25 index: term -> {example id: term count}, plus the examples and their lengths
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._terms: Dict[int, Counter] = {}
+        self._lengths: Dict[int, int] = {}
+        self._examples: Dict[int, Tuple[str, str]] = {}
+        self._ids: Dict[str, int] = {}
+        self._total_length = 0
+        self._last_id = 0
+        self._last_sync = 0.0
+        # Results of recent searches, as the agent searches once per model call of a question
+        self._results: "OrderedDict[Tuple[frozenset, int], List[Tuple[str, str, float]]]" = OrderedDict()
+        self.searches = 0
+        self.hits = 0
+        self.sync()
+
+    def _index(self, example_id: int, question: str, normalized: str, sql: str) -> None:
+        self._results.clear()
+        previous = self._ids.get(normalized)
+        if previous is not None:
+            self._unindex(previous)
+        terms = Counter(tokenize(question))
+        for term, count in terms.items():
+            self._postings.setdefault(term, {})[example_id] = count
+        self._terms[example_id] = terms
+        self._examples[example_id] = (question, sql)
+        self._ids[normalized] = example_id
+        self._lengths[example_id] = sum(terms.values())
+        self._total_length += self._lengths[example_id]
+        self._last_id = max(self._last_id, example_id)
+
+    def _unindex(self, example_id: int) -> None:
+        terms = self._terms.pop(example_id)
+        for term in terms:
+            postings = self._postings[term]
+            del postings[example_id]
+            if not postings:
+                del self._postings[term]
+        del self._examples[example_id]
+        self._total_length -= self._lengths.pop(example_id)
+
+    def sync(self) -> int:
+        """
+        Index the examples added to the file since the last sync, e.g. by other workers.
+
+        Returns:
+            int: Number of examples indexed
+        """
+        with self._lock:
+            return self._sync()
+
+    def _sync(self) -> int:
+        rows = self._conn.execute(
+            "SELECT id, question, normalized, sql FROM examples WHERE id > ? ORDER BY id", (self._last_id,)
+        ).fetchall()
+        for row in rows:
+            self._index(*row)
+        self._last_sync = time.monotonic()
+        return len(rows)
+
+    def add(self, question: str, sql: str) -> bool:
+        """
+        Record the SQL that answered a question.
+
+        Args:
+            question (str): The user's question
+            sql (str): The query whose result answered it
+
+        Returns:
+            bool: True if the example was stored
+        """
+        normalized = normalize_question(question)
+        sql = sql.strip()
+        if not tokenize(question) or not sql or len(sql) > self.max_sql_chars:
+            return False
+        with self._lock:
+            known = self._ids.get(normalized)
+            if known is not None and self._examples[known][1] == sql:
+                return False
+            # REPLACE gives the new version a new, higher id, so other workers pick it up on sync
+            self._conn.execute(
+                "INSERT OR REPLACE INTO examples (question, normalized, sql, created_at) VALUES (?, ?, ?, ?)",
+                (question.strip(), normalized, sql, time.time()),
+            )
+            self._conn.commit()
+            # Indexed through a sync, so examples other workers added just before are not skipped
+            self._sync()
+        return True
+
+    def search(self, question: str, k: int = 3) -> List[Tuple[str, str, float]]:
+        """
+        Find the stored examples most similar to a question.
+
+        Args:
+            question (str): The user's question
+            k (int): Maximum number of examples returned
+
+        Returns:
+            list: (question, sql, score) of the best matches, best first
+        """
+        if time.monotonic() - self._last_sync > self.sync_interval_seconds:
+            self.sync()
+        terms = frozenset(tokenize(question))
+        with self._lock:
+            self.searches += 1
+            count = len(self._examples)
+            if not count or not terms:
+                return []
+            results = self._results.get((terms, k))
+            if results is None:
+                results = self._search(terms, k, count)
+                self._results[(terms, k)] = results
+                if len(self._results) > 256:
+                    self._results.popitem(last=False)
+            if results:
+                self.hits += 1
+            return results
+
+    def _search(self, terms: frozenset, k: int, count: int) -> List[Tuple[str, str, float]]:
+        """Score the examples sharing a term with the question with BM25 and return the best k."""
+        average_length = self._total_length / count
+        scores: Dict[int, float] = {}
+        matched: Dict[int, float] = {}
+        total_idf = 0.0
+        for term in terms:
+            # Terms no example contains cannot tell the examples apart
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            total_idf += idf
+            for example_id, frequency in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[example_id] / average_length)
+                scores[example_id] = scores.get(example_id, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+                matched[example_id] = matched.get(example_id, 0.0) + idf
+        # BM25 scores grow with the number of examples, so relevance is judged by the share of the question matched
+        candidates = ((score, example_id) for example_id, score in scores.items() if matched[example_id] >= self.min_match * total_idf)
+        best = heapq.nlargest(k, candidates)
+        return [(*self._examples[example_id], round(score, 2)) for score, example_id in best]
+
+    def close(self) -> None:
+        """Close the SQLite file."""
+        with self._lock:
+            self._conn.close()
+
+    def stats(self) -> dict:
+        """Return the number of indexed examples and how often searches found one."""
+        with self._lock:
+            return {
+                "examples": len(self._examples),
+                "terms": len(self._postings),
+                "searches": self.searches,
+                "hits": self.hits,
+                "hit_rate": self.hits / self.searches if self.searches else 0.0,
+            }
+
+
+def get_example_store() -> Optional[ExampleStore]:
+    """
+    Create the example store configured by the environment.
+
+    EXAMPLES_ENABLED (default "false") turns few-shot examples on, EXAMPLES_PATH
+    (default examples.sqlite) is the file shared by the workers on the host and
+    EXAMPLES_MIN_MATCH (default 0.5) is the share of a question's terms, weighted by
+    rarity, an example must contain to be shown.
+    """
+    if os.getenv("EXAMPLES_ENABLED", "false").lower() != "true":
+        return None
+    return ExampleStore(
+        os.getenv("EXAMPLES_PATH", "examples.sqlite"),
+        min_match=float(os.getenv("EXAMPLES_MIN_MATCH", "0.5")),
+    )
@@ -0,0 +1,176 @@
+import re
+from typing import List, Optional, Sequence, Tuple
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.messages.utils import count_tokens_approximately
+
+SUMMARY_ID = "conversation-summary"
+SUMMARY_HEADER = "Summary of earlier turns of this conversation (oldest first):"
+
+
+def _shorten(text: str, max_chars: int) -> str:
+    text = re.sub(r"\s+", " ", str(text)).strip()
+    return text if len(text) <= max_chars else text[: max_chars - 3].rstrip() + "..."
+
+
+def split_turns(messages: Sequence[BaseMessage]) -> List[List[BaseMessage]]:
+    """Split a conversation into turns, each starting at a user message."""
+    turns: List[List[BaseMessage]] = []
+    for message in messages:
+        if isinstance(message, HumanMessage) or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+
+class ConversationHistory:
+    """
+    Bounds the prompt of every turn, however long the conversation gets.
+
+    The model sees the current turn as is, the last keep_turns earlier turns with their
+    stale tool output removed, and a running extractive summary of everything older:
+    one line per turn with the question, the start of the answer and the SQL it ran.
+    Earlier turns lose the schema-discovery and query-checker calls entirely; other
+    tool results are cut to max_tool_chars. Turns are dropped from verbatim to summary
+    sooner when they would exceed max_history_tokens, and the summary keeps its newest
+    lines within summary_tokens.
+
+    The summary is also stored in the thread as a SystemMessage, so turns removed from
+    the stored conversation by trim() live on in it.
+    """
+
+    def __init__(
+        self,
+        keep_turns: int = 3,
+        max_history_tokens: int = 3000,
+        summary_tokens: int = 600,
+        max_tool_chars: int = 600,
+        dropped_tools: Sequence[str] = ("sql_db_list_tables", "sql_db_schema", "sql_db_query_checker"),
+    ):
+        """
+        Initialize the ConversationHistory.
+
+        Args:
+            keep_turns (int): Earlier turns passed to the model verbatim, apart from stale tool output
+            max_history_tokens (int): Token budget of those earlier turns
+            summary_tokens (int): Token budget of the summary of older turns
+            max_tool_chars (int): Characters kept of each earlier tool result
+            dropped_tools (list): Tools whose calls and results are removed from earlier turns
+        """
+        self.keep_turns = keep_turns
+        self.max_history_tokens = max_history_tokens
+        self.summary_tokens = summary_tokens
+        self.max_tool_chars = max_tool_chars
+        self.dropped_tools = set(dropped_tools)
+
+    @staticmethod
+    def _split_summary(messages: Sequence[BaseMessage]) -> Tuple[List[str], List[BaseMessage]]:
+        """Separate the stored summary lines from the rest of the conversation."""
+        if messages and isinstance(messages[0], SystemMessage) and messages[0].id == SUMMARY_ID:
+            return messages[0].content.splitlines()[1:], list(messages[1:])
+        return [], list(messages)
+
+    def summarize_turn(self, turn: Sequence[BaseMessage]) -> str:
+        """Return the summary line of a turn: its question, the start of its answer and its last SQL query."""
+        question = next((m.content for m in turn if isinstance(m, HumanMessage)), "")
+        answer = next(
+            (m.content for m in reversed(turn) if isinstance(m, AIMessage) and not m.tool_calls and m.content), ""
+        )
+        calls = [call for m in turn if isinstance(m, AIMessage) for call in m.tool_calls]
+        line = f"- Q: {_shorten(question, 200)} | A: {_shorten(answer, 300)}"
+        queries = [call["args"].get("query") for call in calls if call["name"] == "sql_db_query"]
+        if queries:
+            line += f" | SQL: {_shorten(queries[-1], 300)}"
+        tools = sorted({call["name"] for call in calls if not call["name"].startswith("sql_db_")})
+        if tools:
+            line += f" | Tools: {', '.join(tools)}"
+        return line
+
+    def _summary_message(self, lines: Sequence[str]) -> Optional[SystemMessage]:
+        """Build the summary message from the newest lines that fit in summary_tokens."""
+        kept: List[str] = []
+        budget = self.summary_tokens
+        for line in reversed(lines):
+            budget -= count_tokens_approximately([line])
+            if budget < 0:
+                break
+            kept.append(line)
+        if not kept:
+            return None
+        return SystemMessage(content="\n".join([SUMMARY_HEADER, *reversed(kept)]), id=SUMMARY_ID)
+
+    def compact_turn(self, turn: Sequence[BaseMessage]) -> List[BaseMessage]:
+        """Remove stale tool calls from an earlier turn and cut the remaining tool results."""
+        kept_call_ids = set()
+        compacted: List[BaseMessage] = []
+        for message in turn:
+            if isinstance(message, AIMessage) and message.tool_calls:
+                calls = [call for call in message.tool_calls if call["name"] not in self.dropped_tools]
+                kept_call_ids.update(call["id"] for call in calls)
+                if calls or message.content:
+                    # A new message, so provider-specific copies of the dropped calls do not come back
+                    compacted.append(AIMessage(content=message.content, tool_calls=calls, id=message.id))
+            elif isinstance(message, ToolMessage):
+                if message.tool_call_id in kept_call_ids:
+                    content = str(message.content)
+                    if len(content) > self.max_tool_chars:
+                        content = content[: self.max_tool_chars] + f"... [{len(content) - self.max_tool_chars} more characters]"
+                    compacted.append(message.model_copy(update={"content": content}))
+            else:
+                compacted.append(message)
+        return compacted
+
+    def model_input(self, messages: Sequence[BaseMessage]) -> List[BaseMessage]:
+        """
+        Return the messages to send to the model for the current turn.
+
+        Args:
+            messages (list): The stored conversation, its last turn being the current one
+
+        Returns:
+            list: Summary message (if any), compacted recent turns, then the current turn unchanged
+        """
+        summary_lines, conversation = self._split_summary(messages)
+        turns = split_turns(conversation)
+        if len(turns) <= 1 and not summary_lines:
+            return list(conversation)
+        current, earlier = turns[-1] if turns else [], turns[:-1]
+
+        recent: List[List[BaseMessage]] = []
+        budget = self.max_history_tokens
+        for turn in reversed(earlier[-self.keep_turns:] if self.keep_turns > 0 else []):
+            compacted = self.compact_turn(turn)
+            budget -= count_tokens_approximately(compacted)
+            if budget < 0:
+                break
+            recent.insert(0, compacted)
+        older = earlier[: len(earlier) - len(recent)]
+
+        summary = self._summary_message(summary_lines + [self.summarize_turn(turn) for turn in older])
+        model_messages: List[BaseMessage] = [summary] if summary is not None else []
+        for turn in recent:
+            model_messages.extend(turn)
+        return model_messages + list(current)
+
+    def trim(self, messages: Sequence[BaseMessage], max_messages: int) -> Optional[List[BaseMessage]]:
+        """
+        Cut the stored conversation to about max_messages messages, folding removed turns into the summary.
+
+        Whole turns are removed, oldest first, so tool calls stay paired with their
+        results; the current turn is never removed.
+
+        Returns:
+            list: The new stored conversation, or None if it is short enough already
+        """
+        summary_lines, conversation = self._split_summary(messages)
+        if len(conversation) <= max_messages:
+            return None
+        turns = split_turns(conversation)
+        removed = 0
+        while removed < len(turns) - 1 and sum(len(turn) for turn in turns[removed:]) > max_messages:
+            removed += 1
+        if not removed:
+            return None
+        summary = self._summary_message(summary_lines + [self.summarize_turn(turn) for turn in turns[:removed]])
+        kept = [message for turn in turns[removed:] for message in turn]
+        return ([summary] if summary is not None else []) + kept
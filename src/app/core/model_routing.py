@@ -0,0 +1,231 @@
+import os
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.callbacks import AsyncCallbackManager, AsyncCallbackManagerForLLMRun, CallbackManager
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessageChunk, BaseMessage, BaseMessageChunk, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langgraph.constants import TAG_NOSTREAM
+from pydantic import Field, PrivateAttr
+
+from app.utils.metrics import MODEL_ROUTE_SECONDS
+
+SMALL, LARGE = "small", "large"
+# Tools whose results the model turns into the answer
+ANSWER_TOOLS = ("sql_db_query", "simulate_price_change", "optimize_prices")
+
+
+def _as_chunk(message: BaseMessage) -> BaseMessageChunk:
+    """Return a streamed message as a chunk; models without streaming yield their whole message."""
+    if isinstance(message, BaseMessageChunk):
+        return message
+    return AIMessageChunk(
+        content=message.content,
+        tool_calls=getattr(message, "tool_calls", []),
+        response_metadata=message.response_metadata,
+        usage_metadata=getattr(message, "usage_metadata", None),
+        id=message.id,
+    )
+
+
+def is_sql_error(message: ToolMessage) -> bool:
+    """Return True if a tool result reports a failed SQL query or a query refused by the checker."""
+    content = str(message.content)
+    if message.name == "sql_db_query":
+        return content.startswith("Error")
+    if message.name == "sql_db_query_checker":
+        return '"valid": false' in content
+    return False
+
+
+class RoutingChatModel(BaseChatModel):
+    """
+    Chat model that sends each agent step to a small or a large model.
+
+    Tool selection and SQL writing go to the small, fast model. The large model is
+    only called to write the answer, i.e. when the last message is the result of a
+    query or pricing tool, and for the rest of a turn once escalate_after_errors SQL
+    attempts of that turn have failed. Setting synthesis_tier to "small" keeps answers
+    on the small model as well, so only SQL errors escalate.
+
+    Each call is recorded by tier and reason in the retail_agent_model_tier_seconds
+    histogram and in stats(). The tier models are called with their own callback runs,
+    so traces and per-model metrics show which model answered; they are tagged
+    nostream so streamed tokens are emitted once, by this model.
+    """
+
+    small: BaseChatModel
+    large: BaseChatModel
+    escalate_after_errors: int = 2
+    synthesis_tier: str = LARGE
+    answer_tools: Tuple[str, ...] = ANSWER_TOOLS
+    # Tool-bound versions of the tier models, set by bind_tools
+    bound_small: Optional[Any] = None
+    bound_large: Optional[Any] = None
+    decisions: Dict[Tuple[str, str], int] = Field(default_factory=dict)
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    @property
+    def _llm_type(self) -> str:
+        return "routing"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"model_name": f"routing({_model_name(self.small)}, {_model_name(self.large)})"}
+
+    def bind_tools(self, tools, **kwargs) -> "RoutingChatModel":
+        # The copy shares the decisions dict, so stats() of the unbound model covers the agent's calls
+        return self.model_copy(update={
+            "bound_small": self.small.bind_tools(tools, **kwargs),
+            "bound_large": self.large.bind_tools(tools, **kwargs),
+        })
+
+    def choose_tier(self, messages: Sequence[BaseMessage]) -> Tuple[str, str]:
+        """
+        Pick the model for the next step of the agent.
+
+        Args:
+            messages (list): The model input, its last user message starting the current turn
+
+        Returns:
+            tuple: The tier ("small" or "large") and the reason for it
+        """
+        turn_start = max((i for i, message in enumerate(messages) if isinstance(message, HumanMessage)), default=0)
+        turn = messages[turn_start:]
+        errors = sum(isinstance(message, ToolMessage) and is_sql_error(message) for message in turn)
+        if errors and errors >= self.escalate_after_errors:
+            return LARGE, "sql_errors"
+        last = messages[-1] if messages else None
+        if isinstance(last, ToolMessage) and last.name in self.answer_tools and not is_sql_error(last):
+            return self.synthesis_tier, "synthesis"
+        if isinstance(last, ToolMessage):
+            return SMALL, "tool_step"
+        return SMALL, "question"
+
+    def _route(self, messages: List[BaseMessage]) -> Tuple[Any, str, str]:
+        tier, reason = self.choose_tier(messages)
+        if tier == LARGE:
+            model = self.bound_large if self.bound_large is not None else self.large
+        else:
+            model = self.bound_small if self.bound_small is not None else self.small
+        return model, tier, reason
+
+    def _record(self, tier: str, reason: str, started: float, status: str) -> None:
+        MODEL_ROUTE_SECONDS.observe(time.perf_counter() - started, tier=tier, reason=reason, status=status)
+        with self._lock:
+            self.decisions[(tier, reason)] = self.decisions.get((tier, reason), 0) + 1
+
+    @staticmethod
+    def _config(run_manager) -> dict:
+        """Run config of a tier model call: a child run of this model's run, not streamed by the graph."""
+        config: dict = {"tags": [TAG_NOSTREAM]}
+        if run_manager is not None:
+            # Model run managers have no get_child(); build the child manager the way chain run managers do
+            manager_class = AsyncCallbackManager if isinstance(run_manager, AsyncCallbackManagerForLLMRun) else CallbackManager
+            manager = manager_class(handlers=[], parent_run_id=run_manager.run_id)
+            manager.set_handlers(run_manager.inheritable_handlers)
+            manager.add_tags(run_manager.inheritable_tags)
+            manager.add_metadata(run_manager.inheritable_metadata)
+            config["callbacks"] = manager
+        return config
+
+    @staticmethod
+    def _tag(message: BaseMessage, tier: str, reason: str) -> BaseMessage:
+        return message.model_copy(update={
+            "response_metadata": {**message.response_metadata, "model_tier": tier, "route_reason": reason}
+        })
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        model, tier, reason = self._route(messages)
+        started, status = time.perf_counter(), "error"
+        try:
+            message = model.invoke(messages, self._config(run_manager), stop=stop, **kwargs)
+            status = "ok"
+        finally:
+            self._record(tier, reason, started, status)
+        return ChatResult(generations=[ChatGeneration(message=self._tag(message, tier, reason))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        model, tier, reason = self._route(messages)
+        started, status = time.perf_counter(), "error"
+        try:
+            message = await model.ainvoke(messages, self._config(run_manager), stop=stop, **kwargs)
+            status = "ok"
+        finally:
+            self._record(tier, reason, started, status)
+        return ChatResult(generations=[ChatGeneration(message=self._tag(message, tier, reason))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        model, tier, reason = self._route(messages)
+        started, status = time.perf_counter(), "error"
+        try:
+            last = None
+            for chunk in model.stream(messages, self._config(run_manager), stop=stop, **kwargs):
+                if last is not None:
+                    yield ChatGenerationChunk(message=last)
+                last = _as_chunk(chunk)
+            yield ChatGenerationChunk(message=self._tag(last if last is not None else AIMessageChunk(content=""), tier, reason))
+            status = "ok"
+        finally:
+            self._record(tier, reason, started, status)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        model, tier, reason = self._route(messages)
+        started, status = time.perf_counter(), "error"
+        try:
+            last = None
+            async for chunk in model.astream(messages, self._config(run_manager), stop=stop, **kwargs):
+                if last is not None:
+                    yield ChatGenerationChunk(message=last)
+                last = _as_chunk(chunk)
+            yield ChatGenerationChunk(message=self._tag(last if last is not None else AIMessageChunk(content=""), tier, reason))
+            status = "ok"
+        finally:
+            self._record(tier, reason, started, status)
+
+    def stats(self) -> dict:
+        """Return the number of calls per tier and routing reason."""
+        with self._lock:
+            decisions = dict(self.decisions)
+        calls = {tier: sum(count for (t, _), count in decisions.items() if t == tier) for tier in (SMALL, LARGE)}
+        total = sum(calls.values())
+        return {
+            "small_model": _model_name(self.small),
+            "large_model": _model_name(self.large),
+            "calls": calls,
+            "small_share": calls[SMALL] / total if total else 0.0,
+            "decisions": {f"{tier}:{reason}": count for (tier, reason), count in sorted(decisions.items())},
+        }
+
+
+def _model_name(model: BaseChatModel) -> str:
+    return str(getattr(model, "model_name", None) or getattr(model, "model", None) or model._llm_type)
+
+
+def get_chat_model(default_model: str = "gpt-4-turbo-preview") -> BaseChatModel:
+    """
+    Create the chat model configured by the environment.
+
+    LARGE_MODEL_NAME (default default_model) answers questions. When SMALL_MODEL_NAME
+    is set, a RoutingChatModel hands tool selection and SQL writing to that model;
+    MODEL_ESCALATE_AFTER_ERRORS (default 2) is the number of failed SQL attempts in a
+    turn after which the large model takes over, and MODEL_SYNTHESIS_TIER ("large" or
+    "small", default "large") picks the model that writes the answers.
+    """
+    from langchain_openai import ChatOpenAI
+
+    large = ChatOpenAI(model=os.getenv("LARGE_MODEL_NAME", default_model))
+    small_model = os.getenv("SMALL_MODEL_NAME")
+    if not small_model:
+        return large
+    synthesis_tier = os.getenv("MODEL_SYNTHESIS_TIER", LARGE).lower()
+    if synthesis_tier not in (SMALL, LARGE):
+        raise ValueError(f"MODEL_SYNTHESIS_TIER must be 'small' or 'large', got {synthesis_tier!r}")
+    return RoutingChatModel(
+        small=ChatOpenAI(model=small_model),
+        large=large,
+        escalate_after_errors=int(os.getenv("MODEL_ESCALATE_AFTER_ERRORS", "2")),
+        synthesis_tier=synthesis_tier,
+    )
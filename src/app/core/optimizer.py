@@ -0,0 +1,252 @@
+import json
+import threading
+from datetime import date
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.tools import BaseTool, tool
+from sqlalchemy import text
+
+from app.core.pricing import PricingSimulator
+from app.utils.database import get_data_version
+
+
+def _next_month() -> date:
+    today = date.today()
+    return date(today.year + today.month // 12, today.month % 12 + 1, 1)
+
+
+class PriceOptimizer:
+    """
+    Profit-maximizing prices for the whole catalog under inventory constraints.
+
+    Under the linear elasticity model of PricingSimulator, demand at price p is
+    Q(p) = Q0 * ((1 - e) + e * p / P0), where P0 is the base price, e the elasticity
+    and Q0 next month's forecast units. Profit (p - c) * Q(p) is concave in p, with its
+    maximum at p* = (c - (1 - e) * P0 / e) / 2. Selling no more than the stock S
+    requires Q(p) <= S, i.e. p >= P0 * (S / Q0 - (1 - e)) / e. Clipping p* to the
+    stock bound and the allowed price band therefore gives the constrained optimum of
+    every SKU in closed form, in a few vectorized operations.
+    """
+
+    def __init__(self, simulator: PricingSimulator, min_change: float = -0.3, max_change: float = 0.3):
+        """
+        Initialize the PriceOptimizer.
+
+        Args:
+            simulator (PricingSimulator): Source of the per-SKU pricing inputs
+            min_change (float): Default lower bound of the price band, relative to the base price
+            max_change (float): Default upper bound of the price band, relative to the base price
+        """
+        self.simulator = simulator
+        self.min_change = min_change
+        self.max_change = max_change
+        self._forecast: Optional[Tuple[Optional[str], np.ndarray, np.ndarray]] = None
+        self._version: Optional[Tuple[int, ...]] = None
+        self._lock = threading.Lock()
+
+    def next_month_forecast(self) -> Tuple[Optional[str], np.ndarray, np.ndarray]:
+        """
+        Return the first forecast month from next month on, with its sorted sku ids and forecast units.
+
+        When the forecast ends before next month, the month is None and the arrays are
+        empty, rather than an older month standing in for next month.
+        """
+        db = self.simulator.db
+        version = get_data_version(db)
+        with self._lock:
+            if self._forecast is not None and (version is None or version == self._version):
+                return self._forecast
+        with db._engine.connect() as connection:
+            month = connection.execute(
+                text("SELECT MIN(date) FROM forecast_data WHERE date >= :month"), {"month": _next_month().isoformat()}
+            ).scalar()
+            rows = connection.execute(
+                text("SELECT sku_id, units_sale FROM forecast_data WHERE date = :month ORDER BY sku_id"), {"month": month}
+            ).fetchall() if month is not None else []
+        columns = list(zip(*rows)) if rows else [(), ()]
+        forecast = (
+            str(month)[:10] if month is not None else None,
+            np.array(columns[0], dtype=np.int64),
+            np.array(columns[1], dtype=float),
+        )
+        with self._lock:
+            self._forecast, self._version = forecast, version
+        return forecast
+
+    @staticmethod
+    def optimal_prices(
+        base_price: np.ndarray,
+        demand: np.ndarray,
+        elasticity: np.ndarray,
+        unit_cost: np.ndarray,
+        stock: np.ndarray,
+        min_change: float,
+        max_change: float,
+    ) -> Dict[str, np.ndarray]:
+        """
+        Solve every SKU's constrained profit maximization in closed form.
+
+        Args:
+            base_price (np.ndarray): Base price per SKU
+            demand (np.ndarray): Expected units per SKU at the base price
+            elasticity (np.ndarray): Price elasticity per SKU, negative
+            unit_cost (np.ndarray): Unit cost per SKU
+            stock (np.ndarray): Units available per SKU, inf when unconstrained
+            min_change (float): Lower bound of the price band, relative to the base price
+            max_change (float): Upper bound of the price band, relative to the base price
+
+        Returns:
+            dict: Optimal price, expected units, revenue and profit per SKU, and whether the stock limit binds
+
+        Raises:
+            ValueError: If an elasticity is zero or positive, which has no finite profit-maximizing price
+        """
+        if not np.all(elasticity < 0):
+            raise ValueError(
+                f"{int(np.sum(~(elasticity < 0)))} SKU(s) have a zero, positive or missing elasticity; "
+                "the optimizer needs a negative price elasticity for every SKU"
+            )
+        unconstrained = (unit_cost - (1 - elasticity) * base_price / elasticity) / 2
+        with np.errstate(divide="ignore", invalid="ignore"):
+            stock_floor = base_price * (stock / demand - (1 - elasticity)) / elasticity
+        stock_floor = np.where(np.isfinite(stock_floor), stock_floor, -np.inf)
+        lower = base_price * (1 + min_change)
+        upper = base_price * (1 + max_change)
+        price = np.clip(np.maximum(unconstrained, stock_floor), lower, upper)
+        units = np.maximum(demand * ((1 - elasticity) + elasticity * price / base_price), 0.0)
+        # When even the top of the band sells more than the stock, only the stock is sold
+        sold = np.minimum(units, stock)
+        return {
+            "price": price,
+            "units": sold,
+            "revenue": price * sold,
+            "profit": (price - unit_cost) * sold,
+            "stock_limited": stock_floor > unconstrained,
+        }
+
+    def optimize(
+        self,
+        sku_ids: Optional[Sequence[int]] = None,
+        category: Optional[str] = None,
+        product_name: Optional[str] = None,
+        min_change: Optional[float] = None,
+        max_change: Optional[float] = None,
+        top_n: int = 10,
+        include_prices: bool = False,
+    ) -> Dict[str, Any]:
+        """
+        Find next month's profit-maximizing price of every selected SKU.
+
+        Args:
+            sku_ids (list): Only these SKUs
+            category (str): Only this category
+            product_name (str): Only this product
+            min_change (float): Lower bound of the price band, defaults to the optimizer's
+            max_change (float): Upper bound of the price band, defaults to the optimizer's
+            top_n (int): Number of SKUs listed individually, ranked by profit gain
+            include_prices (bool): Also return the recommended price of every selected SKU
+
+        Returns:
+            dict: Totals at the base and the optimal prices, the top_n SKUs by profit gain and,
+                  if requested, all recommended prices. When no forecast covers next month,
+                  forecast_month is None and a note says demand is the base demand.
+
+        Raises:
+            ValueError: If the price band is empty or a selected SKU's elasticity is not negative
+        """
+        min_change = self.min_change if min_change is None else min_change
+        max_change = self.max_change if max_change is None else max_change
+        if min_change > max_change:
+            raise ValueError("min_change must not be greater than max_change")
+        selected = self.simulator.select(sku_ids, category, product_name)
+        month, forecast_skus, forecast_units = self.next_month_forecast()
+        # SKUs without a forecast fall back to their base demand
+        demand = selected["base_demand"].copy()
+        if len(forecast_skus):
+            position = np.minimum(np.searchsorted(forecast_skus, selected["sku_id"]), len(forecast_skus) - 1)
+            matched = forecast_skus[position] == selected["sku_id"]
+            demand[matched] = forecast_units[position[matched]]
+        base_price, unit_cost, stock = selected["base_price"], selected["unit_cost"], selected["stock"]
+        optimal = self.optimal_prices(base_price, demand, selected["elasticity"], unit_cost, stock, min_change, max_change)
+
+        base_units = np.minimum(demand, stock)
+        base_profit = (base_price - unit_cost) * base_units
+        gain = optimal["profit"] - base_profit
+        result: Dict[str, Any] = {
+            "forecast_month": month,
+            "price_band_pct": [round(100 * min_change, 2), round(100 * max_change, 2)],
+            "skus_optimized": len(base_price),
+            "stock_limited_skus": int(optimal["stock_limited"].sum()),
+            "base": {
+                "units": round(float(base_units.sum()), 2),
+                "revenue": round(float((base_price * base_units).sum()), 2),
+                "profit": round(float(base_profit.sum()), 2),
+            },
+            "optimized": {
+                "units": round(float(optimal["units"].sum()), 2),
+                "revenue": round(float(optimal["revenue"].sum()), 2),
+                "profit": round(float(optimal["profit"].sum()), 2),
+            },
+            "skus": [],
+        }
+        if month is None:
+            result["note"] = (
+                f"No forecast covers {_next_month().strftime('%Y-%m')} or later; "
+                "expected units are each SKU's base demand."
+            )
+        for index in np.argsort(-gain, kind="stable")[:top_n]:
+            result["skus"].append({
+                "sku_id": int(selected["sku_id"][index]),
+                "product_name": selected["product_name"][index],
+                "category": selected["category"][index],
+                "base_price": float(base_price[index]),
+                "optimal_price": round(float(optimal["price"][index]), 2),
+                "price_change_pct": round(100 * float(optimal["price"][index] / base_price[index] - 1), 2),
+                "forecast_units": float(demand[index]),
+                "stock": float(stock[index]) if np.isfinite(stock[index]) else None,
+                "expected_units": round(float(optimal["units"][index]), 2),
+                "profit_gain": round(float(gain[index]), 2),
+                "stock_limited": bool(optimal["stock_limited"][index]),
+            })
+        if include_prices:
+            result["prices"] = [
+                {"sku_id": int(sku_id), "optimal_price": round(float(price), 2)}
+                for sku_id, price in zip(selected["sku_id"], optimal["price"])
+            ]
+        return result
+
+
+def create_price_optimization_tool(optimizer: PriceOptimizer) -> BaseTool:
+    """Build an optimize_prices tool backed by the closed-form optimizer."""
+
+    @tool("optimize_prices")
+    def optimize_prices(
+        category: Optional[str] = None,
+        product_name: Optional[str] = None,
+        sku_ids: Optional[List[int]] = None,
+        min_change: Optional[float] = None,
+        max_change: Optional[float] = None,
+        top_n: int = 10,
+    ) -> str:
+        """
+        Find next month's profit-maximizing price for every matching SKU at once, using each
+        SKU's elasticity, its sales forecast and its stock (never planning to sell more than
+        is in stock). Use this for "what price should we set" questions instead of
+        simulating prices one by one.
+
+        Args:
+            category: Only SKUs of this category (men, women, kids)
+            product_name: Only SKUs of this product, e.g. "t-shirt"
+            sku_ids: Only these SKUs
+            min_change: Lowest allowed price change relative to the base price, e.g. -0.2
+            max_change: Highest allowed price change relative to the base price, e.g. 0.2
+            top_n: Number of SKUs listed individually, ranked by profit gain
+
+        Returns JSON with catalog totals at the base and optimal prices and the top SKUs.
+        """
+        return json.dumps(
+            optimizer.optimize(sku_ids, category, product_name, min_change, max_change, top_n), default=str
+        )
+
+    return optimize_prices
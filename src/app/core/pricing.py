@@ -0,0 +1,235 @@
+import json
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_community.utilities import SQLDatabase
+from langchain_core.tools import BaseTool, tool
+from sqlalchemy import text
+
+from app.utils.database import get_data_version
+
+# Latest unit cost of every SKU (SQLite returns the bare column from the row holding MAX(date))
+_INPUTS_QUERY = """
+    SELECT p.sku_id, i.product_name, i.category, p.base_price, p.base_demand, p.elasticity, c.unit_cost, i.stock
+    FROM current_product_information p
+    JOIN (SELECT sku_id, unit_cost, MAX(date) FROM historical_data GROUP BY sku_id) c ON c.sku_id = p.sku_id
+    LEFT JOIN inventory_data i ON i.sku_id = p.sku_id
+    ORDER BY p.sku_id
+"""
+
+
+class PricingSimulator:
+    """
+    Price-elasticity scenario engine for the whole catalog.
+
+    Uses the linear elasticity model of the notebooks' simulate_demand: a relative
+    price change c moves demand by elasticity * c, so P1 = P0 * (1 + c) and
+    Q1 = Q0 * (1 + elasticity * c). Every SKU and every candidate change is
+    evaluated in a single NumPy broadcast over an (SKUs x changes) grid. The inputs
+    are read once and kept until the database's data version changes.
+    """
+
+    def __init__(self, db: SQLDatabase):
+        """
+        Initialize the PricingSimulator.
+
+        Args:
+            db (SQLDatabase): The retail database
+        """
+        self.db = db
+        self._inputs: Optional[Dict[str, np.ndarray]] = None
+        self._version: Optional[Tuple[int, ...]] = None
+        self._lock = threading.Lock()
+
+    def load_inputs(self) -> Dict[str, np.ndarray]:
+        """
+        Return the per-SKU pricing inputs as column arrays.
+
+        Returns:
+            dict: sku_id, product_name, category, base_price, base_demand, elasticity, unit_cost and stock arrays
+        """
+        version = get_data_version(self.db)
+        with self._lock:
+            if self._inputs is not None and (version is None or version == self._version):
+                return self._inputs
+        with self.db._engine.connect() as connection:
+            rows = connection.execute(text(_INPUTS_QUERY)).fetchall()
+        columns = list(zip(*rows)) if rows else [()] * 8
+        inputs = {
+            "sku_id": np.array(columns[0], dtype=np.int64),
+            "product_name": np.array(columns[1], dtype=object),
+            "category": np.array(columns[2], dtype=object),
+            "base_price": np.array(columns[3], dtype=float),
+            "base_demand": np.array(columns[4], dtype=float),
+            "elasticity": np.array(columns[5], dtype=float),
+            "unit_cost": np.array(columns[6], dtype=float),
+            # SKUs without an inventory row are treated as unconstrained
+            "stock": np.array([np.inf if stock is None else stock for stock in columns[7]], dtype=float),
+        }
+        with self._lock:
+            self._inputs, self._version = inputs, version
+        return inputs
+
+    def select(
+        self,
+        sku_ids: Optional[Sequence[int]] = None,
+        category: Optional[str] = None,
+        product_name: Optional[str] = None,
+    ) -> Dict[str, np.ndarray]:
+        """
+        Return the pricing inputs of the SKUs matching all given filters.
+
+        Args:
+            sku_ids (list): Only these SKUs
+            category (str): Only this category (men, women, kids)
+            product_name (str): Only this product, case-insensitive
+
+        Returns:
+            dict: The filtered input arrays
+        """
+        inputs = self.load_inputs()
+        mask = np.ones(len(inputs["sku_id"]), dtype=bool)
+        if sku_ids:
+            mask &= np.isin(inputs["sku_id"], np.asarray(sku_ids, dtype=np.int64))
+        if category:
+            mask &= inputs["category"].astype(str) == category.lower()
+        if product_name:
+            mask &= np.char.lower(inputs["product_name"].astype(str)) == product_name.lower()
+        return {name: values[mask] for name, values in inputs.items()}
+
+    @staticmethod
+    def simulate_grid(
+        base_price: np.ndarray,
+        base_demand: np.ndarray,
+        elasticity: np.ndarray,
+        unit_cost: np.ndarray,
+        price_changes: Sequence[float],
+    ) -> Dict[str, np.ndarray]:
+        """
+        Evaluate every SKU under every relative price change.
+
+        Args:
+            base_price (np.ndarray): Current price per SKU
+            base_demand (np.ndarray): Demand per SKU at the current price
+            elasticity (np.ndarray): Price elasticity per SKU (negative)
+            unit_cost (np.ndarray): Unit cost per SKU
+            price_changes (list): Relative price changes, e.g. -0.1 for a 10% discount
+
+        Returns:
+            dict: (SKUs x changes) arrays of price, demand, revenue and profit and their changes from the base
+        """
+        changes = np.asarray(price_changes, dtype=float)[None, :]
+        price = base_price[:, None] * (1 + changes)
+        # Demand cannot go below zero however steep the increase
+        demand = np.maximum(base_demand[:, None] * (1 + elasticity[:, None] * changes), 0.0)
+        revenue = price * demand
+        profit = (price - unit_cost[:, None]) * demand
+        base_revenue = (base_price * base_demand)[:, None]
+        base_profit = ((base_price - unit_cost) * base_demand)[:, None]
+        return {
+            "price": price,
+            "demand": demand,
+            "revenue": revenue,
+            "profit": profit,
+            "demand_change": demand - base_demand[:, None],
+            "revenue_change": revenue - base_revenue,
+            "profit_change": profit - base_profit,
+        }
+
+    def simulate(
+        self,
+        price_changes: Sequence[float],
+        sku_ids: Optional[Sequence[int]] = None,
+        category: Optional[str] = None,
+        product_name: Optional[str] = None,
+        top_n: int = 10,
+    ) -> Dict[str, Any]:
+        """
+        Simulate candidate price changes for the selected SKUs.
+
+        Args:
+            price_changes (list): Relative price changes, e.g. [-0.1, 0.05]
+            sku_ids (list): Only these SKUs
+            category (str): Only this category
+            product_name (str): Only this product
+            top_n (int): Number of SKUs listed individually
+
+        Returns:
+            dict: Totals per price change over the selected SKUs, and the top_n SKUs by profit gain
+                  at their best change
+        """
+        selected = self.select(sku_ids, category, product_name)
+        n_skus = len(selected["sku_id"])
+        result: Dict[str, Any] = {"skus_simulated": n_skus, "scenarios": [], "skus": []}
+        if not n_skus or not len(price_changes):
+            return result
+        grid = self.simulate_grid(
+            selected["base_price"], selected["base_demand"], selected["elasticity"], selected["unit_cost"], price_changes
+        )
+
+        base_revenue = float((selected["base_price"] * selected["base_demand"]).sum())
+        base_profit = float(((selected["base_price"] - selected["unit_cost"]) * selected["base_demand"]).sum())
+        totals = {name: values.sum(axis=0) for name, values in grid.items() if name != "price"}
+        for column, change in enumerate(price_changes):
+            result["scenarios"].append({
+                "price_change_pct": round(100 * change, 2),
+                "demand": round(float(totals["demand"][column]), 2),
+                "demand_change": round(float(totals["demand_change"][column]), 2),
+                "revenue": round(float(totals["revenue"][column]), 2),
+                "revenue_change": round(float(totals["revenue_change"][column]), 2),
+                "revenue_change_pct": round(100 * float(totals["revenue_change"][column]) / base_revenue, 2) if base_revenue else None,
+                "profit": round(float(totals["profit"][column]), 2),
+                "profit_change": round(float(totals["profit_change"][column]), 2),
+                "profit_change_pct": round(100 * float(totals["profit_change"][column]) / abs(base_profit), 2) if base_profit else None,
+            })
+
+        best = grid["profit_change"].argmax(axis=1)
+        rows = np.arange(n_skus)
+        best_gain = grid["profit_change"][rows, best]
+        for index in np.argsort(-best_gain, kind="stable")[:top_n]:
+            column = best[index]
+            result["skus"].append({
+                "sku_id": int(selected["sku_id"][index]),
+                "product_name": selected["product_name"][index],
+                "category": selected["category"][index],
+                "elasticity": float(selected["elasticity"][index]),
+                "base_price": float(selected["base_price"][index]),
+                "unit_cost": float(selected["unit_cost"][index]),
+                "best_price_change_pct": round(100 * price_changes[column], 2),
+                "new_price": round(float(grid["price"][index, column]), 2),
+                "demand_change": round(float(grid["demand_change"][index, column]), 2),
+                "revenue_change": round(float(grid["revenue_change"][index, column]), 2),
+                "profit_change": round(float(grid["profit_change"][index, column]), 2),
+            })
+        return result
+
+
+def create_price_simulation_tool(simulator: PricingSimulator) -> BaseTool:
+    """Build a simulate_price_change tool backed by the vectorized simulator."""
+
+    @tool("simulate_price_change")
+    def simulate_price_change(
+        price_changes: List[float],
+        category: Optional[str] = None,
+        product_name: Optional[str] = None,
+        sku_ids: Optional[List[int]] = None,
+        top_n: int = 10,
+    ) -> str:
+        """
+        Simulate the effect of price changes on demand, revenue and profit using each SKU's
+        price elasticity. Evaluates every matching SKU under every change in one call, so
+        pass all candidate changes and the whole scope at once instead of calling repeatedly.
+
+        Args:
+            price_changes: Relative price changes, e.g. [-0.2, -0.1, 0.1] for 20% and 10% discounts and a 10% increase
+            category: Only SKUs of this category (men, women, kids)
+            product_name: Only SKUs of this product, e.g. "t-shirt"
+            sku_ids: Only these SKUs
+            top_n: Number of SKUs listed individually, ranked by profit gain at their best change
+
+        Returns JSON with totals per price change ("scenarios") and the top SKUs ("skus").
+        """
+        return json.dumps(simulator.simulate(price_changes, sku_ids, category, product_name, top_n), default=str)
+
+    return simulate_price_change
@@ -0,0 +1,274 @@
+import re
+import threading
+from datetime import date
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from langchain_community.utilities import SQLDatabase
+from sqlalchemy import text
+
+from app.utils.database import get_data_version
+
+CATEGORIES = {"men": "men", "mens": "men", "women": "women", "womens": "women", "kids": "kids", "kid": "kids"}
+
+# Questions with these words need reasoning, not a lookup, so they always go to the agent
+_NEEDS_REASONING = re.compile(r"\b(why|should|recommend|suggest|strategy|simulate|what if|explain|plan)\b")
+# Rankings by change, lowest values or comparisons are not the total-based ranking of the top-SKU template
+_NOT_A_TOP_TOTAL = re.compile(
+    r"\b(growth|grow|grew|growing|change|changes|changed|increase|increases|increased|decline|declines|declined|"
+    r"drop|dropped|lowest|least|worst|bottom|compared?|comparison|versus|vs)\b"
+)
+
+
+class QuestionRouter:
+    """
+    Answer common, templated retail questions without the language model.
+
+    Each intent is a local pattern match that fills a parameterized SQL template and
+    formats the rows as a markdown table. Questions that match no intent return None
+    and fall through to the ReAct agent.
+    """
+
+    def __init__(self, db: SQLDatabase, default_limit: int = 5):
+        """
+        Initialize the QuestionRouter.
+
+        Args:
+            db (SQLDatabase): The database the templates run against
+            default_limit (int): Number of rows returned when the question does not say
+        """
+        self.db = db
+        self.default_limit = default_limit
+        self.intents: List[Tuple[str, Callable[[str], Optional[str]]]] = [
+            ("competitor_prices", self._competitor_prices),
+            ("forecast", self._forecast),
+            ("stock", self._stock),
+            ("top_skus", self._top_skus),
+        ]
+        # Looked up once per data version, so a pipeline rerun's new tables and products are seen
+        self._product_names: Optional[List[str]] = None
+        self._has_rollups: Optional[bool] = None
+        self._data_version: Optional[Tuple[int, ...]] = None
+        self._lock = threading.Lock()
+        self.hits: Dict[str, int] = {name: 0 for name, _ in self.intents}
+        self.misses = 0
+
+    def route(self, question: str) -> Optional[str]:
+        """
+        Answer the question from a template if it matches a known intent.
+
+        Args:
+            question (str): The user's question
+
+        Returns:
+            str: The formatted answer, or None if the agent must handle the question
+        """
+        normalized = re.sub(r"[^\w\s-]", " ", question.lower().replace("'s", "s"))
+        normalized = re.sub(r"\s+", " ", normalized).strip()
+        if not _NEEDS_REASONING.search(normalized):
+            for name, handler in self.intents:
+                answer = handler(normalized)
+                if answer is not None:
+                    with self._lock:
+                        self.hits[name] += 1
+                    return answer
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        """Return per-intent hit counts and the fast-path hit rate."""
+        with self._lock:
+            hits = sum(self.hits.values())
+            total = hits + self.misses
+            return {
+                "hits": hits,
+                "misses": self.misses,
+                "hit_rate": round(hits / total, 4) if total else 0.0,
+                "by_intent": dict(self.hits),
+            }
+
+    # Parameter extraction
+
+    def _fetch(self, query: str, parameters: Dict[str, Any]) -> Tuple[Sequence[str], List[tuple]]:
+        with self.db._engine.connect() as connection:
+            result = connection.execute(text(query), parameters)
+            return list(result.keys()), [tuple(row) for row in result.fetchall()]
+
+    def _limit(self, question: str, default: int) -> int:
+        match = re.search(r"\b(?:top|first|best|bottom)\s+(\d+)\b|\b(\d+)\s+(?:skus?|products?|items?)\b", question)
+        if match:
+            return max(1, min(int(match.group(1) or match.group(2)), 100))
+        return default
+
+    def _sync_version(self) -> None:
+        """Forget the table and product lookups when the database has changed."""
+        version = get_data_version(self.db)
+        if version != self._data_version:
+            self._data_version = version
+            self._product_names = None
+            self._has_rollups = None
+
+    def _rollups_available(self) -> bool:
+        self._sync_version()
+        if self._has_rollups is None:
+            _, rows = self._fetch("SELECT COUNT(*) FROM sqlite_master WHERE name IN ('sku_summary', 'sku_yearly_summary')", {})
+            self._has_rollups = rows[0][0] == 2
+        return self._has_rollups
+
+    def _category(self, question: str) -> Optional[str]:
+        for word in question.split():
+            if word in CATEGORIES:
+                return CATEGORIES[word]
+        return None
+
+    def _product(self, question: str) -> Optional[str]:
+        self._sync_version()
+        if self._product_names is None:
+            _, rows = self._fetch("SELECT DISTINCT product_name FROM inventory_data", {})
+            self._product_names = sorted((row[0] for row in rows if row[0]), key=len, reverse=True)
+        for product in self._product_names:
+            if re.search(rf"\b{re.escape(product.lower())}s?\b", question):
+                return product
+        return None
+
+    def _filters(self, question: str, alias: str = "") -> Tuple[str, Dict[str, Any]]:
+        """Build a WHERE fragment for the category and product named in the question."""
+        clauses, parameters = [], {}
+        category = self._category(question)
+        if category:
+            clauses.append(f"{alias}category = :category")
+            parameters["category"] = category
+        product = self._product(question)
+        if product:
+            clauses.append(f"LOWER({alias}product_name) = LOWER(:product)")
+            parameters["product"] = product
+        return " AND ".join(clauses), parameters
+
+    # Intents
+
+    def _top_skus(self, question: str) -> Optional[str]:
+        match = re.search(
+            r"\b(?:top|best|highest|most)\b.*\b(revenue|profit|profitable|sales|selling|units)\b"
+            r"|\b(revenue|profit)\b.*\b(?:top|highest)\b",
+            question,
+        )
+        if (
+            not match
+            or not re.search(r"\b(skus?|products?|items?)\b", question)
+            or re.search(r"\bmargins?\b", question)
+            or _NOT_A_TOP_TOTAL.search(question)
+        ):
+            return None
+        word = match.group(1) or match.group(2)
+        metric = {"profitable": "profit", "sales": "revenue", "selling": "units_sold", "units": "units_sold"}.get(word, word)
+        limit = self._limit(question, 1 if re.search(r"\bmost\b", question) else self.default_limit)
+        where, parameters = self._filters(question)
+        year = re.search(r"\b(20\d\d)\b", question)
+        # Read the per-SKU rollups when the pipeline built them, the fact table otherwise
+        if self._rollups_available():
+            table = "sku_yearly_summary" if year else "sku_summary"
+            year_filter = "year = :year"
+        else:
+            table = "historical_data"
+            year_filter = "strftime('%Y', date) = :year"
+        if year:
+            where = " AND ".join(filter(None, [where, year_filter]))
+            parameters["year"] = int(year.group(1)) if table == "sku_yearly_summary" else year.group(1)
+        parameters["limit"] = limit
+        columns, rows = self._fetch(
+            f"""
+            SELECT sku_id, product_name, category, ROUND(SUM({metric})) AS total_{metric}
+            FROM {table}
+            {"WHERE " + where if where else ""}
+            GROUP BY sku_id, product_name, category
+            ORDER BY total_{metric} DESC
+            LIMIT :limit
+            """,
+            parameters,
+        )
+        scope = f" in {year.group(1)}" if year else ""
+        label = {"revenue": "revenue (INR)", "profit": "profit (INR)", "units_sold": "units sold"}[metric]
+        noun = "SKU" if limit == 1 else f"{limit} SKUs"
+        return self._format(f"Top {noun} by total {label}{scope}:", columns, rows)
+
+    def _stock(self, question: str) -> Optional[str]:
+        if not re.search(r"\b(stock|inventory|inventories)\b", question):
+            return None
+        where, parameters = self._filters(question)
+        if not where:
+            return None
+        columns, rows = self._fetch(
+            f"SELECT sku_id, product_name, category, stock FROM inventory_data WHERE {where} ORDER BY stock DESC",
+            parameters,
+        )
+        return self._format("Current inventory:", columns, rows)
+
+    def _forecast(self, question: str) -> Optional[str]:
+        if not re.search(r"\bforecast", question) or not re.search(r"\bnext month\b", question):
+            return None
+        today = date.today()
+        next_month = date(today.year + today.month // 12, today.month % 12 + 1, 1)
+        _, rows = self._fetch("SELECT MIN(date) FROM forecast_data WHERE date >= :month", {"month": next_month.isoformat()})
+        month = rows[0][0]
+        # No forecast reaches next month: let the agent say so rather than answer for an older month
+        if month is None:
+            return None
+        where, parameters = self._filters(question)
+        parameters["month"] = month
+        columns, rows = self._fetch(
+            f"""
+            SELECT sku_id, product_name, category, units_sale AS forecast_units
+            FROM forecast_data
+            WHERE date = :month {"AND " + where if where else ""}
+            ORDER BY forecast_units DESC
+            LIMIT 50
+            """,
+            parameters,
+        )
+        return self._format(f"Sales forecast for {str(month)[:7]}:", columns, rows)
+
+    def _competitor_prices(self, question: str) -> Optional[str]:
+        if not re.search(r"\bcompetit", question) or not re.search(r"\bprices?\b", question):
+            return None
+        where, parameters = self._filters(question, alias="c.")
+        parameters["limit"] = self._limit(question, 50)
+        columns, rows = self._fetch(
+            f"""
+            SELECT c.sku_id, c.product_name, c.category,
+                   h.unit_price AS our_price,
+                   ROUND(c.unit_price, 2) AS competitor_price,
+                   c.promotion AS competitor_promotion,
+                   ROUND(100.0 * (h.unit_price - c.unit_price) / c.unit_price, 1) AS price_gap_pct
+            FROM competitior_information c
+            JOIN historical_data h
+              ON h.sku_id = c.sku_id
+             AND h.date = (SELECT MAX(date) FROM historical_data WHERE sku_id = c.sku_id)
+            {"WHERE " + where if where else ""}
+            ORDER BY price_gap_pct DESC
+            LIMIT :limit
+            """,
+            parameters,
+        )
+        return self._format(
+            "Our latest selling price vs. competitor price (INR); a positive gap means we are more expensive:",
+            columns,
+            rows,
+        )
+
+    @staticmethod
+    def _format(title: str, columns: Sequence[str], rows: List[tuple]) -> str:
+        """Render rows as a markdown table under a one-line title."""
+        if not rows:
+            return f"{title}\n\nNo matching data found."
+
+        def cell(value: Any) -> str:
+            if isinstance(value, float):
+                return f"{value:,.0f}" if value.is_integer() else f"{value:,.2f}"
+            return str(value)
+
+        lines = [
+            "| " + " | ".join(columns) + " |",
+            "| " + " | ".join("---" for _ in columns) + " |",
+        ]
+        lines += ["| " + " | ".join(cell(value) for value in row) + " |" for row in rows]
+        return f"{title}\n\n" + "\n".join(lines)
@@ -1,78 +1,440 @@
+import asyncio
+import json
 import os
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
+
+_IMPORT_STARTED = time.perf_counter()
+
+from fastapi import Depends, FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
 from dotenv import load_dotenv
-from app.utils.database import get_database
-from app.core.agent import RetailAgent
+from app.utils.metrics import HTTP_REQUEST_SECONDS, REGISTRY, Gauge
 
 
 # Load environment variables
 load_dotenv()
 
-if not os.environ.get("OPENAI_API_KEY"):
-    os.environ["OPENAI_API_KEY"] = os.getenv("OPENAI_API_KEY")
+
+class Services:
+    """
+    The database, caches, pricing engines and agent behind the endpoints.
+
+    Built once per worker, in the background after the app starts serving, so /health
+    answers while the agent's dependencies are still loading. warm_up pre-loads what
+    the first requests would otherwise pay for.
+    """
+
+    def __init__(self):
+        # Imported here rather than at module level: the LangChain and OpenAI imports are most of the cold start
+        from app.core.agent import RetailAgent
+        from app.core.checkpoint import get_checkpointer
+        from app.core.examples import get_example_store
+        from app.core.history import ConversationHistory
+        from app.core.model_routing import get_chat_model
+        from app.core.optimizer import PriceOptimizer
+        from app.core.pricing import PricingSimulator
+        from app.core.router import QuestionRouter
+        from app.utils.cache import LRUCache
+        from app.utils.database import get_database
+
+        self.db = get_database()
+        self.checkpointer = get_checkpointer()
+        self.example_store = get_example_store()
+        self.response_cache = LRUCache(max_entries=int(os.getenv("RESPONSE_CACHE_SIZE", "512")))
+        self.router = QuestionRouter(self.db) if os.getenv("FAST_PATH_ENABLED", "true").lower() == "true" else None
+        self.pricing = PricingSimulator(self.db)
+        self.optimizer = PriceOptimizer(
+            self.pricing,
+            min_change=float(os.getenv("PRICE_BAND_MIN", "-0.3")),
+            max_change=float(os.getenv("PRICE_BAND_MAX", "0.3")),
+        )
+        self.llm = get_chat_model()
+        self.retail_agent = RetailAgent(
+            self.db,
+            llm=self.llm,
+            max_concurrency=int(os.getenv("AGENT_MAX_CONCURRENCY", "16")),
+            checkpointer=self.checkpointer,
+            max_messages_per_thread=int(os.getenv("SESSION_MAX_MESSAGES", "40")),
+            history=ConversationHistory(
+                keep_turns=int(os.getenv("HISTORY_KEEP_TURNS", "3")),
+                max_history_tokens=int(os.getenv("HISTORY_MAX_TOKENS", "3000")),
+                summary_tokens=int(os.getenv("HISTORY_SUMMARY_TOKENS", "600")),
+            ),
+            example_store=self.example_store,
+            examples_top_k=int(os.getenv("EXAMPLES_TOP_K", "3")),
+            response_cache=self.response_cache,
+            skip_discovery=os.getenv("AGENT_SKIP_DISCOVERY", "false").lower() == "true",
+            router=self.router,
+            pricing=self.pricing,
+            optimizer=self.optimizer,
+        )
+
+    def warm_up(self) -> Dict[str, float]:
+        """
+        Open the connection pool and load the pricing inputs and next month's forecast, concurrently.
+
+        Returns:
+            dict: Seconds taken by each step
+        """
+        steps = {
+            "connection_pool": self.db.warm_up,
+            "pricing_inputs": self.pricing.load_inputs,
+            "forecast": self.optimizer.next_month_forecast,
+        }
+
+        def timed(step) -> float:
+            started = time.perf_counter()
+            step()
+            return round(time.perf_counter() - started, 3)
+
+        with ThreadPoolExecutor(max_workers=len(steps)) as executor:
+            futures = {name: executor.submit(timed, step) for name, step in steps.items()}
+            return {name: future.result() for name, future in futures.items()}
+
+    def close(self) -> None:
+        """Release the files of the checkpointer and the example store, if they keep any open."""
+        for store in (self.checkpointer, self.example_store):
+            close = getattr(store, "close", None)
+            if close is not None:
+                close()
+
+    def register_metrics(self) -> None:
+        """Expose cache hit rates, sessions, guardrail and tracing counters as gauges."""
+        REGISTRY.register(Gauge(
+            "retail_agent_cache_hit_ratio",
+            "Hit rate of the answer and SQL result caches and of the fast path.",
+            lambda: {
+                ("responses",): self.response_cache.stats()["hit_rate"],
+                ("sql_results",): self.db.result_cache.stats()["hit_rate"],
+                **({("fast_path",): self.router.stats()["hit_rate"]} if self.router is not None else {}),
+            },
+            ("cache",),
+        ))
+        REGISTRY.register(Gauge(
+            "retail_agent_live_sessions",
+            "Conversation threads held by the checkpointer.",
+            lambda: {(): self.checkpointer.stats()["live_threads"]},
+        ))
+        if self.db.guard is not None:
+            REGISTRY.register(Gauge(
+                "retail_agent_sql_guard_queries",
+                "Agent SQL queries refused, timed out or truncated by the guardrails.",
+                lambda: {(outcome,): count for outcome, count in self.db.guard.stats().items()},
+                ("outcome",),
+            ))
+        REGISTRY.register(Gauge(
+            "retail_agent_tracing_events",
+            "Questions traced or skipped by sampling, and trace events dropped or failed on export.",
+            lambda: {
+                (outcome,): self.retail_agent.tracer.stats()[outcome]
+                for outcome in ("sampled", "skipped", "dropped_events", "failed_events")
+            },
+            ("outcome",),
+        ))
+
+
+# Seconds spent in each startup stage of this worker
+startup_seconds: Dict[str, float] = {}
+REGISTRY.register(Gauge(
+    "retail_agent_startup_seconds",
+    "Seconds this worker spent importing the app, building the services and warming up.",
+    lambda: {(stage,): seconds for stage, seconds in startup_seconds.items()},
+    ("stage",),
+))
+
+_services: Optional[asyncio.Task] = None
+_warm_up: Optional[asyncio.Task] = None
+
+
+async def _build_services() -> Services:
+    started = time.perf_counter()
+    services = await asyncio.to_thread(Services)
+    services.register_metrics()
+    startup_seconds["services"] = round(time.perf_counter() - started, 3)
+    return services
+
+
+async def _warm_up_services() -> None:
+    services = await _services
+    started = time.perf_counter()
+    startup_seconds.update({f"warm_up_{step}": seconds for step, seconds in (await asyncio.to_thread(services.warm_up)).items()})
+    startup_seconds["warm_up"] = round(time.perf_counter() - started, 3)
+
+
+def _startup_failure(task: asyncio.Task) -> Optional[BaseException]:
+    """Return why a finished startup task did not succeed, or None if it did."""
+    if task.cancelled():
+        return asyncio.CancelledError("startup was cancelled")
+    return task.exception()
+
+
+def start_services() -> None:
+    """Start building the services (and warming them up if WARMUP_ON_STARTUP is true) in the background."""
+    global _services, _warm_up
+    if _services is None:
+        _services = asyncio.ensure_future(_build_services())
+        if os.getenv("WARMUP_ON_STARTUP", "true").lower() == "true":
+            _warm_up = asyncio.ensure_future(_warm_up_services())
+
+
+async def get_services() -> Services:
+    """
+    Return the services, waiting for them if they are still being built.
+
+    Without a lifespan (e.g. a test client used outside a with-block), the first
+    request starts building them.
+    """
+    start_services()
+    try:
+        return await asyncio.shield(_services)
+    except asyncio.CancelledError:
+        # Only a cancelled startup is a 503; a cancelled request propagates as usual
+        if not _services.cancelled():
+            raise
+        raise HTTPException(status_code=503, detail="The agent failed to start: startup was cancelled")
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"The agent failed to start: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    start_services()
+    yield
+    if _services is not None and _services.done() and _startup_failure(_services) is None:
+        await asyncio.to_thread(_services.result().close)
+
 
 # Initialize FastAPI app
 app = FastAPI(
     title="Retail Agent API",
     description="API for interacting with the retail agent for database queries and analysis",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
 class Query(BaseModel):
     question: str
+    session_id: Optional[str] = None
+
+class BatchQuery(BaseModel):
+    questions: List[str] = Field(..., min_length=1, max_length=int(os.getenv("BATCH_MAX_QUESTIONS", "500")))
+    max_concurrency: int = Field(8, ge=1)
 
-# Initialize database and agent
-db = get_database()
-retail_agent = RetailAgent(db)
+class PriceScenario(BaseModel):
+    price_changes: List[float] = Field(..., min_length=1, max_length=100)
+    sku_ids: Optional[List[int]] = None
+    category: Optional[str] = None
+    product_name: Optional[str] = None
+    top_n: int = Field(10, ge=0, le=1000)
+
+class PriceOptimization(BaseModel):
+    sku_ids: Optional[List[int]] = None
+    category: Optional[str] = None
+    product_name: Optional[str] = None
+    min_change: Optional[float] = None
+    max_change: Optional[float] = None
+    top_n: int = Field(10, ge=0, le=1000)
+    include_prices: bool = False
+
+@app.middleware("http")
+async def record_request_time(request: Request, call_next):
+    started = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    HTTP_REQUEST_SECONDS.observe(
+        time.perf_counter() - started,
+        method=request.method,
+        path=getattr(route, "path", "unmatched"),
+        status=response.status_code,
+    )
+    return response
 
 @app.post("/query")
-async def query_retail_agent(query: Query):
+async def query_retail_agent(query: Query, services: Services = Depends(get_services)):
     """
     Submit a question to the retail agent.
+
+    Pass the returned session_id back to continue the same conversation.
     """
+    session_id = query.session_id or uuid.uuid4().hex
     try:
-        response = retail_agent.get_response(query.question)
-        return {"response": response}
+        response = await services.retail_agent.aget_response(query.question, session_id)
+        return {"response": response, "session_id": session_id}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/query/stream")
+async def stream_retail_agent(query: Query, services: Services = Depends(get_services)):
+    """
+    Submit a question and receive the agent's progress as server-sent events.
 
-# Load environment variables
-load_dotenv(".env")
+    Each event is a JSON object with a "type" of session, tool_call, tool_result,
+    token, answer or error. The stream ends after the answer (or error) event.
+    """
+    session_id = query.session_id or uuid.uuid4().hex
 
-if not os.environ.get("OPENAI_API_KEY"):
-    os.environ["OPENAI_API_KEY"] = os.getenv("OPENAI_API_KEY")
+    async def event_stream():
+        yield f"data: {json.dumps({'type': 'session', 'session_id': session_id})}\n\n"
+        try:
+            async for event in services.retail_agent.astream_response(query.question, session_id):
+                yield f"data: {json.dumps(event, default=str)}\n\n"
+        except Exception as e:
+            yield f"data: {json.dumps({'type': 'error', 'detail': str(e)})}\n\n"
 
-# Initialize FastAPI app
-app = FastAPI(
-    title="Retail Agent API",
-    description="API for interacting with the retail agent for database queries and analysis",
-    version="1.0.0"
-)
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
-# Initialize database and agent
-db = get_database()
-retail_agent = RetailAgent(db)
+@app.post("/query/batch")
+async def batch_retail_agent(batch: BatchQuery, services: Services = Depends(get_services)):
+    """
+    Answer a list of independent questions concurrently.
 
-class Query(BaseModel):
-    question: str
+    Each question runs in its own session, at most max_concurrency at a time (capped
+    by BATCH_MAX_CONCURRENCY). Results are streamed as newline-delimited JSON in the
+    order they finish, each with the question's index, its response or error, and its
+    latency in milliseconds.
+    """
+    semaphore = asyncio.Semaphore(min(batch.max_concurrency, int(os.getenv("BATCH_MAX_CONCURRENCY", "16"))))
 
+    async def answer(index: int, question: str) -> dict:
+        async with semaphore:
+            started = time.perf_counter()
+            result = {"index": index, "question": question, "response": None, "error": None}
+            try:
+                result["response"] = await services.retail_agent.aget_response(question, uuid.uuid4().hex)
+            except Exception as e:
+                result["error"] = str(e)
+            result["latency_ms"] = round((time.perf_counter() - started) * 1000, 1)
+            return result
 
-@app.post("/query")
-async def query_retail_agent(query: Query):
+    async def result_stream():
+        tasks = [asyncio.ensure_future(answer(index, question)) for index, question in enumerate(batch.questions)]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                yield json.dumps(await finished, default=str) + "\n"
+        finally:
+            # Stop the remaining questions if the client disconnects
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(result_stream(), media_type="application/x-ndjson")
+
+@app.post("/pricing/simulate")
+async def simulate_pricing(scenario: PriceScenario, services: Services = Depends(get_services)):
     """
-    Submit a question to the retail agent.
+    Simulate relative price changes (e.g. -0.1 for a 10% discount) for the selected SKUs.
+
+    Returns demand, revenue and profit totals per change and the SKUs that gain the
+    most profit at their best change.
     """
     try:
-        response = retail_agent.get_response(query.question)
-        return {"response": response}
+        return await asyncio.to_thread(
+            services.pricing.simulate,
+            scenario.price_changes,
+            scenario.sku_ids,
+            scenario.category,
+            scenario.product_name,
+            scenario.top_n,
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/pricing/optimize")
+async def optimize_pricing(request: PriceOptimization, services: Services = Depends(get_services)):
+    """
+    Recommend next month's profit-maximizing price for the selected SKUs.
+
+    Prices stay within the band [min_change, max_change] around the base price
+    (PRICE_BAND_MIN and PRICE_BAND_MAX by default) and never plan to sell more than
+    the stock. Set include_prices to get the price of every SKU, not just the top_n.
+    """
+    try:
+        return await asyncio.to_thread(
+            services.optimizer.optimize,
+            request.sku_ids,
+            request.category,
+            request.product_name,
+            request.min_change,
+            request.max_change,
+            request.top_n,
+            request.include_prices,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/sessions/stats")
+async def session_stats(services: Services = Depends(get_services)):
+    """
+    Report live conversation threads and eviction counts.
+    """
+    return services.checkpointer.stats()
+
+@app.get("/cache/stats")
+async def cache_stats(services: Services = Depends(get_services)):
+    """
+    Report size and hit/miss counters of the answer and SQL result caches.
+    """
+    return {"responses": services.response_cache.stats(), "sql_results": services.db.result_cache.stats()}
+
+@app.get("/fast_path/stats")
+async def fast_path_stats(services: Services = Depends(get_services)):
+    """
+    Report how many questions were answered from SQL templates without the model.
+    """
+    return services.router.stats() if services.router is not None else {"enabled": False}
+
+@app.get("/examples/stats")
+async def example_stats(services: Services = Depends(get_services)):
+    """
+    Report the stored question/SQL examples and how often a question found similar ones.
+    """
+    return services.example_store.stats() if services.example_store is not None else {"enabled": False}
+
+@app.get("/model_routing/stats")
+async def model_routing_stats(services: Services = Depends(get_services)):
+    """
+    Report how many model calls went to the small and the large model, and why.
+    """
+    stats = getattr(services.llm, "stats", None)
+    return stats() if stats is not None else {"enabled": False}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """
+    Expose LLM, tool, SQL, question and HTTP timings and cache hit rates in Prometheus format.
+    """
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/health")
 async def health_check():
     """
     Check if the API is running.
     """
     return {"status": "healthy"}
+
+@app.get("/ready")
+async def readiness_check():
+    """
+    Check if the worker can answer questions: the agent is built and, if enabled, warmed up.
+
+    Returns 503 while starting up or if startup failed, with the seconds spent per startup stage.
+    """
+    if _services is None or not _services.done() or (_warm_up is not None and not _warm_up.done()):
+        return JSONResponse({"status": "starting", "startup_seconds": startup_seconds}, status_code=503)
+    failed = _startup_failure(_services) or (_startup_failure(_warm_up) if _warm_up is not None else None)
+    if failed is not None:
+        return JSONResponse({"status": "failed", "detail": str(failed), "startup_seconds": startup_seconds}, status_code=503)
+    return {"status": "ready", "startup_seconds": startup_seconds}
+
+
+startup_seconds["import"] = round(time.perf_counter() - _IMPORT_STARTED, 3)
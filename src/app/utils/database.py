@@ -1,11 +1,155 @@
 import os
+import time
+from typing import Any, Optional, Tuple
 from dotenv import load_dotenv
 from langchain_community.utilities import SQLDatabase
+from sqlalchemy import create_engine, event
+from app.utils.cache import LRUCache
+from app.utils.metrics import SQL_QUERY_SECONDS
+from app.utils.query_guard import QueryGuard
+from app.utils.result_format import ResultFormatter
+from app.utils.sql_text import canonicalize_sql, is_single_statement
 
 # Load environment variables
 load_dotenv()
 
+def is_read_only_query(query: str) -> bool:
+    """Return True if the statement is a plain SELECT (optionally with a WITH clause)."""
+    return canonicalize_sql(query).startswith(("select", "with")) and is_single_statement(query)
+
+class RetailSQLDatabase(SQLDatabase):
+    """
+    SQLDatabase that guards and memoizes query results.
+
+    Read-only queries run through a QueryGuard, which refuses unbounded plans, enforces
+    a time budget and caps the result size. Their results are cached under their
+    canonical SQL text in a byte-bounded LRU cache that is bound to the database's data
+    version, so a cached query skips SQLite entirely until the underlying tables change.
+    """
+
+    def __init__(self, engine, result_cache: Optional[LRUCache] = None, guard: Optional[QueryGuard] = None, **kwargs):
+        """
+        Initialize the RetailSQLDatabase.
+
+        Args:
+            engine (Engine): SQLAlchemy engine to run queries on
+            result_cache (LRUCache): Cache for query results, None to disable
+            guard (QueryGuard): Guardrails for read-only queries, None to disable
+            **kwargs: Passed through to SQLDatabase
+        """
+        super().__init__(engine, **kwargs)
+        self.result_cache = result_cache
+        self.guard = guard
+
+    def run(self, command, fetch="all", include_columns: bool = False, *, parameters=None, execution_options=None) -> Any:
+        """Execute a SQL command and return a string representing the results, using the cache when possible."""
+        read_only = (
+            isinstance(command, str)
+            and fetch == "all"
+            and not parameters
+            and not execution_options
+            and is_read_only_query(command)
+        )
+        if not read_only:
+            return super().run(
+                command, fetch, include_columns, parameters=parameters, execution_options=execution_options
+            )
+        started = time.perf_counter()
+        cache, status = "off", "error"
+        try:
+            version = get_data_version(self)
+            if self.guard is not None:
+                self.guard.sync_version(version)
+            if self.result_cache is None or version is None:
+                result = self._run_read_only(command, include_columns)
+            else:
+                self.result_cache.sync_version(version)
+                key = (canonicalize_sql(command), include_columns)
+                result = self.result_cache.get(key)
+                cache = "hit" if result is not None else "miss"
+                if result is None:
+                    result = self._run_read_only(command, include_columns)
+                    self.result_cache.put(key, result)
+            status = "ok"
+            return result
+        finally:
+            SQL_QUERY_SECONDS.observe(time.perf_counter() - started, cache=cache, status=status)
+
+    def warm_up(self) -> None:
+        """
+        Open the connection pool ahead of the first queries.
+
+        Every pooled connection is checked out once, so the connect-time pragmas and
+        memory map are set up, and the guard reads the table row counts it plans with.
+        """
+        pool_size = getattr(self._engine.pool, "size", lambda: 1)()
+        connections = [self._engine.connect() for _ in range(max(pool_size, 1))]
+        try:
+            for connection in connections:
+                connection.exec_driver_sql("SELECT 1").fetchall()
+            if self.guard is not None and self._engine.url.get_backend_name() == "sqlite":
+                self.guard.warm_up(connections[0], get_data_version(self))
+        finally:
+            for connection in connections:
+                connection.close()
+
+    def _run_read_only(self, command: str, include_columns: bool) -> str:
+        if self.guard is None or self._engine.url.get_backend_name() != "sqlite":
+            return super().run(command, "all", include_columns)
+        return self.guard.execute(self._engine, command, include_columns, self._max_string_length)
+
+def _configure_sqlite_connection(dbapi_connection, connection_record) -> None:
+    """Open every pooled SQLite connection read-only, with memory-mapped I/O and a larger page cache."""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA query_only = ON")
+    cursor.execute(f"PRAGMA mmap_size = {int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))}")
+    cursor.execute(f"PRAGMA cache_size = -{int(os.getenv('SQLITE_CACHE_KB', '65536'))}")
+    cursor.execute("PRAGMA temp_store = MEMORY")
+    cursor.close()
+
 def get_database():
     """Get SQLDatabase instance using the database URL from environment variables."""
     database_url = os.getenv("DATABASE_URL", "sqlite:///retail_price_agent_v1.db")
-    return SQLDatabase.from_uri(database_url)
+    result_cache = LRUCache(
+        max_entries=int(os.getenv("SQL_CACHE_MAX_ENTRIES", "4096")),
+        max_bytes=int(os.getenv("SQL_CACHE_MAX_BYTES", str(32 * 1024 * 1024))),
+        sizeof=lambda value: len(str(value).encode("utf-8")),
+    )
+    guard = QueryGuard(
+        max_rows=int(os.getenv("SQL_MAX_ROWS", "200")),
+        max_bytes=int(os.getenv("SQL_MAX_BYTES", "20000")),
+        timeout_seconds=float(os.getenv("SQL_TIMEOUT_SECONDS", "10")),
+        large_table_rows=int(os.getenv("SQL_LARGE_TABLE_ROWS", "100000")),
+        formatter=ResultFormatter(max_tokens=int(os.getenv("SQL_RESULT_MAX_TOKENS", "1500"))),
+    )
+    engine = create_engine(database_url)
+    if engine.url.get_backend_name() == "sqlite":
+        event.listen(engine, "connect", _configure_sqlite_connection)
+    return RetailSQLDatabase(engine, result_cache=result_cache, guard=guard)
+
+def get_sqlite_path(db: SQLDatabase) -> Optional[str]:
+    """Return the file path behind a SQLite SQLDatabase, or None for other databases."""
+    url = db._engine.url
+    if url.get_backend_name() != "sqlite" or url.database in (None, "", ":memory:"):
+        return None
+    return os.path.abspath(url.database)
+
+def get_data_version(db: SQLDatabase) -> Optional[Tuple[int, ...]]:
+    """
+    Return a fingerprint that changes whenever the data in the database changes.
+
+    For a SQLite file this is the modification time and size of the database file and
+    its write-ahead log, which any process committing to the file will bump. Returns
+    None when the database is not a SQLite file and no fingerprint is available.
+    """
+    path = get_sqlite_path(db)
+    if path is None:
+        return None
+    version = ()
+    for file_path in (path, path + "-wal"):
+        try:
+            stat = os.stat(file_path)
+        except FileNotFoundError:
+            continue
+        version += (stat.st_mtime_ns, stat.st_size)
+    return version
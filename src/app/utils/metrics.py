@@ -0,0 +1,258 @@
+import abc
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LLM_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0)
+ROW_BUCKETS = (0, 1, 5, 10, 25, 50, 100, 200, 500, 1000, 10000)
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[Any], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric(abc.ABC):
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    @abc.abstractmethod
+    def samples(self) -> List[str]:
+        """Return the exposition lines of the metric's values."""
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        return "\n".join(lines + self.samples())
+
+
+class Counter(_Metric):
+    """A monotonically increasing count, optionally split by labels."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in values]
+
+
+class Gauge(_Metric):
+    """A value read from a callback at scrape time, e.g. a cache hit rate."""
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        function: Callable[[], Dict[Tuple[str, ...], float]],
+        labelnames: Sequence[str] = (),
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.function = function
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in sorted(self.function().items())
+        ]
+
+
+class Histogram(_Metric):
+    """Observations counted into cumulative buckets, with their sum and count."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # Per label set: non-cumulative bucket counts, sum of observations
+        self._values: Dict[Tuple[str, ...], Tuple[List[int], float]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            counts[index] += 1
+            self._values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        """Observe the duration of the with-block in seconds."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        lines = []
+        for key, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """A set of metrics rendered together in the Prometheus text exposition format."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        """Add a metric, replacing any metric registered under the same name."""
+        with self._lock:
+            self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+LLM_CALL_SECONDS = REGISTRY.register(Histogram(
+    "retail_agent_llm_call_seconds", "Duration of language model calls.", ("model", "status"), LLM_BUCKETS
+))
+LLM_TOKENS = REGISTRY.register(Counter(
+    "retail_agent_llm_tokens_total", "Tokens reported by the language model.", ("model", "kind")
+))
+MODEL_ROUTE_SECONDS = REGISTRY.register(Histogram(
+    "retail_agent_model_tier_seconds", "Duration of routed model calls, by model tier and routing reason.",
+    ("tier", "reason", "status"), LLM_BUCKETS
+))
+TOOL_CALL_SECONDS = REGISTRY.register(Histogram(
+    "retail_agent_tool_call_seconds", "Duration of agent tool calls.", ("tool", "status")
+))
+SQL_QUERY_SECONDS = REGISTRY.register(Histogram(
+    "retail_agent_sql_query_seconds", "Duration of read-only SQL queries, including result cache lookups.", ("cache", "status")
+))
+SQL_ROWS = REGISTRY.register(Histogram(
+    "retail_agent_sql_rows", "Rows returned to the agent per SQL query.", (), ROW_BUCKETS
+))
+QUESTION_SECONDS = REGISTRY.register(Histogram(
+    "retail_agent_question_seconds", "Time to answer a question, by where the answer came from.", ("source",), LLM_BUCKETS
+))
+HTTP_REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "retail_agent_http_request_seconds", "Time until the HTTP response starts.", ("method", "path", "status")
+))
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """Time every language model call and tool call of the agent into the metrics registry."""
+
+    def __init__(self):
+        self._started: Dict[UUID, Tuple[float, str]] = {}
+
+    def _start(self, run_id: UUID, name: str) -> None:
+        self._started[run_id] = (time.perf_counter(), name)
+
+    def _finish(self, run_id: UUID) -> Optional[Tuple[float, str]]:
+        started = self._started.pop(run_id, None)
+        if started is None:
+            return None
+        return time.perf_counter() - started[0], started[1]
+
+    @staticmethod
+    def _model_name(serialized: Optional[Dict[str, Any]], kwargs: Dict[str, Any]) -> str:
+        invocation = kwargs.get("invocation_params") or {}
+        return str(invocation.get("model_name") or invocation.get("model") or (serialized or {}).get("name") or "unknown")
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs) -> None:
+        # A routing model only delegates: the runs of its tier models are timed and counted instead
+        if (kwargs.get("invocation_params") or {}).get("_type") == "routing":
+            return
+        self._start(run_id, self._model_name(serialized, kwargs))
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs) -> None:
+        self._start(run_id, self._model_name(serialized, kwargs))
+
+    def on_llm_end(self, response, *, run_id, **kwargs) -> None:
+        finished = self._finish(run_id)
+        if finished is None:
+            return
+        duration, model = finished
+        LLM_CALL_SECONDS.observe(duration, model=model, status="ok")
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        for generations in response.generations:
+            for generation in generations:
+                usage_metadata = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if usage_metadata:
+                    usage = {"prompt_tokens": usage_metadata.get("input_tokens", 0),
+                             "completion_tokens": usage_metadata.get("output_tokens", 0)}
+        for kind in ("prompt_tokens", "completion_tokens"):
+            if usage.get(kind):
+                LLM_TOKENS.inc(usage[kind], model=model, kind=kind.split("_")[0])
+
+    def on_llm_error(self, error, *, run_id, **kwargs) -> None:
+        finished = self._finish(run_id)
+        if finished is not None:
+            LLM_CALL_SECONDS.observe(finished[0], model=finished[1], status="error")
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs) -> None:
+        self._start(run_id, (serialized or {}).get("name") or kwargs.get("name") or "unknown")
+
+    def on_tool_end(self, output, *, run_id, **kwargs) -> None:
+        finished = self._finish(run_id)
+        if finished is not None:
+            # The SQL tools report database errors as an "Error: ..." result rather than raising
+            status = "error" if str(getattr(output, "content", output)).startswith("Error:") else "ok"
+            TOOL_CALL_SECONDS.observe(finished[0], tool=finished[1], status=status)
+
+    def on_tool_error(self, error, *, run_id, **kwargs) -> None:
+        finished = self._finish(run_id)
+        if finished is not None:
+            TOOL_CALL_SECONDS.observe(finished[0], tool=finished[1], status="error")
@@ -0,0 +1,217 @@
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_community.utilities.sql_database import truncate_word
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import OperationalError, SQLAlchemyError
+
+from app.utils.metrics import SQL_ROWS
+from app.utils.result_format import ResultFormatter
+from app.utils.sql_text import sql_code
+
+# A table in a FROM, JOIN or comma-separated table list and its optional alias
+_TABLE_REFERENCE = re.compile(
+    r'(?:\bfrom|\bjoin|,)\s*"?(\w+)"?'
+    r"(?:\s+(?:as\s+)?(?!(?:on|where|join|from|inner|left|cross|natural|using|group|order|limit)\b)(\w+))?"
+)
+_AGGREGATION = re.compile(r"\b(?:group by|distinct)\b|\b(?:sum|count|avg|min|max|total|group_concat)\s*\(")
+
+
+class QueryRejected(SQLAlchemyError):
+    """Raised when a query is refused or stopped by the guardrails; the message tells the agent how to fix it."""
+
+
+class QueryGuard:
+    """
+    Guardrails for SQL written by the language model.
+
+    Before a query runs, its EXPLAIN QUERY PLAN is inspected: a plan that fully scans two
+    large tables (a cross or unindexed join), or reads a whole large table with no
+    filter, LIMIT or aggregation, is refused. While it runs, SQLite's progress handler
+    stops it once it exceeds its wall-clock budget. Its output is capped in rows and
+    bytes, so no query can pin a worker or flood the prompt. With a formatter, results
+    are rendered as a compact table within its token budget instead of a Python repr.
+    """
+
+    def __init__(
+        self,
+        max_rows: int = 200,
+        max_bytes: int = 20000,
+        timeout_seconds: float = 10.0,
+        large_table_rows: int = 100000,
+        formatter: Optional[ResultFormatter] = None,
+    ):
+        """
+        Initialize the QueryGuard.
+
+        Args:
+            max_rows (int): Maximum number of rows returned to the agent
+            max_bytes (int): Maximum size of the result string returned to the agent
+            timeout_seconds (float): Wall-clock budget of a single query
+            large_table_rows (int): Row count from which a full table scan needs a LIMIT or an aggregation
+            formatter (ResultFormatter): Renders results for the model, None for SQLDatabase.run's format
+        """
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.timeout_seconds = timeout_seconds
+        self.large_table_rows = large_table_rows
+        self.formatter = formatter
+        self._row_counts: Dict[str, int] = {}
+        self._version: Optional[Tuple[int, ...]] = None
+        self._lock = threading.Lock()
+        self.rejected = 0
+        self.timed_out = 0
+        self.truncated = 0
+
+    def _table_rows(self, connection: Connection) -> Dict[str, int]:
+        """Return the (approximate) row count of every table, from ANALYZE statistics when present."""
+        with self._lock:
+            if self._row_counts:
+                return self._row_counts
+        tables = connection.execute(
+            text("SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'")
+        ).scalars().all()
+        try:
+            stats = dict(connection.execute(text("SELECT tbl, stat FROM sqlite_stat1")).fetchall())
+        except OperationalError:
+            stats = {}
+        row_counts = {}
+        for table in tables:
+            stat = stats.get(table)
+            row_counts[table.lower()] = (
+                int(stat.split()[0]) if stat else connection.execute(text(f'SELECT COUNT(*) FROM "{table}"')).scalar()
+            )
+        with self._lock:
+            self._row_counts = row_counts
+        return row_counts
+
+    def sync_version(self, version: Optional[Tuple[int, ...]]) -> None:
+        """Forget the cached row counts when the data version changed."""
+        with self._lock:
+            if version != self._version:
+                self._row_counts.clear()
+                self._version = version
+
+    def warm_up(self, connection: Connection, version: Optional[Tuple[int, ...]]) -> None:
+        """Read the table row counts for the given data version before the first query needs them."""
+        self.sync_version(version)
+        self._table_rows(connection)
+
+    def check_plan(self, connection: Connection, query: str) -> None:
+        """
+        Refuse queries whose plan would scan large tables without bounds.
+
+        Raises:
+            QueryRejected: If the plan is refused
+        """
+        # Literals are emptied, so a 'limit' or 'from t' inside a string neither bounds the query nor names a table
+        code = sql_code(query)
+        row_counts = self._table_rows(connection)
+        aliases = {}
+        for table, alias in _TABLE_REFERENCE.findall(code):
+            if table in row_counts:
+                aliases[table] = table
+                if alias:
+                    aliases[alias] = table
+        plan = connection.execute(text(f"EXPLAIN QUERY PLAN {query}")).fetchall()
+        large_scans: List[str] = []
+        for row in plan:
+            # Older SQLite versions write "SCAN TABLE x"
+            match = re.match(r"SCAN (?:TABLE )?(\w+)", row[-1])
+            if not match:
+                continue
+            table = aliases.get(match.group(1).lower())
+            if table and row_counts[table] >= self.large_table_rows:
+                large_scans.append(table)
+
+        if len(large_scans) >= 2:
+            self.rejected += 1
+            raise QueryRejected(
+                f"Query refused: it scans the large tables {', '.join(large_scans)} in full and combines them row by "
+                "row (a cross join or a join without a usable key). Join on sku_id (and date), filter by sku_id, "
+                "category or date, or aggregate each table separately."
+            )
+        # Only the outermost query bounds the result; a WHERE or LIMIT in a subquery or CTE does not
+        outer = sql_code(query, outer_only=True)
+        unbounded = not re.search(r"\b(?:limit|where)\b", outer) and not _AGGREGATION.search(outer)
+        if large_scans and unbounded:
+            self.rejected += 1
+            raise QueryRejected(
+                f"Query refused: it would return every row of the large table {large_scans[0]}. "
+                "Add a LIMIT, filter by sku_id, category or date, or aggregate the rows."
+            )
+
+    def execute(self, engine: Engine, query: str, include_columns: bool = False, max_string_length: int = 300) -> str:
+        """
+        Run a read-only query under the guardrails and format the result.
+
+        Results are formatted by the formatter if there is one, else like SQLDatabase.run.
+
+        Args:
+            engine (Engine): Engine to run the query on
+            query (str): The SQL query
+            include_columns (bool): Return rows as dicts with column names (the formatter always adds a header)
+            max_string_length (int): Maximum length of a string value in the result
+
+        Returns:
+            str: The result rows, with a note when they were truncated
+
+        Raises:
+            QueryRejected: If the plan is refused or the query runs out of time
+        """
+        with engine.connect() as connection:
+            self.check_plan(connection, query)
+            raw_connection = connection.connection.driver_connection
+            deadline = time.monotonic() + self.timeout_seconds
+            raw_connection.set_progress_handler(lambda: 1 if time.monotonic() > deadline else 0, 10000)
+            try:
+                result = connection.execute(text(query))
+                if not result.returns_rows:
+                    return ""
+                columns = list(result.keys())
+                rows = result.fetchmany(self.max_rows + 1)
+            except OperationalError as e:
+                if "interrupted" not in str(e.orig):
+                    raise
+                self.timed_out += 1
+                raise QueryRejected(
+                    f"Query stopped after exceeding its {self.timeout_seconds:g}s time budget. Filter by sku_id, "
+                    "category or date, use the summary tables, or simplify the joins."
+                ) from e
+            finally:
+                raw_connection.set_progress_handler(None, 0)
+
+        more_rows = len(rows) > self.max_rows
+        rows = rows[: self.max_rows]
+        SQL_ROWS.observe(len(rows))
+        if self.formatter is not None:
+            output, truncated = self.formatter.format(columns, rows, more_rows, max_string_length)
+            if len(output) > self.max_bytes:
+                output, truncated = output[: self.max_bytes] + f"\n(Result cut at {self.max_bytes} characters.)", True
+            self.truncated += truncated
+            return output
+        formatted: List[Any] = [
+            {column: truncate_word(value, length=max_string_length) for column, value in row._asdict().items()}
+            for row in rows
+        ]
+        if not include_columns:
+            formatted = [tuple(row.values()) for row in formatted]
+        output = str(formatted) if formatted else ""
+
+        note = None
+        if len(output) > self.max_bytes:
+            output = output[: self.max_bytes]
+            note = f"(Result cut at {self.max_bytes} characters.)"
+        elif more_rows:
+            note = f"(Showing the first {self.max_rows} rows; the query returned more.)"
+        if note:
+            self.truncated += 1
+            output += f"\n{note} Add a LIMIT or aggregate to see the rest."
+        return output
+
+    def stats(self) -> Dict[str, Any]:
+        """Return how many queries were refused, timed out or truncated."""
+        return {"rejected": self.rejected, "timed_out": self.timed_out, "truncated": self.truncated}
@@ -0,0 +1,98 @@
+import datetime
+import decimal
+import math
+from typing import Any, Optional, Sequence, Tuple
+
+
+class ResultFormatter:
+    """
+    Renders SQL results compactly for the model.
+
+    Rows become a header line of column names followed by one line per row, cells
+    separated by "|", instead of a Python repr of tuples.
+    Numbers are rounded to what an answer needs: whole numbers without decimals, other
+    values of 1 or more to at most two decimals, and small fractions (margins,
+    elasticities) to three significant digits. Midnight timestamps are shown as dates. Rows are added until the approximate token budget is
+    spent; a final line then says how many rows were left out.
+    """
+
+    def __init__(self, max_tokens: int = 1500, max_string_length: int = 100, chars_per_token: float = 4.0):
+        """
+        Initialize the ResultFormatter.
+
+        Args:
+            max_tokens (int): Approximate token budget of a formatted result
+            max_string_length (int): Maximum length of a text value
+            chars_per_token (float): Characters counted as one token
+        """
+        self.max_tokens = max_tokens
+        self.max_string_length = max_string_length
+        self.chars_per_token = chars_per_token
+
+    @staticmethod
+    def format_number(value: float) -> str:
+        if math.isnan(value) or math.isinf(value):
+            return str(value)
+        if value.is_integer():
+            return str(int(value))
+        if abs(value) >= 1:
+            return f"{value:.2f}".rstrip("0").rstrip(".")
+        return f"{value:.3g}"
+
+    def cell(self, value: Any, max_string_length: int) -> str:
+        if value is None:
+            return ""
+        if isinstance(value, bool):
+            return str(value)
+        if isinstance(value, (float, decimal.Decimal)):
+            return self.format_number(float(value))
+        if isinstance(value, (datetime.date, datetime.datetime)):
+            return value.isoformat()
+        if isinstance(value, bytes):
+            return f"<{len(value)} bytes>"
+        text = " ".join(str(value).split()).replace("|", "\\|")
+        # Dates stored as midnight timestamps
+        if len(text) == 19 and text.endswith(" 00:00:00") and text[4] == "-":
+            text = text[:10]
+        if len(text) > max_string_length:
+            text = text[: max_string_length - 3] + "..."
+        return text
+
+    def format(
+        self,
+        columns: Sequence[str],
+        rows: Sequence[Sequence[Any]],
+        more_rows: bool = False,
+        max_string_length: Optional[int] = None,
+    ) -> Tuple[str, bool]:
+        """
+        Format a query result as pipe-separated lines within the token budget.
+
+        Args:
+            columns (list): Column names
+            rows (list): Result rows
+            more_rows (bool): The query returned more rows than were fetched
+            max_string_length (int): Maximum length of a text value, defaults to the formatter's
+
+        Returns:
+            tuple: The formatted result ("" for no rows) and whether rows were left out
+        """
+        if not rows:
+            return "", False
+        max_string_length = max_string_length or self.max_string_length
+        lines = ["|".join(self.cell(column, max_string_length) for column in columns)]
+        budget = self.max_tokens * self.chars_per_token - len(lines[0])
+        shown = 0
+        for row in rows:
+            line = "|".join(self.cell(value, max_string_length) for value in row)
+            budget -= len(line) + 1
+            if budget < 0 and shown:
+                break
+            lines.append(line)
+            shown += 1
+
+        truncated = shown < len(rows) or more_rows
+        if truncated:
+            total = f"more than {len(rows)}" if more_rows else str(len(rows))
+            lines.append(f"(Showing {shown} of {total} rows. Add a LIMIT or aggregate to see the rest.)")
+        return "\n".join(lines), truncated
@@ -0,0 +1,95 @@
+import threading
+from typing import Any, Dict, List, Optional
+
+from langchain_community.utilities import SQLDatabase
+from sqlalchemy import text
+
+
+class SchemaSnapshot:
+    """
+    A snapshot of the live database schema, rendered for the agent's prompt.
+
+    The snapshot holds each table's DDL, column names and types, row count and a few
+    sample rows. It is captured once and only recaptured when SQLite's schema_version
+    changes, so the agent can answer without calling the discovery tools.
+    """
+
+    def __init__(self, db: SQLDatabase, sample_rows: int = 3):
+        """
+        Initialize the SchemaSnapshot and capture the current schema.
+
+        Args:
+            db (SQLDatabase): The database to describe
+            sample_rows (int): Number of sample rows shown per table
+        """
+        self.db = db
+        self.sample_rows = sample_rows
+        self.tables: Dict[str, Dict[str, Any]] = {}
+        self.schema_version: Optional[int] = None
+        self._text = ""
+        self._lock = threading.Lock()
+        self.refresh()
+
+    def _read_schema_version(self, connection) -> int:
+        return connection.execute(text("PRAGMA schema_version")).scalar()
+
+    def current_schema_version(self) -> int:
+        """Return SQLite's schema_version, which changes on every DDL statement."""
+        with self.db._engine.connect() as connection:
+            return self._read_schema_version(connection)
+
+    def refresh(self) -> None:
+        """Recapture DDL, columns, row counts and sample rows of every table."""
+        tables = {}
+        with self.db._engine.connect() as connection:
+            schema_version = self._read_schema_version(connection)
+            ddls = connection.execute(
+                text("SELECT name, sql FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name")
+            ).fetchall()
+            for table, ddl in ddls:
+                columns = [
+                    (row[1], row[2] or "ANY")
+                    for row in connection.execute(text(f'PRAGMA table_info("{table}")'))
+                ]
+                row_count = connection.execute(text(f'SELECT COUNT(*) FROM "{table}"')).scalar()
+                samples = connection.execute(
+                    text(f'SELECT * FROM "{table}" LIMIT {int(self.sample_rows)}')
+                ).fetchall()
+                tables[table] = {
+                    "ddl": ddl,
+                    "columns": columns,
+                    "row_count": row_count,
+                    "sample_rows": [tuple(row) for row in samples],
+                }
+        with self._lock:
+            self.tables = tables
+            self.schema_version = schema_version
+            self._text = self._render()
+
+    def refresh_if_changed(self) -> bool:
+        """
+        Recapture the snapshot if the schema changed since it was taken.
+
+        Returns:
+            bool: True if the snapshot was refreshed
+        """
+        if self.current_schema_version() == self.schema_version:
+            return False
+        self.refresh()
+        return True
+
+    def _render(self) -> str:
+        sections: List[str] = []
+        for table, info in self.tables.items():
+            header = " | ".join(name for name, _ in info["columns"])
+            samples = "\n".join(" | ".join(str(value) for value in row) for row in info["sample_rows"])
+            sections.append(
+                f"{info['ddl'].strip()}\n"
+                f"/* {info['row_count']} rows. Sample rows:\n{header}\n{samples}\n*/"
+            )
+        return "\n\n".join(sections)
+
+    def describe(self) -> str:
+        """Return the snapshot as CREATE TABLE statements followed by row counts and sample rows."""
+        with self._lock:
+            return self._text
@@ -0,0 +1,81 @@
+import re
+
+# String literals, quoted identifiers, comments, whitespace, or any other run of characters
+_SQL_TOKEN = re.compile(
+    r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|`[^`]*`|\[[^\]]*\]|--[^\n]*|/\*.*?\*/|\s+|[^\s'\"`\[]+|.",
+    re.DOTALL,
+)
+
+
+def canonicalize_sql(query: str) -> str:
+    """
+    Reduce a SQL statement to a canonical form for use as a cache key.
+
+    Comments are removed, whitespace is collapsed and everything outside string
+    literals and quoted identifiers is lowercased, so queries that differ only in
+    formatting or keyword case map to the same key.
+    """
+    # Runs of code between literals; whitespace and operator spacing are only normalized within them
+    parts = []
+    code = []
+
+    def flush_code() -> None:
+        if code:
+            text = re.sub(r" +", " ", "".join(code))
+            parts.append(re.sub(r" ?([(),=<>*+/-]) ?", r"\1", text))
+            code.clear()
+
+    for token in _SQL_TOKEN.findall(query):
+        if token.startswith(("--", "/*")) or token.isspace():
+            code.append(" ")
+        elif token[0] in "'\"`[":
+            flush_code()
+            parts.append(token)
+        else:
+            code.append(token.lower())
+    flush_code()
+    return "".join(parts).strip().rstrip("; ").strip()
+
+
+def sql_code(query: str, outer_only: bool = False) -> str:
+    """
+    Return the code of a SQL statement, with every string literal emptied to ''.
+
+    Comments are removed, whitespace is collapsed and the code is lowercased, so
+    keywords can be searched for without matching text inside literals. With
+    outer_only, whatever is inside parentheses (subqueries, CTE bodies, function
+    arguments) is dropped too, leaving only the clauses of the outermost query.
+    """
+    parts = []
+    depth = 0
+    for token in _SQL_TOKEN.findall(query):
+        if token.startswith(("--", "/*")) or token.isspace():
+            parts.append(" ")
+        elif token[0] in "'\"`[":
+            if depth == 0:
+                parts.append("''" if token[0] == "'" else token)
+        elif not outer_only:
+            parts.append(token.lower())
+        else:
+            # Keep the parentheses of the outermost level, drop what is between them
+            for char in token.lower():
+                if char == "(":
+                    depth += 1
+                    if depth == 1:
+                        parts.append(char)
+                elif char == ")":
+                    depth = max(depth - 1, 0)
+                    if depth == 0:
+                        parts.append(char)
+                elif depth == 0:
+                    parts.append(char)
+    return re.sub(r" +", " ", "".join(parts)).strip().rstrip("; ").strip()
+
+
+def is_single_statement(query: str) -> bool:
+    """Return True if the query holds one statement, i.e. no ';' outside literals and comments except trailing ones."""
+    code = "".join(
+        " " if token[0] in "'\"`[" or token.startswith(("--", "/*")) else token
+        for token in _SQL_TOKEN.findall(query)
+    )
+    return ";" not in code.strip().rstrip("; ")
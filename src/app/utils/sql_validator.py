@@ -0,0 +1,159 @@
+import difflib
+import json
+import re
+import sqlite3
+from typing import Any, Dict, List, Optional
+
+from langchain_community.utilities import SQLDatabase
+from langchain_core.tools import BaseTool, tool
+
+from app.utils.database import get_sqlite_path
+from app.utils.sql_text import canonicalize_sql, is_single_statement
+
+# Authorizer actions a read-only query is allowed to perform while being compiled
+_ALLOWED_ACTIONS = {
+    sqlite3.SQLITE_SELECT,
+    sqlite3.SQLITE_READ,
+    sqlite3.SQLITE_FUNCTION,
+    getattr(sqlite3, "SQLITE_RECURSIVE", 33),
+}
+
+# Leading keywords of statements that change the database or the connection
+_WRITE_KEYWORDS = {
+    "insert", "update", "delete", "replace", "upsert", "merge", "drop", "create", "alter",
+    "truncate", "attach", "detach", "pragma", "vacuum", "reindex", "analyze", "begin", "commit",
+}
+
+
+class SQLValidator:
+    """
+    Validate agent SQL locally, without a model call.
+
+    The query is compiled (never executed) by SQLite itself against a read-only
+    connection to the real database, so syntax and every table and column name are
+    checked exactly as SQLite would. An authorizer rejects anything but reads, and
+    unknown names come back with the closest names from the live schema.
+    """
+
+    def __init__(self, db: SQLDatabase):
+        """
+        Initialize the SQLValidator.
+
+        Args:
+            db (SQLDatabase): The SQLite database queries are validated against
+        """
+        self.path = get_sqlite_path(db)
+        self._schema_version: Optional[int] = None
+        self._columns: Dict[str, List[str]] = {}
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+        connection.set_authorizer(
+            lambda action, *args: sqlite3.SQLITE_OK if action in _ALLOWED_ACTIONS else sqlite3.SQLITE_DENY
+        )
+        return connection
+
+    def _load_schema(self, connection: sqlite3.Connection) -> None:
+        """Read table and column names, only when the schema changed since the last read."""
+        connection.set_authorizer(None)
+        schema_version = connection.execute("PRAGMA schema_version").fetchone()[0]
+        if schema_version != self._schema_version:
+            tables = [
+                row[0]
+                for row in connection.execute(
+                    "SELECT name FROM sqlite_master WHERE type IN ('table', 'view') AND name NOT LIKE 'sqlite_%'"
+                )
+            ]
+            self._columns = {
+                table: [row[1] for row in connection.execute(f'PRAGMA table_info("{table}")')]
+                for table in tables
+            }
+            self._schema_version = schema_version
+
+    def _describe_error(self, message: str) -> Dict[str, Any]:
+        """Turn an SQLite compile error into a structured error with a suggested fix."""
+        match = re.match(r"no such table: (?:\w+\.)?(\S+)", message)
+        if match:
+            name = match.group(1)
+            close = difflib.get_close_matches(name, list(self._columns), n=1, cutoff=0.6)
+            return {
+                "code": "unknown_table",
+                "name": name,
+                "message": message,
+                "suggestion": f"Did you mean table {close[0]}?" if close
+                else f"Available tables: {', '.join(sorted(self._columns))}",
+            }
+        match = re.match(r"no such column: (\S+)", message)
+        if match:
+            name = match.group(1).split(".")[-1]
+            all_columns = sorted({column for columns in self._columns.values() for column in columns})
+            close = difflib.get_close_matches(name, all_columns, n=1, cutoff=0.6)
+            suggestion = None
+            if close:
+                tables = [table for table, columns in self._columns.items() if close[0] in columns]
+                suggestion = f"Did you mean column {close[0]} (in {', '.join(sorted(tables))})?"
+            return {"code": "unknown_column", "name": name, "message": message, "suggestion": suggestion}
+        if message.startswith("ambiguous column name"):
+            return {
+                "code": "ambiguous_column",
+                "message": message,
+                "suggestion": "Qualify the column with its table name or alias.",
+            }
+        if message == "not authorized":
+            return {
+                "code": "not_read_only",
+                "message": "The query uses an operation that is not allowed in a read-only query.",
+                "suggestion": "Only SELECT queries over the data tables are allowed.",
+            }
+        if "syntax error" in message or message.startswith("incomplete input"):
+            return {"code": "syntax_error", "message": message, "suggestion": None}
+        return {"code": "sql_error", "message": message, "suggestion": None}
+
+    def validate(self, query: str) -> Dict[str, Any]:
+        """
+        Check a query without running it.
+
+        Args:
+            query (str): The SQL query to check
+
+        Returns:
+            dict: {"valid": bool, "errors": [{"code", "message", "suggestion", ...}]}
+        """
+        if not query or not query.strip():
+            return {"valid": False, "errors": [{"code": "empty_query", "message": "The query is empty.", "suggestion": None}]}
+        first_keyword = re.match(r"[a-z]*", canonicalize_sql(query)).group(0)
+        if first_keyword in _WRITE_KEYWORDS or not is_single_statement(query):
+            return {
+                "valid": False,
+                "errors": [{
+                    "code": "not_read_only",
+                    "message": "Only a single SELECT statement is allowed.",
+                    "suggestion": "Remove any INSERT, UPDATE, DELETE, DDL or additional statements.",
+                }],
+            }
+        if self.path is None:
+            return {"valid": True, "errors": [], "note": "Only SQLite databases are validated."}
+        connection = self._connect()
+        try:
+            connection.execute(f"EXPLAIN {query.strip().rstrip(';')}")
+            return {"valid": True, "errors": []}
+        except sqlite3.DatabaseError as e:
+            self._load_schema(connection)
+            return {"valid": False, "errors": [self._describe_error(str(e))]}
+        finally:
+            connection.close()
+
+
+def create_query_checker_tool(validator: SQLValidator) -> BaseTool:
+    """Build an sql_db_query_checker tool backed by the local validator instead of an LLM."""
+
+    @tool("sql_db_query_checker")
+    def sql_db_query_checker(query: str) -> str:
+        """
+        Use this tool to check if your query is correct before executing it.
+        It compiles the query against the real database without running it and
+        returns JSON: {"valid": true} or the errors with suggested fixes.
+        """
+        return json.dumps(validator.validate(query))
+
+    return sql_db_query_checker
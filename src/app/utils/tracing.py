@@ -0,0 +1,218 @@
+import atexit
+import contextvars
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+try:
+    from langfuse.langchain import CallbackHandler
+except ImportError:  # Langfuse is optional: without it tracing is off
+    CallbackHandler = None
+
+logger = logging.getLogger(__name__)
+
+# Callback events forwarded to the tracing handler
+_EVENTS = (
+    "on_llm_start", "on_chat_model_start", "on_llm_new_token", "on_llm_end", "on_llm_error",
+    "on_chain_start", "on_chain_end", "on_chain_error",
+    "on_tool_start", "on_tool_end", "on_tool_error",
+    "on_retriever_start", "on_retriever_end", "on_retriever_error",
+    "on_agent_action", "on_agent_finish", "on_text", "on_retry", "on_custom_event",
+)
+
+
+class _Trace:
+    """The tracing handler of one sampled question and the context its events run in."""
+
+    def __init__(self, handler: BaseCallbackHandler):
+        self.handler = handler
+        # An empty context per trace, so spans of concurrent questions never nest into each other
+        self.context = contextvars.Context()
+        self.dropped = False
+
+
+class _QueuedCallbackHandler(BaseCallbackHandler):
+    """Puts callback events on the tracer's queue instead of handling them on the caller's thread."""
+
+    # Enqueueing is cheap, so run inline (also in async runs) and keep the events in order
+    run_inline = True
+
+    def __init__(self, tracer: "Tracer", trace: _Trace):
+        self.tracer = tracer
+        self.trace = trace
+
+
+def _forward(event: str) -> Callable[..., None]:
+    def forward(self, *args, **kwargs) -> None:
+        self.tracer._submit(self.trace, event, args, kwargs)
+
+    forward.__name__ = event
+    return forward
+
+
+for _event in _EVENTS:
+    setattr(_QueuedCallbackHandler, _event, _forward(_event))
+
+
+class Tracer:
+    """
+    Sampled tracing of agent runs, exported off the request path.
+
+    Each question is traced with probability sample_rate. The callback events of a
+    traced question are only put on a bounded queue on the request path; a single
+    background thread hands them to the tracing handler (Langfuse's CallbackHandler),
+    which does the span bookkeeping and export. When the queue is full the rest of
+    that question's events are dropped rather than waiting, so a slow or unreachable
+    tracing backend never slows down answers. Without a handler factory the tracer is
+    a no-op and callbacks() returns no handlers.
+    """
+
+    def __init__(
+        self,
+        handler_factory: Optional[Callable[[], BaseCallbackHandler]] = None,
+        sample_rate: float = 1.0,
+        max_queue_size: int = 10000,
+    ):
+        """
+        Initialize the Tracer.
+
+        Args:
+            handler_factory (callable): Returns a new tracing handler per traced question, None to disable tracing
+            sample_rate (float): Fraction of questions traced, 0 to 1
+            max_queue_size (int): Callback events waiting for export before new events are dropped
+        """
+        if not 0.0 <= sample_rate <= 1.0:
+            raise ValueError(f"sample_rate must be between 0 and 1, got {sample_rate}")
+        self.handler_factory = handler_factory
+        self.sample_rate = sample_rate
+        self._queue: "queue.Queue" = queue.Queue(max_queue_size)
+        self._worker: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.sampled = 0
+        self.skipped = 0
+        self.dropped_events = 0
+        self.failed_events = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.handler_factory is not None and self.sample_rate > 0
+
+    def callbacks(self) -> List[BaseCallbackHandler]:
+        """
+        Return the callbacks to run a question with: a queued tracing handler if it is sampled, else none.
+        """
+        if not self.enabled or random.random() >= self.sample_rate:
+            self.skipped += 1
+            return []
+        try:
+            handler = self.handler_factory()
+        except Exception:
+            logger.exception("Could not create the tracing handler")
+            self.skipped += 1
+            return []
+        # Start the worker after the handler so its atexit flush runs before the exporter shuts down
+        self._ensure_worker()
+        self.sampled += 1
+        return [_QueuedCallbackHandler(self, _Trace(handler))]
+
+    def _ensure_worker(self) -> None:
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="tracing-export", daemon=True)
+                self._worker.start()
+                atexit.register(self.shutdown)
+
+    def _submit(self, trace: _Trace, event: str, args: tuple, kwargs: Dict[str, Any]) -> None:
+        # Once an event of a trace is lost, the rest of it would only produce orphaned spans
+        if trace.dropped:
+            self.dropped_events += 1
+            return
+        try:
+            self._queue.put_nowait((trace, event, args, kwargs))
+        except queue.Full:
+            trace.dropped = True
+            self.dropped_events += 1
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                trace, event, args, kwargs = item
+                handler_method = getattr(trace.handler, event, None)
+                if handler_method is not None:
+                    trace.context.run(handler_method, *args, **kwargs)
+            except Exception:
+                self.failed_events += 1
+                logger.debug("Tracing handler failed", exc_info=True)
+            finally:
+                self._queue.task_done()
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """
+        Wait until the queued events have been handed to the tracing handler.
+
+        Returns:
+            bool: True if the queue drained within the timeout
+        """
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if self._worker is None or time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        """Flush the queue and stop the background thread."""
+        with self._lock:
+            worker, self._worker = self._worker, None
+        if worker is None:
+            return
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+        try:
+            self._queue.put(None, timeout=max(deadline - time.monotonic(), 0.01))
+        except queue.Full:
+            return
+        worker.join(max(deadline - time.monotonic(), 0.01))
+
+    def stats(self) -> dict:
+        """Return how many questions were traced and how many events were lost."""
+        return {
+            "enabled": self.enabled,
+            "sample_rate": self.sample_rate,
+            "sampled": self.sampled,
+            "skipped": self.skipped,
+            "queued_events": self._queue.qsize(),
+            "dropped_events": self.dropped_events,
+            "failed_events": self.failed_events,
+        }
+
+
+def get_tracer() -> Tracer:
+    """
+    Create the Tracer configured by the environment.
+
+    Tracing is off when Langfuse is not installed, LANGFUSE_TRACING_ENABLED is
+    "false" or no LANGFUSE_PUBLIC_KEY is set. TRACING_SAMPLE_RATE (default 1.0) is
+    the fraction of questions traced and TRACING_QUEUE_SIZE (default 10000) bounds
+    the events waiting for export.
+    """
+    enabled = (
+        CallbackHandler is not None
+        and os.getenv("LANGFUSE_TRACING_ENABLED", "true").lower() != "false"
+        and bool(os.getenv("LANGFUSE_PUBLIC_KEY"))
+    )
+    return Tracer(
+        CallbackHandler if enabled else None,
+        sample_rate=float(os.getenv("TRACING_SAMPLE_RATE", "1.0")),
+        max_queue_size=int(os.getenv("TRACING_QUEUE_SIZE", "10000")),
+    )
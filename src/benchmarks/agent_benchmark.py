@@ -0,0 +1,174 @@
+"""
+Offline end-to-end latency benchmark of RetailAgent.
+
+Generates a synthetic database (or uses --db), replaces ChatOpenAI with
+ScriptedChatModel replaying benchmarks/trajectories.json, and runs every question
+through the real agent graph, tools and SQL, with and without schema discovery.
+With --small-llm-latency-ms it also runs a "tiered" configuration, where a
+RoutingChatModel sends tool and SQL steps to a faster scripted model and only the
+answers to one with --llm-latency-ms. Reports latency percentiles, tool calls,
+estimated prompt tokens, SQL time and the share of large-model calls per question. Nothing leaves the machine, so it can run in CI: save a run with --json and
+pass it back as --baseline to fail when p95 latency or prompt tokens regress.
+
+Usage (from src/):
+    python benchmarks/agent_benchmark.py --skus 2000 --repeat 5 --llm-latency-ms 50 --json run.json
+    python benchmarks/agent_benchmark.py --skus 2000 --llm-latency-ms 800 --small-llm-latency-ms 250
+    python benchmarks/agent_benchmark.py --skus 2000 --baseline run.json --tolerance 0.2
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import uuid
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+sys.path.insert(0, os.path.join(HERE, "..", "data_generation"))
+sys.path.insert(0, HERE)
+
+# No tracing export: the benchmark must not touch the network
+os.environ["LANGFUSE_TRACING_ENABLED"] = "false"
+
+from scripted_llm import ScriptedChatModel  # noqa: E402
+from synthetic_data import generate_database  # noqa: E402
+
+# Configuration name: (skip_discovery, tiered models)
+CONFIGURATIONS = {"discovery": (False, False), "skip_discovery": (True, False)}
+
+
+def instrument_sql(db) -> list:
+    """Time every query the agent's SQL tools run; returns the list the timings are appended to."""
+    timings = []
+    run = db.run
+
+    def timed_run(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return run(*args, **kwargs)
+        finally:
+            timings.append(time.perf_counter() - started)
+
+    db.run = timed_run
+    return timings
+
+
+def run_configuration(db, sql_timings: list, args, skip_discovery: bool, tiered: bool = False) -> dict:
+    from app.core.agent import RetailAgent
+    from app.core.model_routing import RoutingChatModel
+
+    llm = ScriptedChatModel.from_file(
+        args.trajectories, latency_ms=args.llm_latency_ms, ms_per_1k_prompt_tokens=args.ms_per_1k_tokens
+    )
+    model = llm
+    if tiered:
+        # The copy shares the calls list, so both tiers replay the same trajectories
+        small = llm.model_copy(update={"latency_ms": args.small_llm_latency_ms})
+        model = RoutingChatModel(small=small, large=llm)
+    agent = RetailAgent(db, llm=model, skip_discovery=skip_discovery)
+    questions = list(llm.trajectories)
+    agent.get_response(questions[0], uuid.uuid4().hex)  # warm up imports, schema snapshot and page cache
+    warm_up_calls = len(llm.calls)
+    warm_up_large = model.stats()["calls"]["large"] if tiered else 0
+
+    latencies, tool_calls, prompt_tokens, sql_ms = [], [], [], []
+    for _ in range(args.repeat):
+        for question in questions:
+            if db.result_cache is not None:
+                db.result_cache.clear()
+            first_call, first_query = len(llm.calls), len(sql_timings)
+            started = time.perf_counter()
+            agent.get_response(question, uuid.uuid4().hex)
+            latencies.append((time.perf_counter() - started) * 1000)
+            calls = llm.calls[first_call:]
+            tool_calls.append(sum(call["tool_calls"] for call in calls))
+            prompt_tokens.append(sum(call["prompt_tokens"] for call in calls))
+            sql_ms.append(sum(sql_timings[first_query:]) * 1000)
+    large_calls = model.stats()["calls"]["large"] - warm_up_large if tiered else len(llm.calls) - warm_up_calls
+    return {
+        "questions": len(latencies),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "mean_ms": float(np.mean(latencies)),
+        "tool_calls": float(np.mean(tool_calls)),
+        "prompt_tokens": float(np.mean(prompt_tokens)),
+        "sql_ms": float(np.mean(sql_ms)),
+        "large_share": large_calls / max(len(llm.calls) - warm_up_calls, 1),
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Return the metrics that got worse than the baseline by more than the tolerance."""
+    regressions = []
+    for name, metrics in results.items():
+        for metric in ("p95_ms", "prompt_tokens", "tool_calls"):
+            before = baseline.get(name, {}).get(metric)
+            if before and metrics[metric] > before * (1 + tolerance):
+                regressions.append(f"{name} {metric}: {before:.1f} -> {metrics[metric]:.1f}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark RetailAgent end to end with a scripted, offline model.")
+    parser.add_argument("--db", help="existing database to use instead of generating one")
+    parser.add_argument("--skus", type=int, default=2000, help="SKUs in the generated database")
+    parser.add_argument("--repeat", type=int, default=3, help="runs of the whole question set per configuration")
+    parser.add_argument("--trajectories", default=os.path.join(HERE, "trajectories.json"), help="recorded trajectories")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="simulated latency of every model call")
+    parser.add_argument("--small-llm-latency-ms", type=float, help="also run with tiered models, the small one this fast")
+    parser.add_argument("--ms-per-1k-tokens", type=float, default=0.0, help="simulated latency per 1k prompt tokens")
+    parser.add_argument("--sql-cache", action="store_true", help="keep the SQL result cache between questions")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="results of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression against the baseline")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    try:
+        path = args.db
+        if path is None:
+            path = os.path.join(workdir, "benchmark.db")
+            generate_database(path, args.skus, "2023-06-01", "2025-08-01", 6, 42)
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.abspath(path)}"
+
+        from app.utils.database import get_database
+
+        db = get_database()
+        if not args.sql_cache:
+            db.result_cache = None
+        sql_timings = instrument_sql(db)
+        configurations = dict(CONFIGURATIONS)
+        if args.small_llm_latency_ms is not None:
+            configurations["tiered"] = (True, True)
+        results = {
+            name: run_configuration(db, sql_timings, args, skip_discovery, tiered)
+            for name, (skip_discovery, tiered) in configurations.items()
+        }
+    finally:
+        shutil.rmtree(workdir)
+
+    print(f"{'configuration':16} {'p50 ms':>8} {'p95 ms':>8} {'mean ms':>8} {'tools':>6} {'prompt tok':>10} {'sql ms':>8} {'large':>6}")
+    for name, metrics in results.items():
+        print(
+            f"{name:16} {metrics['p50_ms']:8.1f} {metrics['p95_ms']:8.1f} {metrics['mean_ms']:8.1f} "
+            f"{metrics['tool_calls']:6.1f} {metrics['prompt_tokens']:10.0f} {metrics['sql_ms']:8.2f} {metrics['large_share']:6.0%}"
+        )
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+A scripted, offline stand-in for ChatOpenAI.
+
+Replays recorded tool-call trajectories: for each question it returns the recorded
+steps one model call at a time, so RetailAgent runs its real graph, tools and SQL
+without any network or API cost. Steps that call a tool the agent did not bind (e.g.
+the discovery tools when skip_discovery is on) are skipped, so the same trajectory
+exercises every agent configuration. Every call is recorded with an estimate of its
+prompt tokens.
+"""
+
+import asyncio
+import json
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from pydantic import Field
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate the token count of a text, about four characters per token."""
+    return (len(text) + 3) // 4
+
+
+class ScriptedChatModel(BaseChatModel):
+    """Chat model that replays recorded trajectories instead of calling an API."""
+
+    trajectories: Dict[str, List[Dict[str, Any]]]
+    latency_ms: float = 0.0
+    ms_per_1k_prompt_tokens: float = 0.0
+    tool_names: Optional[List[str]] = None
+    tool_schema: str = ""
+    calls: List[Dict[str, Any]] = Field(default_factory=list)
+
+    @classmethod
+    def from_file(cls, path: str, **kwargs) -> "ScriptedChatModel":
+        """Load trajectories saved as a JSON list of {"question", "steps"} objects."""
+        with open(path) as f:
+            recorded = json.load(f)
+        return cls(trajectories={item["question"]: item["steps"] for item in recorded}, **kwargs)
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def bind_tools(self, tools, **kwargs):
+        schemas = [convert_to_openai_tool(tool) for tool in tools]
+        # The copy shares the calls list, so calls through the bound model are recorded here too
+        return self.model_copy(update={
+            "tool_names": [schema["function"]["name"] for schema in schemas],
+            "tool_schema": json.dumps(schemas),
+        })
+
+    def _next_message(self, messages: List[BaseMessage]) -> AIMessage:
+        turn_start = max(i for i, message in enumerate(messages) if isinstance(message, HumanMessage))
+        question = messages[turn_start].content
+        done = sum(isinstance(message, AIMessage) for message in messages[turn_start + 1:])
+        steps = [
+            step for step in self.trajectories.get(question, [])
+            if self.tool_names is None or all(call["name"] in self.tool_names for call in step.get("tool_calls", []))
+        ]
+        step = steps[done] if done < len(steps) else {"content": "I could not answer this question."}
+
+        prompt = self.tool_schema + "".join(str(message.content) for message in messages)
+        prompt += "".join(json.dumps(call["args"]) for message in messages for call in getattr(message, "tool_calls", []))
+        tool_calls = [
+            {"name": call["name"], "args": call["args"], "id": f"call_{uuid.uuid4().hex[:12]}"}
+            for call in step.get("tool_calls", [])
+        ]
+        self.calls.append({"question": question, "prompt_tokens": estimate_tokens(prompt), "tool_calls": len(tool_calls)})
+        return AIMessage(
+            content=step.get("content", ""),
+            tool_calls=tool_calls,
+            response_metadata={"finish_reason": "tool_calls" if tool_calls else "stop"},
+        )
+
+    def _delay(self) -> float:
+        tokens = self.calls[-1]["prompt_tokens"] if self.calls else 0
+        return (self.latency_ms + self.ms_per_1k_prompt_tokens * tokens / 1000) / 1000
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        message = self._next_message(messages)
+        time.sleep(self._delay())
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        message = self._next_message(messages)
+        await asyncio.sleep(self._delay())
+        return ChatResult(generations=[ChatGeneration(message=message)])
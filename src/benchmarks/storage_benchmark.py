@@ -0,0 +1,89 @@
+"""
+Before/after benchmark of the tuned SQLite storage layout.
+
+Generates one synthetic database, copies it, tunes the copy with
+data_generation/storage.py (indexes, WAL, ANALYZE) and times representative agent
+queries on both. The tuned copy is opened with the same pragmas get_database uses.
+
+Usage (from src/):
+    python benchmarks/storage_benchmark.py --skus 100000 --repeat 5
+"""
+
+import argparse
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data_generation"))
+
+from storage import tune_database  # noqa: E402
+from synthetic_data import generate_database  # noqa: E402
+
+QUERIES = {
+    "history of one SKU": "SELECT date, units_sold, revenue FROM historical_data WHERE sku_id = 4242 ORDER BY date",
+    "monthly revenue of a category": """
+        SELECT date, SUM(revenue) FROM historical_data
+        WHERE category = 'men' AND date >= '2025-01-01' GROUP BY date""",
+    "revenue of a product in a category": """
+        SELECT SUM(revenue) FROM historical_data WHERE product_name = 't-shirt' AND category = 'men'""",
+    "latest price vs competitor (top 20)": """
+        SELECT c.sku_id, h.unit_price, c.unit_price FROM competitior_information c
+        JOIN historical_data h ON h.sku_id = c.sku_id
+         AND h.date = (SELECT MAX(date) FROM historical_data WHERE sku_id = c.sku_id)
+        WHERE c.category = 'kids' AND c.product_name = 'Jeans' ORDER BY h.unit_price - c.unit_price DESC LIMIT 20""",
+    "forecast for one month": "SELECT sku_id, units_sale FROM forecast_data WHERE date = '2025-09-01' ORDER BY units_sale DESC LIMIT 20",
+    "stock for a category and product": "SELECT sku_id, stock FROM inventory_data WHERE category = 'women' AND product_name = 'Kurtas'",
+    "forecast vs stock for one SKU": """
+        SELECT f.date, f.units_sale, i.stock FROM forecast_data f JOIN inventory_data i ON i.sku_id = f.sku_id
+        WHERE f.sku_id = 777""",
+}
+
+
+def time_queries(path: str, repeat: int, tuned: bool) -> dict:
+    conn = sqlite3.connect(path)
+    if tuned:
+        conn.execute("PRAGMA query_only = ON")
+        conn.execute(f"PRAGMA mmap_size = {256 * 1024 * 1024}")
+        conn.execute("PRAGMA cache_size = -65536")
+        conn.execute("PRAGMA temp_store = MEMORY")
+    timings = {}
+    for name, query in QUERIES.items():
+        conn.execute(query).fetchall()  # warm the page cache
+        started = time.perf_counter()
+        for _ in range(repeat):
+            conn.execute(query).fetchall()
+        timings[name] = (time.perf_counter() - started) / repeat * 1000
+    conn.close()
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time agent queries on an untuned and a tuned database.")
+    parser.add_argument("--skus", type=int, default=100000, help="number of SKUs (27 history rows each)")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per query")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    try:
+        before = os.path.join(workdir, "before.db")
+        after = os.path.join(workdir, "after.db")
+        generate_database(before, args.skus, "2023-06-01", "2025-08-01", 6, 42, tune=False)
+        shutil.copy(before, after)
+        started = time.perf_counter()
+        tune_database(after)
+        print(f"{args.skus} SKUs, tuning took {time.perf_counter() - started:.1f}s\n")
+
+        untuned = time_queries(before, args.repeat, tuned=False)
+        tuned = time_queries(after, args.repeat, tuned=True)
+        print(f"{'query':40} {'before ms':>10} {'after ms':>10} {'speedup':>8}")
+        for name in QUERIES:
+            print(f"{name:40} {untuned[name]:10.2f} {tuned[name]:10.2f} {untuned[name] / tuned[name]:7.0f}x")
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
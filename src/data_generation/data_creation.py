@@ -153,6 +153,9 @@ print(current_product_information)
 
 import sqlite3
 
+from forecasting import update_forecasts
+from storage import tune_database
+
 # Example list of dataframes with names
 dataframes = {
     "historical_data": historical_data,
@@ -170,9 +173,17 @@ for table_name, df in dataframes.items():
     df.to_sql(table_name, conn, if_exists="replace", index=False)
     print(f"Saved {table_name} to SQLite")
 
+# Replace the historical-average forecast with the per-SKU seasonal regressions of forecasting.py
+update_forecasts(conn, months=forecast_data['date'].nunique())
+print("Fitted forecast_data")
+
 # Close connection
 conn.close()
 
+# Index the join and filter keys, switch to WAL and analyze, as the API expects
+tune_database("retail_price_agent.db")
+print("Tuned retail_price_agent.db")
+
 # Save the datsets to SQLite so that later Text2SQL agent can use it
 
 db = sqlite3.connect("retail_price_agent.db")
@@ -0,0 +1,262 @@
+"""
+Seasonal, promotion-aware sales forecasts for every SKU.
+
+Fits one ridge regression per SKU of log units sold on an intercept, 11 month-of-year
+dummies, a discount flag and log unit price, which is the shape of the generator's
+demand curve (units = k / price * seasonality * 1.2 on discount). All SKUs are fitted
+at once: the per-SKU normal equations X'X and X'y are accumulated with batched array
+operations over chunks of historical_data and solved with one batched linear solve.
+
+X'X and X'y are sufficient statistics, so they are kept in a state file next to the
+database together with the last month folded in. A later run only reads the months
+appended since, adds them to the statistics and re-solves, instead of refitting from
+scratch. forecast_data is then rewritten in bulk for the months after the latest
+history, assuming each SKU's average price and promotion frequency.
+
+Usage:
+    python forecasting.py retail_price_agent_v1.db [--months 6] [--rebuild]
+"""
+
+import argparse
+import os
+import sqlite3
+import time
+from typing import Dict, Optional
+
+import numpy as np
+
+N_FEATURES = 14  # intercept, 11 month dummies (February to December), discount flag, log price
+DISCOUNT = 12
+LOG_PRICE = 13
+DENSE = np.array([0, DISCOUNT, LOG_PRICE])
+# X'X is symmetric, so only its upper triangle is saved
+UPPER = np.triu_indices(N_FEATURES)
+
+
+def month_features(month_of_year: np.ndarray) -> np.ndarray:
+    """Return the intercept and month-of-year dummy columns (rows x 12) for months 1 to 12."""
+    features = np.zeros((len(month_of_year), 12))
+    features[:, 0] = 1.0
+    rows = np.flatnonzero(month_of_year > 1)
+    features[rows, month_of_year[rows] - 1] = 1.0
+    return features
+
+
+def empty_state() -> Dict[str, np.ndarray]:
+    return {
+        "sku_id": np.zeros(0, dtype=np.int64),
+        "xtx": np.zeros((0, N_FEATURES, N_FEATURES)),
+        "xty": np.zeros((0, N_FEATURES)),
+        "last_date": np.array(""),
+    }
+
+
+def load_state(path: str) -> Dict[str, np.ndarray]:
+    """Read the normal equations saved by an earlier run, or start empty."""
+    if not os.path.exists(path):
+        return empty_state()
+    with np.load(path) as saved:
+        state = {name: saved[name] for name in saved.files}
+    packed = state.pop("xtx_upper")
+    state["xtx"] = np.zeros((len(packed), N_FEATURES, N_FEATURES))
+    state["xtx"][:, UPPER[0], UPPER[1]] = packed
+    state["xtx"][:, UPPER[1], UPPER[0]] = packed
+    return state
+
+
+def save_state(path: str, state: Dict[str, np.ndarray]) -> None:
+    # Write to a temporary file first so an interrupted run never leaves a truncated state
+    temporary = path + ".tmp.npz"
+    saved = {name: values for name, values in state.items() if name != "xtx"}
+    np.savez(temporary, xtx_upper=state["xtx"][:, UPPER[0], UPPER[1]], **saved)
+    os.replace(temporary, path)
+
+
+def accumulate(
+    state: Dict[str, np.ndarray],
+    sku_id: np.ndarray,
+    month_of_year: np.ndarray,
+    discounted: np.ndarray,
+    price: np.ndarray,
+    target: np.ndarray,
+) -> Dict[str, np.ndarray]:
+    """
+    Add a batch of observations to the per-SKU normal equations.
+
+    The month dummies are one-hot, so instead of summing a 14 x 14 outer product per
+    row, X'X and X'y are assembled from per-(SKU, month) sums of the three dense
+    features (intercept, discount flag, log price), computed with bincount.
+
+    Args:
+        state (dict): sku_id, xtx and xty arrays, sku_id sorted
+        sku_id (np.ndarray): SKU of every observation
+        month_of_year (np.ndarray): Month of year of every observation, 1 to 12
+        discounted (np.ndarray): 1 where a discount was applied, 0 otherwise
+        price (np.ndarray): Unit price
+        target (np.ndarray): log units sold
+
+    Returns:
+        dict: The state with the new SKUs added and the batch folded in
+    """
+    batch_skus, inverse = np.unique(sku_id, return_inverse=True)
+    new_skus = np.setdiff1d(batch_skus, state["sku_id"], assume_unique=True)
+    if len(new_skus):
+        all_skus = np.concatenate([state["sku_id"], new_skus])
+        order = np.argsort(all_skus, kind="stable")
+        state = dict(state)
+        state["sku_id"] = all_skus[order]
+        state["xtx"] = np.concatenate([state["xtx"], np.zeros((len(new_skus), N_FEATURES, N_FEATURES))])[order]
+        state["xty"] = np.concatenate([state["xty"], np.zeros((len(new_skus), N_FEATURES))])[order]
+
+    n_skus = len(batch_skus)
+    cell = inverse * 12 + month_of_year - 1
+    dense = np.column_stack([np.ones(len(cell)), discounted, np.log(np.maximum(price, 1e-6))])
+
+    def cell_sums(weights: np.ndarray) -> np.ndarray:
+        return np.bincount(cell, weights=weights, minlength=n_skus * 12).reshape(n_skus, 12)
+
+    # Sums per (SKU, month) of each dense feature, of each product of two, and of each times the target
+    by_month = np.stack([cell_sums(dense[:, i]) for i in range(3)], axis=-1)
+    by_month_pairs = np.stack(
+        [np.stack([cell_sums(dense[:, i] * dense[:, j]) for j in range(3)], axis=-1) for i in range(3)], axis=-2
+    )
+    by_month_target = np.stack([cell_sums(dense[:, i] * target) for i in range(3)], axis=-1)
+
+    xtx = np.zeros((n_skus, N_FEATURES, N_FEATURES))
+    xty = np.zeros((n_skus, N_FEATURES))
+    months = np.arange(1, 12)
+    xtx[:, DENSE[:, None], DENSE] = by_month_pairs.sum(axis=1)
+    xtx[:, months[:, None], DENSE] = by_month[:, 1:]
+    xtx[:, DENSE[:, None], months] = by_month[:, 1:].transpose(0, 2, 1)
+    xtx[:, months, months] = by_month[:, 1:, 0]
+    xty[:, DENSE] = by_month_target.sum(axis=1)
+    xty[:, 1:12] = by_month_target[:, 1:, 0]
+
+    index = np.searchsorted(state["sku_id"], batch_skus)
+    state["xtx"][index] += xtx
+    state["xty"][index] += xty
+    return state
+
+
+def solve(xtx: np.ndarray, xty: np.ndarray, ridge: float) -> np.ndarray:
+    """Solve all SKUs' ridge regressions at once; the intercept is not penalized."""
+    penalty = np.full(N_FEATURES, ridge)
+    penalty[0] = 1e-9
+    return np.linalg.solve(xtx + np.diag(penalty), xty[:, :, None])[:, :, 0]
+
+
+def predict(state: Dict[str, np.ndarray], coefficients: np.ndarray, months: np.ndarray) -> np.ndarray:
+    """
+    Forecast units for every SKU and month at the SKU's average price and promotion frequency.
+
+    The averages come from the intercept row of X'X, which holds the feature sums.
+
+    Returns:
+        np.ndarray: (SKUs x months) forecast units
+    """
+    totals = state["xtx"][:, 0, :]
+    observations = np.maximum(totals[:, 0], 1.0)
+    month_of_year = months.astype("datetime64[M]").astype(int) % 12 + 1
+    log_units = coefficients[:, :12] @ month_features(month_of_year).T
+    log_units += (coefficients[:, DISCOUNT] * totals[:, DISCOUNT] / observations)[:, None]
+    log_units += (coefficients[:, LOG_PRICE] * totals[:, LOG_PRICE] / observations)[:, None]
+    return np.maximum(np.round(np.expm1(log_units)), 0.0)
+
+
+def update_forecasts(
+    conn: sqlite3.Connection,
+    state_path: Optional[str] = None,
+    months: int = 6,
+    rebuild: bool = False,
+    ridge: float = 1.0,
+    chunk_rows: int = 200000,
+) -> int:
+    """
+    Fold the months appended to historical_data into the models and rewrite forecast_data.
+
+    Args:
+        conn (sqlite3.Connection): Writable connection to the retail database
+        state_path (str): File keeping the normal equations between runs, None to refit from scratch
+        months (int): Number of months forecast after the latest history
+        rebuild (bool): Discard the saved state and refit on all of historical_data
+        ridge (float): Ridge penalty of the month, discount and price coefficients
+        chunk_rows (int): historical_data rows read and folded in at a time
+
+    Returns:
+        int: Number of historical_data rows folded in
+    """
+    state = empty_state() if rebuild or state_path is None else load_state(state_path)
+    watermark = str(state["last_date"])
+    last_date = conn.execute(
+        "SELECT MAX(date) FROM historical_data WHERE date > :watermark", {"watermark": watermark}
+    ).fetchone()[0] or watermark
+    cursor = conn.execute(
+        "SELECT sku_id, CAST(substr(date, 6, 2) AS INTEGER), discount_pct, unit_price, units_sold "
+        "FROM historical_data WHERE date > :watermark AND date <= :last_date",
+        {"watermark": watermark, "last_date": last_date},
+    )
+    new_rows = 0
+    while True:
+        rows = cursor.fetchmany(chunk_rows)
+        if not rows:
+            break
+        sku_id, month_of_year, discount_pct, price, units = zip(*rows)
+        state = accumulate(
+            state,
+            np.array(sku_id, dtype=np.int64),
+            np.array(month_of_year, dtype=np.int64),
+            (np.array(discount_pct, dtype=float) > 0).astype(float),
+            np.array(price, dtype=float),
+            np.log1p(np.maximum(np.array(units, dtype=float), 0.0)),
+        )
+        new_rows += len(rows)
+    state["last_date"] = np.array(last_date)
+    if state_path is not None and new_rows:
+        save_state(state_path, state)
+    if not len(state["sku_id"]):
+        return new_rows
+
+    coefficients = solve(state["xtx"], state["xty"], ridge)
+    first_month = np.datetime64(last_date[:7], "M") + 1
+    future = np.arange(first_month, first_month + months).astype("datetime64[D]")
+    units = predict(state, coefficients, future)
+
+    names = dict((sku, (product, category)) for sku, product, category in conn.execute(
+        "SELECT sku_id, product_name, category FROM inventory_data"
+    ))
+    keep = np.array([int(sku) in names for sku in state["sku_id"]], dtype=bool)
+    skus = state["sku_id"][keep].tolist()
+    # Written in historical_data's date format, e.g. with the " 00:00:00" pandas adds
+    future_dates = [month + last_date[10:] for month in future.astype(str).tolist()]
+    forecast_rows = [
+        (sku, names[sku][0], names[sku][1], month, units_sale)
+        for sku, sku_units in zip(skus, units[keep].tolist())
+        for month, units_sale in zip(future_dates, sku_units)
+    ]
+    with conn:
+        conn.execute("DELETE FROM forecast_data")
+        conn.executemany(
+            "INSERT INTO forecast_data (sku_id, product_name, category, date, units_sale) VALUES (?, ?, ?, ?, ?)",
+            forecast_rows,
+        )
+    return new_rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fit per-SKU seasonal forecasts and rewrite forecast_data.")
+    parser.add_argument("path", help="SQLite file to update")
+    parser.add_argument("--months", type=int, default=6, help="months forecast after the latest history")
+    parser.add_argument("--state", help="file keeping the fitted statistics (default: <path>.forecast.npz)")
+    parser.add_argument("--ridge", type=float, default=1.0, help="ridge penalty")
+    parser.add_argument("--rebuild", action="store_true", help="refit on all of historical_data")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    conn = sqlite3.connect(args.path)
+    rows = update_forecasts(conn, args.state or args.path + ".forecast.npz", args.months, args.rebuild, args.ridge)
+    conn.close()
+    print(f"Folded {rows} new rows of historical_data into the forecasts in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Incrementally maintained rollups of historical_data.
+
+Builds per-SKU (lifetime and yearly) and per-category (monthly and yearly) totals of
+units sold, revenue and profit. A watermark in rollup_state records the last month
+folded in, so each run only aggregates the months appended since and adds them to the
+existing totals with an upsert instead of rebuilding from scratch. Use --rebuild after
+changing months that were already rolled up.
+
+Usage:
+    python rollups.py retail_price_agent_v1.db [--rebuild]
+"""
+
+import argparse
+import sqlite3
+import time
+
+MEASURES = "units_sold, revenue, profit"
+
+ROLLUPS = {
+    "sku_summary": {
+        "ddl": """
+            CREATE TABLE IF NOT EXISTS sku_summary (
+                sku_id INTEGER PRIMARY KEY, product_name TEXT, category TEXT,
+                first_date DATE, last_date DATE, months INTEGER,
+                units_sold REAL, revenue REAL, profit REAL
+            )""",
+        "select": """
+            SELECT sku_id, product_name, category, MIN(date(date)), MAX(date(date)), COUNT(*),
+                   SUM(units_sold), SUM(revenue), SUM(profit)
+            FROM historical_data WHERE date > :watermark
+            GROUP BY sku_id, product_name, category""",
+        "conflict": "sku_id",
+        "update": """
+            first_date = MIN(first_date, excluded.first_date),
+            last_date = MAX(last_date, excluded.last_date),
+            months = months + excluded.months""",
+    },
+    "sku_yearly_summary": {
+        "ddl": """
+            CREATE TABLE IF NOT EXISTS sku_yearly_summary (
+                sku_id INTEGER, product_name TEXT, category TEXT, year INTEGER,
+                units_sold REAL, revenue REAL, profit REAL,
+                PRIMARY KEY (sku_id, year)
+            )""",
+        "select": """
+            SELECT sku_id, product_name, category, CAST(strftime('%Y', date) AS INTEGER),
+                   SUM(units_sold), SUM(revenue), SUM(profit)
+            FROM historical_data WHERE date > :watermark
+            GROUP BY sku_id, product_name, category, strftime('%Y', date)""",
+        "conflict": "sku_id, year",
+    },
+    "category_monthly_summary": {
+        "ddl": """
+            CREATE TABLE IF NOT EXISTS category_monthly_summary (
+                category TEXT, date DATE, sku_count INTEGER,
+                units_sold REAL, revenue REAL, profit REAL,
+                PRIMARY KEY (category, date)
+            )""",
+        "select": """
+            SELECT category, date(date), COUNT(DISTINCT sku_id),
+                   SUM(units_sold), SUM(revenue), SUM(profit)
+            FROM historical_data WHERE date > :watermark
+            GROUP BY category, date(date)""",
+        "conflict": "category, date",
+        "update": "sku_count = MAX(sku_count, excluded.sku_count)",
+    },
+    "category_yearly_summary": {
+        "ddl": """
+            CREATE TABLE IF NOT EXISTS category_yearly_summary (
+                category TEXT, year INTEGER,
+                units_sold REAL, revenue REAL, profit REAL,
+                PRIMARY KEY (category, year)
+            )""",
+        "select": """
+            SELECT category, CAST(strftime('%Y', date) AS INTEGER),
+                   SUM(units_sold), SUM(revenue), SUM(profit)
+            FROM historical_data WHERE date > :watermark
+            GROUP BY category, strftime('%Y', date)""",
+        "conflict": "category, year",
+    },
+}
+
+
+def update_rollups(conn: sqlite3.Connection, rebuild: bool = False) -> int:
+    """
+    Fold the months appended to historical_data since the last run into the rollups.
+
+    Args:
+        conn (sqlite3.Connection): Writable connection to the retail database
+        rebuild (bool): Drop the rollups and aggregate all of historical_data again
+
+    Returns:
+        int: Number of historical_data rows folded in
+    """
+    with conn:
+        if rebuild:
+            conn.execute("DROP TABLE IF EXISTS rollup_state")
+            for name in ROLLUPS:
+                conn.execute(f"DROP TABLE IF EXISTS {name}")
+        conn.execute("CREATE TABLE IF NOT EXISTS rollup_state (name TEXT PRIMARY KEY, last_date DATE)")
+        for rollup in ROLLUPS.values():
+            conn.execute(rollup["ddl"])
+
+        row = conn.execute("SELECT last_date FROM rollup_state WHERE name = 'historical_data'").fetchone()
+        watermark = row[0] if row else ""
+        new_rows, last_date = conn.execute(
+            "SELECT COUNT(*), MAX(date) FROM historical_data WHERE date > :watermark", {"watermark": watermark}
+        ).fetchone()
+        if not new_rows:
+            return 0
+
+        for name, rollup in ROLLUPS.items():
+            additive = ", ".join(f"{m} = {m} + excluded.{m}" for m in MEASURES.split(", "))
+            update = f"{rollup['update']}, {additive}" if "update" in rollup else additive
+            conn.execute(
+                f"INSERT INTO {name} {rollup['select']} ON CONFLICT({rollup['conflict']}) DO UPDATE SET {update}",
+                {"watermark": watermark},
+            )
+        conn.execute(
+            "INSERT INTO rollup_state (name, last_date) VALUES ('historical_data', :last_date) "
+            "ON CONFLICT(name) DO UPDATE SET last_date = excluded.last_date",
+            {"last_date": last_date},
+        )
+    return new_rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incrementally update the rollup tables of a retail database.")
+    parser.add_argument("path", help="SQLite file to update")
+    parser.add_argument("--rebuild", action="store_true", help="rebuild the rollups from scratch")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    conn = sqlite3.connect(args.path)
+    rows = update_rollups(conn, rebuild=args.rebuild)
+    conn.close()
+    print(f"Rolled up {rows} new rows of historical_data in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Storage tuning for the retail SQLite database.
+
+Adds indexes on the join and filter keys the agent uses (sku_id, date, category,
+product_name), switches the file to WAL mode so readers never block on a writer, and
+collects ANALYZE statistics so the query planner picks those indexes. Safe to run
+repeatedly and on databases produced by data_creation.py.
+
+Usage:
+    python storage.py retail_price_agent_v1.db
+"""
+
+import argparse
+import sqlite3
+import time
+
+# (table, index name, columns)
+INDEXES = [
+    ("historical_data", "idx_historical_sku_date", "sku_id, date"),
+    ("historical_data", "idx_historical_date", "date"),
+    ("historical_data", "idx_historical_category_date", "category, date"),
+    ("historical_data", "idx_historical_product_category", "product_name, category"),
+    ("forecast_data", "idx_forecast_sku_date", "sku_id, date"),
+    ("forecast_data", "idx_forecast_date", "date"),
+    ("inventory_data", "idx_inventory_sku", "sku_id"),
+    ("inventory_data", "idx_inventory_category_product", "category, product_name"),
+    ("competitior_information", "idx_competitor_sku", "sku_id"),
+    ("current_product_information", "idx_current_product_sku", "sku_id"),
+]
+
+
+def _is_rowid_alias(conn: sqlite3.Connection, table: str, column: str) -> bool:
+    """Return True if the column is the table's INTEGER PRIMARY KEY, which SQLite already keys the table on."""
+    primary_key = [row for row in conn.execute(f"PRAGMA table_info({table})") if row[5]]
+    return (
+        len(primary_key) == 1
+        and primary_key[0][1] == column
+        and primary_key[0][2].upper() == "INTEGER"
+    )
+
+
+def tune_database(path: str) -> None:
+    """
+    Index, switch to WAL and analyze a retail database in place.
+
+    Args:
+        path (str): Path of the SQLite file
+    """
+    conn = sqlite3.connect(path)
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    with conn:
+        for table, index, columns in INDEXES:
+            if table not in tables:
+                continue
+            if _is_rowid_alias(conn, table, columns):
+                # A copy of the rowid would only add write cost and file size
+                conn.execute(f"DROP INDEX IF EXISTS {index}")
+            else:
+                conn.execute(f"CREATE INDEX IF NOT EXISTS {index} ON {table} ({columns})")
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("ANALYZE")
+    conn.execute("PRAGMA optimize")
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index, switch to WAL and analyze a retail SQLite database.")
+    parser.add_argument("path", help="SQLite file to tune")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    tune_database(args.path)
+    print(f"Tuned {args.path} in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
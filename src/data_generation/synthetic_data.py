@@ -0,0 +1,242 @@
+"""
+Vectorized synthetic data generator for load testing the retail agent.
+
+Produces the same five tables as data_creation.py (historical_data, forecast_data,
+inventory_data, competitior_information, current_product_information) with the same
+formulas, but for any number of SKUs. Every column is computed for a whole chunk of
+SKUs at once with NumPy, and each chunk is written and released before the next one
+is generated, so memory stays bounded by --chunk-size rather than the catalog size.
+Dates are stored as ISO YYYY-MM-DD in DATE columns. Once the history is written,
+forecast_data is filled by the seasonal models of forecasting.py instead of the
+historical average, the rollup tables are built by rollups.py, and the file is indexed,
+switched to WAL and analyzed by storage.tune_database unless --no-tune is given.
+
+Usage:
+    python synthetic_data.py --skus 100000 --start 2023-06-01 --end 2025-08-01 \
+        --forecast-months 6 --seed 42 --output retail_price_agent_v1.db
+"""
+
+import argparse
+import os
+import sqlite3
+import time
+from typing import Dict, Iterator, List
+
+import numpy as np
+
+from forecasting import update_forecasts
+from rollups import update_rollups
+from storage import tune_database
+
+core_data = {'men': ['shirt','t-shirt','jacket','Jeans','Trackpants'],
+             'women':['Dress','Kurtas','Tops','t-shirt','Jeans','Trackpants'],
+             'kids':['shirt','t-shirt','jacket','Jeans','Trackpants','Dress','Kurtas','Tops']
+}
+
+PRODUCT_CATEGORY = [(product, category) for category, products in core_data.items() for product in products]
+
+PROMOTIONS = np.array(['NONE', '0.1', '0.2', 'BOGO', 'BTGO'])
+PROMOTION_PROBABILITIES = [0.2, 0.1, 0.1, 0.3, 0.3]
+PROMOTION_DISCOUNT = np.array([0.0, 0.1, 0.2, 0.5, 0.3])
+
+TABLES = {
+    "historical_data": """
+        CREATE TABLE historical_data (
+            sku_id INTEGER NOT NULL, product_name TEXT NOT NULL, category TEXT NOT NULL, date DATE NOT NULL,
+            unit_price REAL, unit_cost REAL, discount_pct REAL, seasonality_factor REAL,
+            units_sold REAL, revenue REAL, profit REAL
+        )""",
+    "current_product_information": """
+        CREATE TABLE current_product_information (
+            sku_id INTEGER PRIMARY KEY, base_price REAL, base_demand REAL, elasticity REAL, margin REAL
+        )""",
+    "forecast_data": """
+        CREATE TABLE forecast_data (
+            sku_id INTEGER NOT NULL, product_name TEXT NOT NULL, category TEXT NOT NULL, date DATE NOT NULL,
+            units_sale REAL
+        )""",
+    "inventory_data": """
+        CREATE TABLE inventory_data (
+            sku_id INTEGER PRIMARY KEY, product_name TEXT NOT NULL, category TEXT NOT NULL, stock REAL
+        )""",
+    "competitior_information": """
+        CREATE TABLE competitior_information (
+            sku_id INTEGER PRIMARY KEY, product_name TEXT NOT NULL, category TEXT NOT NULL,
+            unit_price REAL, promotion TEXT, discount_pct REAL
+        )""",
+}
+
+
+def month_starts(start: str, end: str) -> np.ndarray:
+    """Return the first day of every month from start to end, inclusive."""
+    return np.arange(np.datetime64(start, "M"), np.datetime64(end, "M") + 1).astype("datetime64[D]")
+
+
+def seasonality(months: np.ndarray) -> np.ndarray:
+    """Seasonality factor per month: festive Nov/Dec, summer Jun-Aug, low otherwise."""
+    month_of_year = months.astype("datetime64[M]").astype(int) % 12 + 1
+    return np.select([np.isin(month_of_year, [11, 12]), np.isin(month_of_year, [6, 7, 8])], [1.3, 1.1], 0.9)
+
+
+def catalog(first_sku: int, n_skus: int):
+    """Return sku ids, product names and categories for a contiguous range of SKUs."""
+    sku_ids = np.arange(first_sku, first_sku + n_skus)
+    combo = sku_ids % len(PRODUCT_CATEGORY)
+    variant = sku_ids // len(PRODUCT_CATEGORY)
+    products = [PRODUCT_CATEGORY[c][0] if v == 0 else f"{PRODUCT_CATEGORY[c][0]} v{v}" for c, v in zip(combo, variant)]
+    categories = [PRODUCT_CATEGORY[c][1] for c in combo]
+    return sku_ids, products, categories
+
+
+def generate_chunk(rng: np.random.Generator, first_sku: int, n_skus: int, history: np.ndarray) -> Dict[str, List[tuple]]:
+    """
+    Generate the rows of every table but forecast_data for one chunk of SKUs.
+
+    Args:
+        rng (np.random.Generator): Random generator, advanced by every call
+        first_sku (int): sku_id of the first SKU in the chunk
+        n_skus (int): Number of SKUs in the chunk
+        history (np.ndarray): Month starts of the historical period
+
+    Returns:
+        dict: Table name to a list of row tuples
+    """
+    sku_ids, products, categories = catalog(first_sku, n_skus)
+    n_months = len(history)
+
+    # Base price, demand and elasticity differ per SKU
+    base_price = rng.integers(100, 201, n_skus) * 10.0
+    base_demand = (rng.integers(100, 1001, n_skus) // 100) * 100.0
+    elasticity = -rng.integers(80, 121, n_skus) / 100
+    margin = np.round(-1.0 / elasticity, 2)
+    unit_cost = np.round(base_price / (1 + margin))
+
+    # Monthly price with random fluctuation and random promotions
+    price = base_price[:, None] + rng.integers(-10, 10, (n_skus, n_months))
+    discount_pct = rng.choice([0.0, 10.0, 20.0, 30.0], p=[0.5, 0.2, 0.2, 0.1], size=(n_skus, n_months))
+    price = np.round(price * (1 - discount_pct / 100))
+    season = np.broadcast_to(seasonality(history), (n_skus, n_months))
+
+    units_sold = np.round(100 * (500 / price) * season * np.where(discount_pct > 0, 1.2, 1.0))
+    revenue = np.round(price * units_sold)
+    profit = np.round((price - unit_cost[:, None]) * units_sold)
+
+    history_dates = history.astype(str)
+    sku_list = sku_ids.tolist()
+
+    historical_rows = list(zip(
+        np.repeat(sku_ids, n_months).tolist(),
+        np.repeat(products, n_months).tolist(),
+        np.repeat(categories, n_months).tolist(),
+        np.tile(history_dates, n_skus).tolist(),
+        price.ravel().tolist(),
+        np.repeat(unit_cost, n_months).tolist(),
+        discount_pct.ravel().tolist(),
+        season.ravel().tolist(),
+        units_sold.ravel().tolist(),
+        revenue.ravel().tolist(),
+        profit.ravel().tolist(),
+    ))
+
+    # 2 to 4 months of average sales in stock
+    average_units = np.round(units_sold.mean(axis=1))
+    stock = average_units * rng.integers(2, 5, n_skus)
+
+    # Competitor price around our average price, adjusted by its promotion
+    our_price = np.round(price.mean(axis=1))
+    competitor_price = np.round(our_price * rng.choice([0.8, 0.9, 1.1, 1.2], size=n_skus))
+    promotion = rng.choice(len(PROMOTIONS), p=PROMOTION_PROBABILITIES, size=n_skus)
+    competitor_discount = PROMOTION_DISCOUNT[promotion]
+    competitor_price = competitor_price * (1 - competitor_discount)
+
+    return {
+        "historical_data": historical_rows,
+        "current_product_information": list(zip(
+            sku_list, base_price.tolist(), base_demand.tolist(), elasticity.tolist(), margin.tolist()
+        )),
+        "inventory_data": list(zip(sku_list, products, categories, stock.tolist())),
+        "competitior_information": list(zip(
+            sku_list, products, categories, competitor_price.tolist(),
+            PROMOTIONS[promotion].tolist(), competitor_discount.tolist()
+        )),
+    }
+
+
+def chunks(n_skus: int, chunk_size: int) -> Iterator[tuple]:
+    for first_sku in range(0, n_skus, chunk_size):
+        yield first_sku, min(chunk_size, n_skus - first_sku)
+
+
+def generate_database(
+    output: str,
+    n_skus: int,
+    start: str,
+    end: str,
+    forecast_months: int,
+    seed: int,
+    chunk_size: int = 10000,
+    tune: bool = True,
+) -> None:
+    """
+    Write all five tables for n_skus SKUs into a new SQLite database.
+
+    Args:
+        output (str): Path of the SQLite file, replaced if it exists
+        n_skus (int): Number of SKUs in the catalog
+        start (str): First historical month, YYYY-MM-DD
+        end (str): Last historical month, YYYY-MM-DD
+        forecast_months (int): Number of months forecast after end
+        seed (int): Random seed, the same seed always produces the same data
+        chunk_size (int): Number of SKUs generated and written at a time
+        tune (bool): Index, switch to WAL and analyze the database once it is written
+    """
+    history = month_starts(start, end)
+    rng = np.random.default_rng(seed)
+
+    forecast_state = output + ".forecast.npz"
+    for path in (output, forecast_state):
+        if os.path.exists(path):
+            os.remove(path)
+    conn = sqlite3.connect(output)
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    for ddl in TABLES.values():
+        conn.execute(ddl)
+
+    for first_sku, size in chunks(n_skus, chunk_size):
+        rows = generate_chunk(rng, first_sku, size, history)
+        with conn:
+            for table_name, table_rows in rows.items():
+                if table_rows:
+                    placeholders = ", ".join("?" * len(table_rows[0]))
+                    conn.executemany(f"INSERT INTO {table_name} VALUES ({placeholders})", table_rows)
+        del rows
+    update_forecasts(conn, forecast_state, forecast_months)
+    update_rollups(conn)
+    conn.close()
+
+    if tune:
+        tune_database(output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic retail database of any catalog size.")
+    parser.add_argument("--skus", type=int, default=100000, help="number of SKUs to generate")
+    parser.add_argument("--start", default="2023-06-01", help="first historical month (YYYY-MM-DD)")
+    parser.add_argument("--end", default="2025-08-01", help="last historical month (YYYY-MM-DD)")
+    parser.add_argument("--forecast-months", type=int, default=6, help="months of forecast after --end")
+    parser.add_argument("--seed", type=int, default=42, help="random seed")
+    parser.add_argument("--chunk-size", type=int, default=10000, help="SKUs generated and written at a time")
+    parser.add_argument("--output", default="retail_price_agent_v1.db", help="SQLite file to create")
+    parser.add_argument("--no-tune", action="store_true", help="skip indexes, WAL and ANALYZE")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    generate_database(
+        args.output, args.skus, args.start, args.end, args.forecast_months, args.seed, args.chunk_size, not args.no_tune
+    )
+    print(f"Generated {args.skus} SKUs into {args.output} in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,40 +1,78 @@
+import json
 import gradio as gr
 import requests
-from typing import List, Tuple
+from typing import Iterator, List, Tuple
 
 # FastAPI endpoint URL
-API_URL = "http://localhost:8000/query"
+API_URL = "http://localhost:8000/query/stream"
 
-def process_question(message: str, history: List[Tuple[str, str]]) -> str:
+# How each tool call is shown while the agent works
+TOOL_LABELS = {
+    "sql_db_list_tables": "Listing tables",
+    "sql_db_schema": "Reading table schema",
+    "sql_db_query_checker": "Checking SQL",
+    "sql_db_query": "Running SQL",
+}
+
+def _describe_event(event: dict) -> str:
+    """Turn a tool event from the API into a one-line progress note."""
+    if event["type"] == "tool_call":
+        label = TOOL_LABELS.get(event["tool"], f"Calling {event['tool']}")
+        query = event.get("input", {}).get("query")
+        return f"{label}: `{query}`" if query else label
+    output = str(event.get("output", ""))
+    if event["tool"] != "sql_db_query" or output.startswith("Error"):
+        return f"{event['tool']} returned"
+    # A header line of column names, one line per row, then a "(Showing ...)" note if rows were left out
+    lines = [line for line in output.splitlines()[1:] if not line.startswith("(Showing ")]
+    return f"{event['tool']} returned {len(lines)} row{'' if len(lines) == 1 else 's'}"
+
+def process_question(message: str, history: List[Tuple[str, str]], request: gr.Request) -> Iterator[str]:
     """
-    Process the user's question by sending it to the FastAPI endpoint.
-    
+    Process the user's question by streaming it through the FastAPI endpoint.
+
     Args:
         message (str): The user's question
         history (list): Chat history
-    
-    Returns:
-        str: The agent's response
+        request (gr.Request): The browser request, used to keep one agent session per visitor
+
+    Yields:
+        str: The progress notes and the answer received so far
     """
+    steps = []
+    answer = ""
     try:
-        # Send POST request to FastAPI endpoint
-        response = requests.post(
+        # Send POST request to FastAPI endpoint and read events as they arrive
+        with requests.post(
             API_URL,
-            json={"question": message}
-        )
-        
-        # Raise an exception for bad status codes
-        response.raise_for_status()
-        
-        # Extract the response from the JSON
-        result = response.json()
-        return result["response"]
+            json={"question": message, "session_id": request.session_hash if request else None},
+            stream=True,
+        ) as response:
+            # Raise an exception for bad status codes
+            response.raise_for_status()
+
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data: "):
+                    continue
+                event = json.loads(line[len("data: "):])
+                if event["type"] in ("tool_call", "tool_result"):
+                    steps.append(_describe_event(event))
+                elif event["type"] == "token":
+                    answer += event["content"]
+                elif event["type"] == "answer":
+                    answer = event["content"]
+                elif event["type"] == "error":
+                    answer = f"Error: {event['detail']}"
+                else:
+                    continue
+                progress = "\n".join(f"- _{step}_" for step in steps)
+                yield f"{progress}\n\n{answer}" if progress else answer
     except requests.exceptions.ConnectionError:
-        return "Error: Could not connect to the API. Make sure the FastAPI server is running (uvicorn app.main:app --reload)"
+        yield "Error: Could not connect to the API. Make sure the FastAPI server is running (uvicorn app.main:app --reload)"
     except requests.exceptions.RequestException as e:
-        return f"Error communicating with API: {str(e)}"
+        yield f"Error communicating with API: {str(e)}"
     except Exception as e:
-        return f"Error: {str(e)}"
+        yield f"Error: {str(e)}"
 
 # Create the Gradio interface
 demo = gr.ChatInterface(
@@ -0,0 +1,31 @@
+import os
+import sys
+
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+sys.path.insert(0, os.path.join(HERE, "..", "data_generation"))
+sys.path.insert(0, os.path.join(HERE, "..", "benchmarks"))
+
+# Tests must not reach OpenAI or Langfuse
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ["LANGFUSE_TRACING_ENABLED"] = "false"
+
+
+@pytest.fixture(scope="session")
+def database_path(tmp_path_factory) -> str:
+    """A small synthetic database built by the data pipeline."""
+    from synthetic_data import generate_database
+
+    path = str(tmp_path_factory.mktemp("data") / "retail.db")
+    generate_database(path, 20, "2023-06-01", "2025-08-01", 6, 42)
+    return path
+
+
+@pytest.fixture
+def db(database_path, monkeypatch):
+    from app.utils.database import get_database
+
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{database_path}")
+    return get_database()
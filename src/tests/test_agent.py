@@ -0,0 +1,52 @@
+import asyncio
+import time
+
+from scripted_llm import ScriptedChatModel
+
+from app.core.agent import RetailAgent
+
+
+def test_locally_answered_turns_are_trimmed(db):
+    agent = RetailAgent(db, llm=ScriptedChatModel(trajectories={}), max_messages_per_thread=10)
+    agent._local_answer = lambda question, is_new_thread: (f"answer to {question}", "cache", None)
+    for i in range(30):
+        agent.get_response(f"question {i}", "thread")
+
+    messages = agent.agent.get_state({"configurable": {"thread_id": "thread"}}).values["messages"]
+    # The summary of the removed turns plus at most max_messages_per_thread messages
+    assert len(messages) <= 11
+    assert "question 0" in messages[0].content
+    assert messages[-1].content == "answer to question 29"
+
+
+def test_concurrent_questions_overlap(db):
+    latency = 0.2
+    llm = ScriptedChatModel(
+        trajectories={f"question {i}": [{"content": f"answer {i}"}] for i in range(8)}, latency_ms=latency * 1000
+    )
+    agent = RetailAgent(db, llm=llm, max_concurrency=8)
+
+    async def ask_all():
+        return await asyncio.gather(*(agent.aget_response(f"question {i}", f"thread {i}") for i in range(8)))
+
+    started = time.perf_counter()
+    answers = asyncio.run(ask_all())
+    elapsed = time.perf_counter() - started
+
+    assert answers == [f"answer {i}" for i in range(8)]
+    # Eight sequential calls would take 1.6 s; concurrent ones overlap their model latency
+    assert elapsed < 3 * latency
+
+
+def test_schema_snapshot_is_only_in_skip_discovery_prompts(db):
+    llm = ScriptedChatModel(trajectories={})
+    discovery = RetailAgent(db, llm=llm)
+    skipping = RetailAgent(db, llm=llm, skip_discovery=True)
+
+    assert discovery.schema_snapshot is None
+    assert "Live schema of the database" not in discovery._create_system_message()
+    assert "Live schema of the database" in skipping._create_system_message()
+    assert "CREATE TABLE historical_data" in skipping._create_system_message()
+    # Both prompts point the model at the summary tables
+    for agent in (discovery, skipping):
+        assert "sku_yearly_summary" in agent._create_system_message()
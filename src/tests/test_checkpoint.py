@@ -0,0 +1,101 @@
+import time
+
+from scripted_llm import ScriptedChatModel
+
+from app.core.agent import RetailAgent
+from app.core.checkpoint import BoundedMemorySaver
+
+
+def test_memory_saver_keeps_only_live_blobs(db):
+    saver = BoundedMemorySaver(max_threads=3, ttl_seconds=None, max_checkpoints_per_thread=2)
+    trajectories = {f"question {i}": [{"content": f"answer {i}"}] for i in range(4)}
+    agent = RetailAgent(db, llm=ScriptedChatModel(trajectories=trajectories), checkpointer=saver)
+    for thread in range(5):
+        for i in range(4):
+            assert agent.get_response(f"question {i}", f"thread {thread}") == f"answer {i}"
+
+    live = {"thread 2", "thread 3", "thread 4"}
+    assert set(saver.storage) == live
+    assert {key[0] for key in saver.blobs} == live
+    assert {key[0] for key in saver.writes} <= live
+    for thread in live:
+        checkpoints = saver.storage[thread][""]
+        assert len(checkpoints) == 2
+        referenced = set()
+        for saved_checkpoint, _, _ in checkpoints.values():
+            referenced.update(saver.serde.loads_typed(saved_checkpoint)["channel_versions"].items())
+        assert {(key[2], key[3]) for key in saver.blobs if key[0] == thread} == referenced
+        messages = agent.agent.get_state({"configurable": {"thread_id": thread}}).values["messages"]
+        assert messages[-1].content == "answer 3"
+
+
+def _sqlite_saver(path, **kwargs):
+    from app.core.checkpoint import SQLiteCheckpointSaver
+
+    kwargs.setdefault("prune_interval_seconds", None)
+    return SQLiteCheckpointSaver(str(path), **kwargs)
+
+
+def _ask(saver, db, thread_id, questions):
+    trajectories = {question: [{"content": f"answer to {question}"}] for question in questions}
+    agent = RetailAgent(db, llm=ScriptedChatModel(trajectories=trajectories), checkpointer=saver)
+    for question in questions:
+        assert agent.get_response(question, thread_id) == f"answer to {question}"
+    return agent
+
+
+def _threads(saver):
+    with saver.cursor(transaction=False) as cur:
+        return {row[0] for row in cur.execute("SELECT thread_id FROM thread_access")}
+
+
+def test_sqlite_saver_keeps_the_latest_checkpoints(db, tmp_path):
+    saver = _sqlite_saver(tmp_path / "checkpoints.sqlite", max_checkpoints_per_thread=2)
+    agent = _ask(saver, db, "thread", [f"question {i}" for i in range(4)])
+    with saver.cursor(transaction=False) as cur:
+        assert cur.execute("SELECT COUNT(*) FROM checkpoints WHERE thread_id = 'thread'").fetchone()[0] == 2
+    assert saver.stats()["pruned_checkpoints"] > 0
+    messages = agent.agent.get_state({"configurable": {"thread_id": "thread"}}).values["messages"]
+    assert [message.content for message in messages[-2:]] == ["question 3", "answer to question 3"]
+    saver.close()
+
+
+def test_sqlite_saver_prunes_idle_and_least_recently_used_threads(db, tmp_path):
+    saver = _sqlite_saver(tmp_path / "checkpoints.sqlite", max_threads=2, ttl_seconds=60)
+    for thread in ("a", "b", "c", "d"):
+        _ask(saver, db, thread, ["question"])
+    with saver.cursor() as cur:
+        cur.execute("UPDATE thread_access SET last_access = last_access - 3600 WHERE thread_id = 'a'")
+
+    saver.prune()
+    assert _threads(saver) == {"c", "d"}
+    assert saver.evictions == {"ttl": 1, "lru": 1}
+    with saver.cursor(transaction=False) as cur:
+        assert {row[0] for row in cur.execute("SELECT DISTINCT thread_id FROM checkpoints")} == {"c", "d"}
+    saver.close()
+
+
+def test_sqlite_saver_prunes_in_the_background(db, tmp_path):
+    saver = _sqlite_saver(tmp_path / "checkpoints.sqlite", ttl_seconds=0.05, prune_interval_seconds=0.05)
+    _ask(saver, db, "thread", ["question"])
+    deadline = time.monotonic() + 5
+    while _threads(saver) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert not _threads(saver)
+    saver.close()
+    assert not saver._pruner.is_alive()
+
+
+def test_sqlite_savers_share_threads_through_the_file(db, tmp_path):
+    path = tmp_path / "checkpoints.sqlite"
+    first, second = _sqlite_saver(path), _sqlite_saver(path)
+    _ask(first, db, "thread", ["question 1"])
+    # A second worker continues the conversation the first one started
+    agent = _ask(second, db, "thread", ["question 2"])
+    messages = agent.agent.get_state({"configurable": {"thread_id": "thread"}}).values["messages"]
+    assert [message.content for message in messages] == [
+        "question 1", "answer to question 1", "question 2", "answer to question 2"
+    ]
+    assert first.stats()["live_threads"] == second.stats()["live_threads"] == 1
+    first.close()
+    second.close()
@@ -0,0 +1,31 @@
+import pytest
+
+from app.utils.database import canonicalize_sql, is_read_only_query
+
+
+def test_canonicalize_sql_ignores_formatting_outside_literals():
+    assert canonicalize_sql("SELECT  a , b FROM t -- note\n WHERE x = 1;") == canonicalize_sql("select a,b from t where x=1")
+
+
+def test_canonicalize_sql_keeps_literals():
+    assert canonicalize_sql("SELECT * FROM t WHERE name = 'a - b'") != canonicalize_sql("SELECT * FROM t WHERE name='a-b'")
+    assert canonicalize_sql("SELECT * FROM t WHERE name = 'x  y'") != canonicalize_sql("SELECT * FROM t WHERE name = 'x y'")
+    assert canonicalize_sql("SELECT * FROM t WHERE name = 'ABC'") != canonicalize_sql("SELECT * FROM t WHERE name = 'abc'")
+
+
+@pytest.mark.parametrize("query, read_only", [
+    ("SELECT * FROM historical_data WHERE product_name = 'a;b'", True),
+    ('SELECT "a;b" FROM t -- done; really', True),
+    ("SELECT 1;  ", True),
+    ("WITH x AS (SELECT 1) SELECT * FROM x", True),
+    ("SELECT 1; DROP TABLE historical_data", False),
+    ("SELECT ';'; DELETE FROM t", False),
+    ("DELETE FROM t WHERE name = 'select'", False),
+])
+def test_read_only_queries(query, read_only):
+    assert is_read_only_query(query) is read_only
+
+
+def test_semicolons_in_literals_go_through_the_guard(db):
+    db.run("SELECT product_name FROM historical_data WHERE product_name = 'a;b'")
+    assert db.result_cache.stats()["entries"] == 1
@@ -0,0 +1,93 @@
+import json
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from app.core.examples import ExampleStore, get_example_store, tokenize, verified_query
+
+QUERY = "SELECT category, SUM(revenue) FROM historical_data GROUP BY category"
+
+
+def turn(query_result: str, checked_query: str = QUERY, checker_valid: bool = True, query: str = QUERY):
+    return [
+        HumanMessage("Revenue by category?"),
+        AIMessage("", tool_calls=[{"id": "1", "name": "sql_db_query_checker", "args": {"query": checked_query}}]),
+        ToolMessage(json.dumps({"valid": checker_valid, "errors": []}), tool_call_id="1", name="sql_db_query_checker"),
+        AIMessage("", tool_calls=[{"id": "2", "name": "sql_db_query", "args": {"query": query}}]),
+        ToolMessage(query_result, tool_call_id="2", name="sql_db_query"),
+        AIMessage("Electronics leads."),
+    ]
+
+
+def test_tokenize_drops_stopwords_numbers_and_plurals():
+    assert tokenize("What are the top 5 products by revenue?") == ["top", "product", "revenue"]
+
+
+def test_checked_complete_results_are_verified():
+    result = "category|sum(revenue)\nElectronics|100\nToys|50"
+    assert verified_query(turn(result)) == QUERY
+    # The checked and the executed query only need to agree in canonical form
+    assert verified_query(turn(result, checked_query=QUERY.lower() + ";")) == QUERY
+
+
+@pytest.mark.parametrize("result", [
+    "",
+    "Error: (sqlite3.OperationalError) no such column: revenu",
+    "category|sum(revenue)\nElectronics|100\n(Showing 1 of 9 rows. Add a LIMIT or aggregate to see the rest.)",
+    "[(1, 2)]\n(Showing the first 200 rows; the query returned more.) Add a LIMIT or aggregate to see the rest.",
+    "category|sum(revenue)\nElectro\n(Result cut at 20000 characters.)",
+])
+def test_failed_or_truncated_results_are_not_verified(result):
+    assert verified_query(turn(result)) is None
+
+
+def test_unchecked_queries_are_not_verified():
+    result = "category|sum(revenue)\nElectronics|100"
+    assert verified_query(turn(result, checker_valid=False)) is None
+    assert verified_query(turn(result, checked_query="SELECT 1")) is None
+
+
+def test_unfinished_turns_are_not_verified():
+    messages = turn("category|sum(revenue)\nElectronics|100")[:-1]
+    assert verified_query(messages) is None
+
+
+def test_search_ranks_similar_questions_with_bm25():
+    store = ExampleStore()
+    store.add("Total revenue by category", QUERY)
+    store.add("Top products by profit margin", "SELECT sku_id FROM current_product_information ORDER BY margin DESC")
+    store.add("Stock left for each product", "SELECT sku_id, stock FROM inventory_data")
+
+    results = store.search("What was the revenue of each category last year?", k=2)
+    assert [question for question, _, _ in results] == ["Total revenue by category"]
+    assert results[0][1] == QUERY
+    # Too little of the question matches any example
+    assert store.search("forecast of units next month") == []
+
+
+def test_asking_again_replaces_the_sql():
+    store = ExampleStore()
+    store.add("Revenue by category", "SELECT 1")
+    assert store.add("revenue by category?", QUERY)
+    assert not store.add("Revenue by category", QUERY)
+    assert store.stats()["examples"] == 1
+    assert store.search("revenue by category")[0][1] == QUERY
+
+
+def test_workers_share_examples_through_the_file(tmp_path):
+    path = str(tmp_path / "examples.sqlite")
+    first, second = ExampleStore(path), ExampleStore(path, sync_interval_seconds=0)
+    first.add("Revenue by category", QUERY)
+    assert second.search("revenue per category")[0][1] == QUERY
+    first.close()
+    second.close()
+
+
+def test_examples_are_opt_in(monkeypatch, tmp_path):
+    monkeypatch.delenv("EXAMPLES_ENABLED", raising=False)
+    assert get_example_store() is None
+    monkeypatch.setenv("EXAMPLES_ENABLED", "true")
+    monkeypatch.setenv("EXAMPLES_PATH", str(tmp_path / "examples.sqlite"))
+    store = get_example_store()
+    assert isinstance(store, ExampleStore)
+    store.close()
@@ -0,0 +1,67 @@
+import sqlite3
+
+import numpy as np
+import pytest
+
+from forecasting import N_FEATURES, accumulate, empty_state, month_features, solve, update_forecasts
+
+
+def observations(seed=0, n_skus=5, rows_per_sku=40):
+    rng = np.random.default_rng(seed)
+    sku_id = np.repeat(np.array([7, 3, 11, 5, 9])[:n_skus], rows_per_sku)
+    month_of_year = rng.integers(1, 13, len(sku_id))
+    discounted = (rng.random(len(sku_id)) < 0.3).astype(float)
+    price = rng.uniform(500, 2000, len(sku_id))
+    target = rng.normal(4, 1, len(sku_id))
+    return sku_id, month_of_year, discounted, price, target
+
+
+def design(month_of_year, discounted, price):
+    return np.column_stack([month_features(month_of_year), discounted, np.log(price)])
+
+
+def test_batched_fit_matches_a_direct_solve_per_sku():
+    sku_id, month_of_year, discounted, price, target = observations()
+    state = accumulate(empty_state(), sku_id, month_of_year, discounted, price, target)
+    coefficients = solve(state["xtx"], state["xty"], ridge=1.0)
+
+    assert state["sku_id"].tolist() == sorted(set(sku_id.tolist()))
+    penalty = np.full(N_FEATURES, 1.0)
+    penalty[0] = 1e-9
+    for index, sku in enumerate(state["sku_id"]):
+        rows = sku_id == sku
+        x = design(month_of_year[rows], discounted[rows], price[rows])
+        np.testing.assert_allclose(state["xtx"][index], x.T @ x)
+        np.testing.assert_allclose(state["xty"][index], x.T @ target[rows])
+        expected = np.linalg.solve(x.T @ x + np.diag(penalty), x.T @ target[rows])
+        np.testing.assert_allclose(coefficients[index], expected, rtol=1e-8, atol=1e-10)
+
+
+def test_accumulating_in_batches_equals_one_batch():
+    data = observations()
+    whole = accumulate(empty_state(), *data)
+    split = empty_state()
+    for part in np.array_split(np.random.default_rng(1).permutation(len(data[0])), 3):
+        split = accumulate(split, *(column[part] for column in data))
+    np.testing.assert_array_equal(split["sku_id"], whole["sku_id"])
+    np.testing.assert_allclose(split["xtx"], whole["xtx"])
+    np.testing.assert_allclose(split["xty"], whole["xty"])
+
+
+def test_update_forecasts_rewrites_the_months_after_history(database_path, tmp_path):
+    path = tmp_path / "retail.db"
+    with sqlite3.connect(database_path) as source, sqlite3.connect(path) as target:
+        source.backup(target)
+    conn = sqlite3.connect(path)
+    state_path = str(tmp_path / "forecast.npz")
+    rows = conn.execute("SELECT COUNT(*) FROM historical_data").fetchone()[0]
+    assert update_forecasts(conn, state_path, months=3) == rows
+    months = [row[0] for row in conn.execute("SELECT DISTINCT date FROM forecast_data ORDER BY date")]
+    assert months == ["2025-09-01", "2025-10-01", "2025-11-01"]
+    skus = conn.execute("SELECT COUNT(DISTINCT sku_id) FROM forecast_data").fetchone()[0]
+    assert skus == conn.execute("SELECT COUNT(*) FROM inventory_data").fetchone()[0]
+    assert conn.execute("SELECT MIN(units_sale) FROM forecast_data").fetchone()[0] >= 0
+    # Nothing new to fold in on a second run, but the forecast is still written
+    assert update_forecasts(conn, state_path, months=3) == 0
+    assert conn.execute("SELECT COUNT(*) FROM forecast_data").fetchone()[0] == 3 * skus
+    conn.close()
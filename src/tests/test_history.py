@@ -0,0 +1,108 @@
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+
+from app.core.history import SUMMARY_HEADER, SUMMARY_ID, ConversationHistory, split_turns
+
+
+def make_turn(i, tool_output="x" * 50):
+    """A turn that discovers the schema, runs one query and answers."""
+    return [
+        HumanMessage(content=f"question {i}"),
+        AIMessage(content="", tool_calls=[{"name": "sql_db_schema", "args": {"table_names": "t"}, "id": f"schema-{i}"}]),
+        ToolMessage(content="CREATE TABLE t (a INTEGER)", tool_call_id=f"schema-{i}"),
+        AIMessage(content="", tool_calls=[{"name": "sql_db_query", "args": {"query": f"SELECT {i}"}, "id": f"query-{i}"}]),
+        ToolMessage(content=tool_output, tool_call_id=f"query-{i}"),
+        AIMessage(content=f"answer {i}"),
+    ]
+
+
+def test_split_turns_starts_a_turn_at_each_user_message():
+    messages = make_turn(0) + make_turn(1)
+    turns = split_turns(messages)
+    assert [len(turn) for turn in turns] == [6, 6]
+    assert turns[1][0].content == "question 1"
+
+
+def test_single_turn_is_passed_through():
+    history = ConversationHistory()
+    messages = make_turn(0)
+    assert history.model_input(messages) == messages
+
+
+def test_summarize_turn_keeps_question_answer_and_last_query():
+    line = ConversationHistory().summarize_turn(make_turn(3))
+    assert line == "- Q: question 3 | A: answer 3 | SQL: SELECT 3"
+
+
+def test_compact_turn_drops_stale_tools_and_cuts_results():
+    history = ConversationHistory(max_tool_chars=10)
+    compacted = history.compact_turn(make_turn(0, tool_output="y" * 30))
+
+    calls = [call["name"] for m in compacted if isinstance(m, AIMessage) for call in m.tool_calls]
+    assert calls == ["sql_db_query"]
+    tool_messages = [m for m in compacted if isinstance(m, ToolMessage)]
+    assert [m.tool_call_id for m in tool_messages] == ["query-0"]
+    assert tool_messages[0].content == "y" * 10 + "... [20 more characters]"
+
+
+def test_model_input_summarizes_turns_beyond_keep_turns():
+    history = ConversationHistory(keep_turns=2)
+    messages = [m for i in range(5) for m in make_turn(i)]
+    model_messages = history.model_input(messages)
+
+    summary = model_messages[0]
+    assert isinstance(summary, SystemMessage) and summary.id == SUMMARY_ID
+    assert summary.content.splitlines() == [
+        SUMMARY_HEADER,
+        "- Q: question 0 | A: answer 0 | SQL: SELECT 0",
+        "- Q: question 1 | A: answer 1 | SQL: SELECT 1",
+    ]
+    questions = [m.content for m in model_messages if isinstance(m, HumanMessage)]
+    assert questions == ["question 2", "question 3", "question 4"]
+    # The current turn is passed unchanged, earlier turns lose their schema calls
+    assert model_messages[-6:] == make_turn(4)
+    assert len(model_messages) == 1 + 2 * 4 + 6
+
+
+def test_model_input_moves_turns_over_the_token_budget_to_the_summary():
+    history = ConversationHistory(keep_turns=3, max_history_tokens=200, max_tool_chars=10000)
+    messages = [m for i in range(4) for m in make_turn(i, tool_output="z " * 300)]
+    model_messages = history.model_input(messages)
+
+    # About 170 tokens a turn, so only the last earlier turn fits next to the current one
+    questions = [m.content for m in model_messages if isinstance(m, HumanMessage)]
+    assert questions == ["question 2", "question 3"]
+    assert len(model_messages[0].content.splitlines()) == 1 + 2
+
+
+def test_summary_keeps_newest_lines_within_budget():
+    history = ConversationHistory(keep_turns=0, summary_tokens=30)
+    messages = [m for i in range(10) for m in make_turn(i)]
+    summary = history.model_input(messages)[0].content.splitlines()
+
+    assert summary[0] == SUMMARY_HEADER
+    assert 1 < len(summary) < 10
+    assert summary[-1] == "- Q: question 8 | A: answer 8 | SQL: SELECT 8"
+
+
+def test_trim_folds_removed_turns_into_the_stored_summary():
+    history = ConversationHistory()
+    messages = [m for i in range(4) for m in make_turn(i)]
+    assert history.trim(messages, max_messages=24) is None
+
+    trimmed = history.trim(messages, max_messages=13)
+    assert trimmed[0].id == SUMMARY_ID
+    assert trimmed[1:] == make_turn(2) + make_turn(3)
+
+    # A second trim keeps the lines of the first
+    trimmed = history.trim(trimmed + make_turn(4), max_messages=7)
+    assert trimmed[0].content.splitlines()[1:] == [
+        f"- Q: question {i} | A: answer {i} | SQL: SELECT {i}" for i in range(4)
+    ]
+    assert trimmed[1:] == make_turn(4)
+
+
+def test_trim_never_removes_the_current_turn():
+    history = ConversationHistory()
+    messages = make_turn(0) + make_turn(1)
+    trimmed = history.trim(messages, max_messages=2)
+    assert trimmed[1:] == make_turn(1)
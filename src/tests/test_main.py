@@ -0,0 +1,133 @@
+import asyncio
+import json
+
+import pytest
+from fastapi import HTTPException
+
+from app import main
+
+
+async def _cancelled_task() -> asyncio.Task:
+    task = asyncio.ensure_future(asyncio.sleep(10))
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    return task
+
+
+def test_ready_reports_a_cancelled_startup_as_503(monkeypatch):
+    async def check():
+        monkeypatch.setattr(main, "_services", await _cancelled_task())
+        monkeypatch.setattr(main, "_warm_up", None)
+        response = await main.readiness_check()
+        assert response.status_code == 503
+        assert json.loads(response.body)["status"] == "failed"
+
+        with pytest.raises(HTTPException) as error:
+            await main.get_services()
+        assert error.value.status_code == 503
+
+    asyncio.run(check())
+
+
+def test_ready_reports_a_cancelled_warm_up_as_503(monkeypatch):
+    async def check():
+        services = asyncio.get_running_loop().create_future()
+        services.set_result(object())
+        monkeypatch.setattr(main, "_services", services)
+        monkeypatch.setattr(main, "_warm_up", await _cancelled_task())
+        response = await main.readiness_check()
+        assert response.status_code == 503
+        assert "cancelled" in json.loads(response.body)["detail"]
+
+    asyncio.run(check())
+
+
+class _Services:
+    def __init__(self, retail_agent):
+        self.retail_agent = retail_agent
+
+
+@pytest.fixture
+def client_for(monkeypatch):
+    from fastapi.testclient import TestClient
+
+    def client(retail_agent):
+        main.app.dependency_overrides[main.get_services] = lambda: _Services(retail_agent)
+        return TestClient(main.app)
+
+    yield client
+    main.app.dependency_overrides.clear()
+
+
+class _SlowAgent:
+    """Answers after a delay and records how many questions were in flight at once."""
+
+    def __init__(self):
+        self.running = 0
+        self.most_running = 0
+
+    async def aget_response(self, question, session_id):
+        self.running += 1
+        self.most_running = max(self.most_running, self.running)
+        try:
+            await asyncio.sleep(0.05)
+            if question == "fail":
+                raise RuntimeError("model unavailable")
+            return f"answer to {question}"
+        finally:
+            self.running -= 1
+
+
+def test_batch_answers_every_question_within_its_concurrency(client_for):
+    agent = _SlowAgent()
+    questions = [f"question {i}" for i in range(6)] + ["fail"]
+    response = client_for(agent).post("/query/batch", json={"questions": questions, "max_concurrency": 3})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    results = sorted((json.loads(line) for line in response.text.splitlines()), key=lambda result: result["index"])
+    assert [result["question"] for result in results] == questions
+    assert [result["response"] for result in results[:6]] == [f"answer to question {i}" for i in range(6)]
+    assert results[6]["response"] is None and results[6]["error"] == "model unavailable"
+    assert all(result["latency_ms"] >= 50 for result in results)
+    assert 1 < agent.most_running <= 3
+
+
+def test_batch_needs_at_least_one_question(client_for):
+    assert client_for(_SlowAgent()).post("/query/batch", json={"questions": []}).status_code == 422
+
+
+def test_stream_sends_tool_progress_then_the_answer(client_for, db):
+    from scripted_llm import ScriptedChatModel
+
+    from app.core.agent import RetailAgent
+
+    query = "SELECT COUNT(*) AS skus FROM inventory_data"
+    llm = ScriptedChatModel(trajectories={"How many SKUs?": [
+        {"tool_calls": [{"name": "sql_db_query", "args": {"query": query}}]},
+        {"content": "There are 20 SKUs."},
+    ]})
+    agent = RetailAgent(db, llm=llm)
+    response = client_for(agent).post("/query/stream", json={"question": "How many SKUs?", "session_id": "s"})
+
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [json.loads(line[len("data: "):]) for line in response.text.split("\n\n") if line]
+    types = [event["type"] for event in events]
+    assert types[0] == "session" and events[0]["session_id"] == "s"
+    assert types.index("tool_call") < types.index("tool_result") < types.index("answer")
+    assert events[types.index("tool_call")]["tool"] == "sql_db_query"
+    assert "20" in events[types.index("tool_result")]["output"]
+    assert events[-1] == {"type": "answer", "content": "There are 20 SKUs."}
+
+
+def test_stream_reports_errors_as_events(client_for):
+    class FailingAgent:
+        async def astream_response(self, question, session_id):
+            raise RuntimeError("model unavailable")
+            yield
+
+    response = client_for(FailingAgent()).post("/query/stream", json={"question": "q"})
+    events = [json.loads(line[len("data: "):]) for line in response.text.split("\n\n") if line]
+    assert [event["type"] for event in events] == ["session", "error"]
+    assert events[1]["detail"] == "model unavailable"
@@ -0,0 +1,30 @@
+import pytest
+
+from app.utils.metrics import Counter, Gauge, Histogram, MetricsRegistry, _Metric
+
+
+def test_metric_without_samples_cannot_be_created():
+    class Incomplete(_Metric):
+        kind = "counter"
+
+    with pytest.raises(TypeError):
+        Incomplete("incomplete", "No samples")
+
+
+def test_registry_renders_the_exposition_format():
+    registry = MetricsRegistry()
+    counter = registry.register(Counter("requests_total", "Requests", ["status"]))
+    registry.register(Gauge("hit_rate", "Hit rate", lambda: {(): 0.5}))
+    histogram = registry.register(Histogram("latency_seconds", "Latency", buckets=(0.1, 1.0)))
+    counter.inc(status="ok")
+    counter.inc(2, status="ok")
+    histogram.observe(0.05)
+    histogram.observe(0.5)
+
+    text = registry.render()
+    assert "# TYPE requests_total counter" in text
+    assert 'requests_total{status="ok"} 3' in text
+    assert "hit_rate 0.5" in text
+    assert 'latency_seconds_bucket{le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{le="+Inf"} 2' in text
+    assert "latency_seconds_count 2" in text
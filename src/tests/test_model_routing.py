@@ -0,0 +1,108 @@
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from scripted_llm import ScriptedChatModel
+
+from app.core import model_routing
+from app.core.agent import RetailAgent
+from app.core.model_routing import LARGE, SMALL, RoutingChatModel, get_chat_model
+
+QUERY = "SELECT COUNT(*) FROM inventory_data"
+BAD_QUERY = "SELECT missing_column FROM inventory_data"
+
+
+def routing_model(small_steps, large_steps, **kwargs):
+    """A RoutingChatModel over two scripted models answering the question "question"."""
+    return RoutingChatModel(
+        small=ScriptedChatModel(trajectories={"question": small_steps}),
+        large=ScriptedChatModel(trajectories={"question": large_steps}),
+        **kwargs,
+    )
+
+
+def tool_result(name, content):
+    return ToolMessage(content=content, name=name, tool_call_id="call")
+
+
+@pytest.mark.parametrize("messages, expected", [
+    ([HumanMessage(content="q")], (SMALL, "question")),
+    ([HumanMessage(content="q"), AIMessage(content=""), tool_result("sql_db_schema", "CREATE TABLE t")], (SMALL, "tool_step")),
+    ([HumanMessage(content="q"), AIMessage(content=""), tool_result("sql_db_query", "[(1,)]")], (LARGE, "synthesis")),
+    ([HumanMessage(content="q"), AIMessage(content=""), tool_result("optimize_prices", "{}")], (LARGE, "synthesis")),
+    # A failed query goes back to the small model to be rewritten
+    ([HumanMessage(content="q"), AIMessage(content=""), tool_result("sql_db_query", "Error: no such column")], (SMALL, "tool_step")),
+    ([
+        HumanMessage(content="q"),
+        AIMessage(content=""), tool_result("sql_db_query", "Error: no such column"),
+        AIMessage(content=""), tool_result("sql_db_query_checker", '{"valid": false, "errors": []}'),
+    ], (LARGE, "sql_errors")),
+])
+def test_choose_tier(messages, expected):
+    assert routing_model([], []).choose_tier(messages) == expected
+
+
+def test_errors_of_earlier_turns_do_not_escalate():
+    messages = [
+        HumanMessage(content="first"),
+        AIMessage(content=""), tool_result("sql_db_query", "Error: no such column"),
+        AIMessage(content=""), tool_result("sql_db_query", "Error: no such column"),
+        AIMessage(content="answer"),
+        HumanMessage(content="second"),
+    ]
+    assert routing_model([], []).choose_tier(messages) == (SMALL, "question")
+
+
+def test_small_synthesis_tier_keeps_answers_on_the_small_model():
+    model = routing_model([], [], synthesis_tier=SMALL)
+    messages = [HumanMessage(content="q"), AIMessage(content=""), tool_result("sql_db_query", "[(1,)]")]
+    assert model.choose_tier(messages) == (SMALL, "synthesis")
+
+
+def test_agent_writes_sql_with_small_and_answers_with_large_model(db):
+    query_step = {"tool_calls": [{"name": "sql_db_query", "args": {"query": QUERY}}]}
+    model = routing_model([query_step, {"content": "small answer"}], [query_step, {"content": "large answer"}])
+    agent = RetailAgent(db, llm=model, skip_discovery=True)
+
+    assert agent.get_response("question", "thread") == "large answer"
+    stats = model.stats()
+    assert stats["calls"] == {SMALL: 1, LARGE: 1}
+    assert stats["decisions"] == {"large:synthesis": 1, "small:question": 1}
+    assert stats["small_share"] == 0.5
+    assert stats["small_model"] == stats["large_model"] == "scripted"
+
+
+def test_agent_escalates_after_failed_queries(db):
+    bad_step = {"tool_calls": [{"name": "sql_db_query", "args": {"query": BAD_QUERY}}]}
+    steps = [bad_step, bad_step, {"content": "{tier} answer"}]
+    model = routing_model(
+        [{**step, "content": step.get("content", "").format(tier="small")} for step in steps],
+        [{**step, "content": step.get("content", "").format(tier="large")} for step in steps],
+    )
+    agent = RetailAgent(db, llm=model, skip_discovery=True)
+
+    assert agent.get_response("question", "thread") == "large answer"
+    assert model.stats()["decisions"] == {"large:sql_errors": 1, "small:question": 1, "small:tool_step": 1}
+
+
+def test_bind_tools_shares_the_call_statistics():
+    model = routing_model([], [])
+    bound = model.bind_tools([])
+    bound.invoke([HumanMessage(content="question")])
+    assert model.stats()["calls"] == {SMALL: 1, LARGE: 0}
+
+
+def test_get_chat_model_routes_only_with_a_small_model(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setenv("LARGE_MODEL_NAME", "large-model")
+    monkeypatch.delenv("SMALL_MODEL_NAME", raising=False)
+    assert model_routing._model_name(get_chat_model()) == "large-model"
+
+    monkeypatch.setenv("SMALL_MODEL_NAME", "small-model")
+    monkeypatch.setenv("MODEL_ESCALATE_AFTER_ERRORS", "3")
+    model = get_chat_model()
+    assert isinstance(model, RoutingChatModel)
+    assert (model.stats()["small_model"], model.stats()["large_model"]) == ("small-model", "large-model")
+    assert model.escalate_after_errors == 3
+
+    monkeypatch.setenv("MODEL_SYNTHESIS_TIER", "medium")
+    with pytest.raises(ValueError):
+        get_chat_model()
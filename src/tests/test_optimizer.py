@@ -0,0 +1,79 @@
+from datetime import date
+
+import numpy as np
+import pytest
+
+from app.core import optimizer as optimizer_module
+from app.core.optimizer import PriceOptimizer
+from app.core.pricing import PricingSimulator
+
+
+def solve(elasticity=-2.0, stock=np.inf, min_change=-0.3, max_change=0.3):
+    return PriceOptimizer.optimal_prices(
+        base_price=np.array([100.0]),
+        demand=np.array([10.0]),
+        elasticity=np.array([elasticity]),
+        unit_cost=np.array([60.0]),
+        stock=np.array([stock]),
+        min_change=min_change,
+        max_change=max_change,
+    )
+
+
+def test_unconstrained_optimum_matches_a_price_grid():
+    optimum = solve(max_change=1.0)
+    prices = np.linspace(70, 200, 13001)
+    profit = (prices - 60) * np.maximum(10 * (3 - 2 * prices / 100), 0)
+    assert optimum["price"][0] == pytest.approx(prices[profit.argmax()], abs=0.01)
+    assert not optimum["stock_limited"][0]
+
+
+def test_stock_raises_the_price_until_demand_fits():
+    optimum = solve(stock=5.0, max_change=1.0)
+    assert optimum["stock_limited"][0]
+    assert optimum["units"][0] == pytest.approx(5.0)
+
+
+def test_prices_stay_in_the_band():
+    assert solve(max_change=0.05)["price"][0] == pytest.approx(105.0)
+
+
+@pytest.mark.parametrize("elasticity", [0.0, 0.5, np.nan])
+def test_non_negative_elasticity_is_refused(elasticity):
+    with pytest.raises(ValueError, match="negative price elasticity"):
+        solve(elasticity=elasticity)
+
+
+def _today(year, month, day):
+    class Today(date):
+        @classmethod
+        def today(cls):
+            return date(year, month, day)
+    return Today
+
+
+def test_uses_next_months_forecast(db, monkeypatch):
+    # The test database forecasts September 2025 to February 2026
+    monkeypatch.setattr(optimizer_module, "date", _today(2025, 8, 20))
+    optimizer = PriceOptimizer(PricingSimulator(db))
+    month, skus, units = optimizer.next_month_forecast()
+    assert month == "2025-09-01"
+    assert len(skus) == len(units) > 0
+    assert "note" not in optimizer.optimize()
+
+
+def test_no_forecast_for_next_month_is_reported(db, monkeypatch):
+    monkeypatch.setattr(optimizer_module, "date", _today(2027, 1, 10))
+    optimizer = PriceOptimizer(PricingSimulator(db))
+    month, skus, _ = optimizer.next_month_forecast()
+    assert month is None and len(skus) == 0
+
+    result = optimizer.optimize()
+    assert result["forecast_month"] is None
+    assert "2027-02" in result["note"]
+    assert result["base"]["units"] > 0
+
+
+def test_empty_price_band_is_refused(db):
+    with pytest.raises(ValueError):
+        PriceOptimizer(PricingSimulator(db)).optimize(min_change=0.2, max_change=0.1)
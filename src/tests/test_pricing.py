@@ -0,0 +1,85 @@
+import json
+
+import numpy as np
+import pytest
+
+from app.core.pricing import PricingSimulator, create_price_simulation_tool
+
+
+@pytest.fixture
+def simulator(db):
+    return PricingSimulator(db)
+
+
+def test_grid_follows_the_linear_elasticity_model():
+    grid = PricingSimulator.simulate_grid(
+        base_price=np.array([100.0, 50.0]),
+        base_demand=np.array([10.0, 4.0]),
+        elasticity=np.array([-2.0, -1.0]),
+        unit_cost=np.array([60.0, 20.0]),
+        price_changes=[-0.1, 0.0, 0.6],
+    )
+    np.testing.assert_allclose(grid["price"][0], [90, 100, 160])
+    np.testing.assert_allclose(grid["demand"][0], [12, 10, 0])
+    np.testing.assert_allclose(grid["profit"][1], [25 * 4.4, 30 * 4, 60 * 1.6])
+    np.testing.assert_allclose(grid["profit_change"][:, 1], [0, 0])
+
+
+def test_simulate_totals_match_the_grid(simulator):
+    result = simulator.simulate([-0.1, 0.1], category="men", top_n=3)
+    selected = simulator.select(category="men")
+    grid = simulator.simulate_grid(
+        selected["base_price"], selected["base_demand"], selected["elasticity"], selected["unit_cost"], [-0.1, 0.1]
+    )
+    assert result["skus_simulated"] == len(selected["sku_id"]) > 0
+    assert [scenario["revenue"] for scenario in result["scenarios"]] == pytest.approx(
+        grid["revenue"].sum(axis=0).round(2).tolist()
+    )
+    assert len(result["skus"]) == min(3, result["skus_simulated"])
+
+
+def test_select_combines_filters(simulator):
+    everything = simulator.select()
+    first = int(everything["sku_id"][0])
+    selected = simulator.select(sku_ids=[first], category=everything["category"][0])
+    assert selected["sku_id"].tolist() == [first]
+    assert len(simulator.select(sku_ids=[first], category="no such category")["sku_id"]) == 0
+
+
+def test_empty_selection_returns_no_scenarios(simulator):
+    assert simulator.simulate([0.1], sku_ids=[-1]) == {"skus_simulated": 0, "scenarios": [], "skus": []}
+
+
+def test_tool_returns_the_simulation_as_json(simulator):
+    tool = create_price_simulation_tool(simulator)
+    result = json.loads(tool.invoke({"price_changes": [-0.1, 0.1], "category": "women", "top_n": 2}))
+    assert result == json.loads(json.dumps(simulator.simulate([-0.1, 0.1], category="women", top_n=2), default=str))
+    assert [scenario["price_change_pct"] for scenario in result["scenarios"]] == [-10.0, 10.0]
+
+
+def test_inputs_are_reloaded_when_the_data_changes(simulator, monkeypatch):
+    from app.core import pricing
+
+    first = simulator.load_inputs()
+    assert simulator.load_inputs() is first
+    monkeypatch.setattr(pricing, "get_data_version", lambda db: ("changed",))
+    assert simulator.load_inputs() is not first
+
+
+def test_simulate_endpoint(db):
+    from fastapi.testclient import TestClient
+
+    from app import main
+
+    class Services:
+        pricing = PricingSimulator(db)
+
+    main.app.dependency_overrides[main.get_services] = lambda: Services()
+    try:
+        response = TestClient(main.app).post("/pricing/simulate", json={"price_changes": [0.05], "sku_ids": [1, 2]})
+        invalid = TestClient(main.app).post("/pricing/simulate", json={"price_changes": []})
+    finally:
+        main.app.dependency_overrides.clear()
+    assert response.status_code == 200
+    assert response.json()["skus_simulated"] == 2
+    assert invalid.status_code == 422
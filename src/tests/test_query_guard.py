@@ -0,0 +1,60 @@
+import pytest
+
+from app.utils.query_guard import _AGGREGATION, QueryGuard, QueryRejected
+
+
+@pytest.mark.parametrize("query", ["select count(*) from t", "select count (*) from t", "select sum\n(revenue) from t"])
+def test_aggregates_are_recognised_with_any_spacing(query):
+    assert _AGGREGATION.search(query)
+
+
+def test_full_scans_of_large_tables_need_a_bound(db):
+    guard = QueryGuard(large_table_rows=10)
+    with db._engine.connect() as connection:
+        guard.check_plan(connection, "SELECT COUNT (*) FROM historical_data")
+        with pytest.raises(QueryRejected):
+            guard.check_plan(connection, "SELECT sku_id, revenue FROM historical_data")
+
+
+@pytest.mark.parametrize("query", [
+    "SELECT 'limit', sku_id FROM historical_data",
+    "SELECT sku_id, 'where' AS note FROM historical_data",
+    "SELECT h.* FROM historical_data h, (SELECT stock FROM inventory_data WHERE sku_id = 1) i",
+    "SELECT * FROM historical_data h JOIN (SELECT sku_id FROM inventory_data LIMIT 5) i ON i.sku_id > 0",
+    "WITH recent AS (SELECT * FROM historical_data WHERE date > '2025-01-01') SELECT * FROM historical_data",
+    "SELECT sku_id, (SELECT COUNT(*) FROM inventory_data) FROM historical_data",
+])
+def test_literals_and_subqueries_do_not_bound_the_outer_query(db, query):
+    guard = QueryGuard(large_table_rows=200)
+    with db._engine.connect() as connection, pytest.raises(QueryRejected):
+        guard.check_plan(connection, query)
+
+
+@pytest.mark.parametrize("query", [
+    "SELECT * FROM historical_data WHERE product_name = 'limit'",
+    "WITH recent AS (SELECT * FROM historical_data) SELECT * FROM recent LIMIT 5",
+    "SELECT sku_id, SUM(revenue) FROM historical_data GROUP BY sku_id",
+])
+def test_outer_filters_limits_and_aggregates_bound_the_query(db, query):
+    guard = QueryGuard(large_table_rows=200)
+    with db._engine.connect() as connection:
+        guard.check_plan(connection, query)
+
+
+class _PlanConnection:
+    """Connection stub returning a fixed query plan."""
+
+    def __init__(self, plan):
+        self.plan = plan
+
+    def execute(self, statement):
+        plan = self.plan
+        return type("Result", (), {"fetchall": lambda self: plan})()
+
+
+def test_older_sqlite_plan_text_is_read():
+    guard = QueryGuard(large_table_rows=10)
+    guard._row_counts = {"historical_data": 1000}
+    connection = _PlanConnection([(2, 0, 0, "SCAN TABLE historical_data")])
+    with pytest.raises(QueryRejected):
+        guard.check_plan(connection, "SELECT * FROM historical_data")
@@ -0,0 +1,76 @@
+import datetime
+import decimal
+
+import pytest
+
+from app.utils.result_format import ResultFormatter
+
+
+@pytest.mark.parametrize("value, expected", [
+    (12.0, "12"),
+    (1234.5678, "1234.57"),
+    (19.9, "19.9"),
+    (-3.004, "-3"),
+    (0.123456, "0.123"),
+    (-0.0004567, "-0.000457"),
+    (float("nan"), "nan"),
+    (decimal.Decimal("2.50"), "2.5"),
+])
+def test_numbers_are_rounded(value, expected):
+    assert ResultFormatter().cell(value, 100) == expected
+
+
+@pytest.mark.parametrize("value, expected", [
+    (None, ""),
+    (True, "True"),
+    (7, "7"),
+    ("2025-01-01 00:00:00", "2025-01-01"),
+    ("2025-01-01 12:30:00", "2025-01-01 12:30:00"),
+    (datetime.date(2025, 1, 1), "2025-01-01"),
+    ("a|b", "a\\|b"),
+    ("two\n  lines", "two lines"),
+    (b"\x00\x01", "<2 bytes>"),
+    ("x" * 20, "x" * 16 + "..."),
+])
+def test_cells(value, expected):
+    assert ResultFormatter().cell(value, 19) == expected
+
+
+def test_format_renders_a_header_and_one_line_per_row():
+    text, truncated = ResultFormatter().format(
+        ["sku_id", "date", "price"], [(1, "2025-01-01 00:00:00", 9.999), (2, "2025-02-01 00:00:00", None)]
+    )
+    assert text == "sku_id|date|price\n1|2025-01-01|10\n2|2025-02-01|"
+    assert not truncated
+
+
+def test_empty_result():
+    assert ResultFormatter().format(["a"], []) == ("", False)
+
+
+def test_rows_beyond_the_token_budget_are_left_out():
+    formatter = ResultFormatter(max_tokens=10)
+    rows = [(i, "name") for i in range(100, 120)]
+    text, truncated = formatter.format(["id", "name"], rows)
+
+    lines = text.splitlines()
+    assert truncated
+    assert len(text) - len(lines[-1]) <= 10 * 4
+    assert lines[-1] == f"(Showing {len(lines) - 2} of 20 rows. Add a LIMIT or aggregate to see the rest.)"
+
+
+def test_first_row_is_shown_even_over_the_budget():
+    text, truncated = ResultFormatter(max_tokens=1).format(["value"], [("x" * 50,), ("y",)])
+    assert text.splitlines()[1] == "x" * 50
+    assert truncated
+
+
+def test_rows_left_unfetched_are_reported():
+    text, truncated = ResultFormatter().format(["a"], [(1,), (2,)], more_rows=True)
+    assert truncated
+    assert text.endswith("(Showing 2 of more than 2 rows. Add a LIMIT or aggregate to see the rest.)")
+
+
+def test_max_string_length_can_be_overridden_per_call():
+    text, _ = ResultFormatter(max_string_length=100).format(["name"], [("abcdefghij",)], max_string_length=6)
+    assert text == "name\nabc..."
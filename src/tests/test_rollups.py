@@ -0,0 +1,65 @@
+import sqlite3
+
+import pytest
+
+from rollups import update_rollups
+
+DIRECT = {
+    "sku_summary": """
+        SELECT sku_id, product_name, category, MIN(date), MAX(date), COUNT(*), SUM(units_sold), SUM(revenue), SUM(profit)
+        FROM historical_data GROUP BY sku_id ORDER BY sku_id""",
+    "sku_yearly_summary": """
+        SELECT sku_id, product_name, category, CAST(strftime('%Y', date) AS INTEGER),
+               SUM(units_sold), SUM(revenue), SUM(profit)
+        FROM historical_data GROUP BY sku_id, strftime('%Y', date) ORDER BY 1, 4""",
+    "category_monthly_summary": """
+        SELECT category, date, COUNT(DISTINCT sku_id), SUM(units_sold), SUM(revenue), SUM(profit)
+        FROM historical_data GROUP BY category, date ORDER BY 1, 2""",
+    "category_yearly_summary": """
+        SELECT category, CAST(strftime('%Y', date) AS INTEGER), SUM(units_sold), SUM(revenue), SUM(profit)
+        FROM historical_data GROUP BY category, strftime('%Y', date) ORDER BY 1, 2""",
+}
+ORDER = {
+    "sku_summary": "1", "sku_yearly_summary": "1, 4", "category_monthly_summary": "1, 2", "category_yearly_summary": "1, 2"
+}
+
+
+@pytest.fixture
+def conn(database_path, tmp_path):
+    conn = sqlite3.connect(tmp_path / "retail.db")
+    with sqlite3.connect(database_path) as source:
+        source.backup(conn)
+    yield conn
+    conn.close()
+
+
+def rounded(rows):
+    return [tuple(round(value, 6) if isinstance(value, float) else value for value in row) for row in rows]
+
+
+def assert_rollups_match_history(conn):
+    for table, query in DIRECT.items():
+        rollup = conn.execute(f"SELECT * FROM {table} ORDER BY {ORDER[table]}").fetchall()
+        assert rounded(rollup) == rounded(conn.execute(query).fetchall()), table
+
+
+def test_rollups_match_a_direct_aggregation(conn):
+    update_rollups(conn, rebuild=True)
+    assert_rollups_match_history(conn)
+
+
+def test_appended_months_are_folded_in_incrementally(conn):
+    with conn:
+        conn.execute("CREATE TABLE later AS SELECT * FROM historical_data WHERE date > '2024-12-01'")
+        conn.execute("DELETE FROM historical_data WHERE date > '2024-12-01'")
+    update_rollups(conn, rebuild=True)
+    assert conn.execute("SELECT last_date FROM rollup_state").fetchone()[0] == "2024-12-01"
+
+    with conn:
+        conn.execute("INSERT INTO historical_data SELECT * FROM later")
+    appended = conn.execute("SELECT COUNT(*) FROM later").fetchone()[0]
+    assert update_rollups(conn) == appended
+    assert_rollups_match_history(conn)
+    # Nothing new, nothing folded in twice
+    assert update_rollups(conn) == 0
+    assert_rollups_match_history(conn)
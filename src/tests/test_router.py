@@ -0,0 +1,65 @@
+from datetime import date
+
+import pytest
+
+from app.core.router import QuestionRouter
+
+
+@pytest.fixture
+def router(db):
+    return QuestionRouter(db)
+
+
+def test_top_skus_by_total(router):
+    answer = router.route("Top 3 SKUs by profit in 2024")
+    assert answer.startswith("Top 3 SKUs by total profit (INR) in 2024:")
+
+
+@pytest.mark.parametrize("question", [
+    "Which product had the top sales growth in 2024?",
+    "Which products had the highest revenue increase?",
+    "Which products have the lowest revenue?",
+    "Top selling products compared to 2023",
+    "Top products by revenue vs last year",
+])
+def test_top_skus_leaves_changes_and_comparisons_to_the_agent(router, question):
+    assert router.route(question) is None
+
+
+def test_forecast_next_month(router, monkeypatch):
+    class August2025(date):
+        @classmethod
+        def today(cls):
+            return cls(2025, 8, 14)
+
+    monkeypatch.setattr("app.core.router.date", August2025)
+    assert router.route("What is the forecast for next month?").startswith("Sales forecast for 2025-09:")
+
+
+def test_forecast_without_next_month_goes_to_the_agent(router, monkeypatch):
+    class October2026(date):
+        @classmethod
+        def today(cls):
+            return cls(2026, 10, 18)
+
+    monkeypatch.setattr("app.core.router.date", October2026)
+    assert router.route("What is the forecast for next month?") is None
+
+
+def test_new_products_are_seen_after_the_data_changes(db, tmp_path):
+    import shutil
+    import sqlite3
+
+    from app.utils.database import RetailSQLDatabase
+    from sqlalchemy import create_engine
+
+    path = tmp_path / "retail.db"
+    shutil.copy(db._engine.url.database, path)
+    router = QuestionRouter(RetailSQLDatabase(create_engine(f"sqlite:///{path}")))
+    assert router.route("What is the stock of Sarees?") is None
+
+    with sqlite3.connect(path) as connection:
+        connection.execute(
+            "INSERT INTO inventory_data (sku_id, product_name, category, stock) VALUES (9999, 'Sarees', 'women', 42)"
+        )
+    assert "| 9999 | Sarees | women | 42 |" in router.route("What is the stock of Sarees?")
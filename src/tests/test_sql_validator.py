@@ -0,0 +1,41 @@
+import pytest
+
+from app.utils.sql_validator import SQLValidator
+
+
+@pytest.fixture
+def validator(db):
+    return SQLValidator(db)
+
+
+def test_valid_queries_pass(validator):
+    assert validator.validate("SELECT sku_id, SUM(revenue) FROM historical_data GROUP BY sku_id;")["valid"]
+
+
+def test_semicolons_in_literals_are_allowed(validator):
+    result = validator.validate("select * from historical_data where product_name='a;b'")
+    assert result == {"valid": True, "errors": []}
+
+
+@pytest.mark.parametrize("query", [
+    "SELECT 1; DROP TABLE historical_data",
+    "SELECT ';'; DELETE FROM historical_data",
+    "DELETE FROM historical_data",
+])
+def test_writes_and_stacked_statements_are_rejected(validator, query):
+    result = validator.validate(query)
+    assert not result["valid"]
+    assert result["errors"][0]["code"] == "not_read_only"
+
+
+def test_unknown_names_come_with_suggestions(validator):
+    table = validator.validate("SELECT * FROM historical_dat")["errors"][0]
+    assert table["code"] == "unknown_table"
+    assert table["suggestion"] == "Did you mean table historical_data?"
+    column = validator.validate("SELECT revenu FROM historical_data")["errors"][0]
+    assert column["code"] == "unknown_column"
+    assert column["suggestion"].startswith("Did you mean column revenue (in ")
+
+
+def test_empty_queries_are_rejected(validator):
+    assert validator.validate("  ")["errors"][0]["code"] == "empty_query"
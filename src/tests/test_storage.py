@@ -0,0 +1,22 @@
+import sqlite3
+
+from storage import tune_database
+
+
+def _indexes(path):
+    with sqlite3.connect(path) as connection:
+        return {row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+
+
+def test_sku_indexes_skip_integer_primary_keys(tmp_path):
+    path = str(tmp_path / "retail.db")
+    with sqlite3.connect(path) as connection:
+        connection.execute("CREATE TABLE inventory_data (sku_id INTEGER PRIMARY KEY, product_name TEXT, category TEXT, stock REAL)")
+        connection.execute("CREATE TABLE competitior_information (sku_id INT, product_name TEXT, unit_price REAL)")
+        connection.execute("CREATE INDEX idx_inventory_sku ON inventory_data (sku_id)")
+    tune_database(path)
+
+    indexes = _indexes(path)
+    assert "idx_inventory_sku" not in indexes
+    assert "idx_inventory_category_product" in indexes
+    assert "idx_competitor_sku" in indexes
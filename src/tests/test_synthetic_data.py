@@ -0,0 +1,59 @@
+import sqlite3
+
+import numpy as np
+
+from synthetic_data import generate_database, month_starts, seasonality
+
+
+def test_month_starts_and_seasonality():
+    months = month_starts("2024-10-01", "2025-01-01")
+    assert months.astype(str).tolist() == ["2024-10-01", "2024-11-01", "2024-12-01", "2025-01-01"]
+    assert seasonality(months).tolist() == [0.9, 1.3, 1.3, 0.9]
+
+
+def test_tables_follow_the_generator_formulas(database_path):
+    conn = sqlite3.connect(database_path)
+    assert conn.execute("SELECT COUNT(*) FROM historical_data").fetchone()[0] == 20 * 27
+    assert conn.execute("SELECT COUNT(*), COUNT(DISTINCT date) FROM forecast_data").fetchone() == (20 * 6, 6)
+    for table in ("current_product_information", "inventory_data", "competitior_information"):
+        assert conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] == 20
+
+    rows = np.array(conn.execute(
+        "SELECT unit_price, discount_pct, seasonality_factor, units_sold, revenue, profit, unit_cost FROM historical_data"
+    ).fetchall())
+    price, discount, season, units, revenue, profit, cost = rows.T
+    np.testing.assert_array_equal(units, np.round(100 * (500 / price) * season * np.where(discount > 0, 1.2, 1.0)))
+    np.testing.assert_array_equal(revenue, np.round(price * units))
+    np.testing.assert_array_equal(profit, np.round((price - cost) * units))
+    elasticity = np.array(conn.execute("SELECT elasticity FROM current_product_information").fetchall())
+    assert ((elasticity >= -1.2) & (elasticity <= -0.8)).all()
+    conn.close()
+
+
+def test_chunking_and_seed_do_not_change_the_data(tmp_path):
+    def table_rows(path):
+        conn = sqlite3.connect(path)
+        rows = {
+            table: conn.execute(f"SELECT * FROM {table} ORDER BY 1, 2, 3, 4").fetchall()
+            for table in ("historical_data", "current_product_information", "inventory_data", "competitior_information")
+        }
+        conn.close()
+        return rows
+
+    first, second = str(tmp_path / "a.db"), str(tmp_path / "b.db")
+    generate_database(first, 7, "2024-01-01", "2024-06-01", 2, 3, tune=False)
+    generate_database(second, 7, "2024-01-01", "2024-06-01", 2, 3, tune=False)
+    assert table_rows(first) == table_rows(second)
+    # Chunks are written one after another and cover every SKU once
+    chunked = str(tmp_path / "c.db")
+    generate_database(chunked, 7, "2024-01-01", "2024-06-01", 2, 3, chunk_size=3, tune=False)
+    skus = [row[0] for row in sqlite3.connect(chunked).execute("SELECT sku_id FROM inventory_data ORDER BY sku_id")]
+    assert skus == list(range(7))
+
+
+def test_tuned_databases_use_wal_and_indexes(database_path):
+    conn = sqlite3.connect(database_path)
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert "idx_historical_sku_date" in indexes
+    conn.close()
@@ -0,0 +1,111 @@
+import threading
+import time
+
+import pytest
+from langchain_core.callbacks import BaseCallbackHandler
+
+from app.utils import tracing
+from app.utils.tracing import Tracer, get_tracer
+
+
+class RecordingHandler(BaseCallbackHandler):
+    """Records the events it handles; blocks in them while `release` is unset."""
+
+    def __init__(self, release=None, fail=False):
+        self.events = []
+        self.release = release
+        self.fail = fail
+
+    def on_chain_start(self, serialized, inputs, **kwargs):
+        if self.release is not None:
+            self.release.wait(5)
+        if self.fail:
+            raise RuntimeError("export failed")
+        self.events.append(("on_chain_start", inputs))
+
+    def on_chain_end(self, outputs, **kwargs):
+        self.events.append(("on_chain_end", outputs))
+
+
+def test_disabled_tracer_returns_no_callbacks():
+    tracer = Tracer(None)
+    assert not tracer.enabled
+    assert tracer.callbacks() == []
+    assert tracer.stats()["skipped"] == 1
+
+
+def test_sample_rate_is_validated():
+    with pytest.raises(ValueError):
+        Tracer(RecordingHandler, sample_rate=1.5)
+
+
+def test_sampling(monkeypatch):
+    tracer = Tracer(RecordingHandler, sample_rate=0.5)
+    monkeypatch.setattr(tracing.random, "random", lambda: 0.7)
+    assert tracer.callbacks() == []
+    monkeypatch.setattr(tracing.random, "random", lambda: 0.2)
+    assert len(tracer.callbacks()) == 1
+    assert (tracer.sampled, tracer.skipped) == (1, 1)
+    tracer.shutdown()
+
+
+def test_events_reach_the_handler_in_order_off_the_calling_thread():
+    handler = RecordingHandler()
+    tracer = Tracer(lambda: handler)
+    [callback] = tracer.callbacks()
+
+    callback.on_chain_start({}, {"question": 1})
+    callback.on_chain_end({"answer": 2})
+    assert tracer.flush()
+    assert handler.events == [("on_chain_start", {"question": 1}), ("on_chain_end", {"answer": 2})]
+    tracer.shutdown()
+    assert tracer._worker is None
+
+
+def test_full_queue_drops_the_rest_of_the_trace():
+    release = threading.Event()
+    handler = RecordingHandler(release=release)
+    tracer = Tracer(lambda: handler, max_queue_size=1)
+    [callback] = tracer.callbacks()
+
+    callback.on_chain_start({}, {"question": 1})  # taken by the worker, which blocks in it
+    for _ in range(100):
+        if not tracer._queue.qsize():
+            break
+        time.sleep(0.01)
+    callback.on_chain_end({"answer": 1})  # fills the queue
+    callback.on_chain_end({"answer": 2})  # dropped, and so is everything after it
+    release.set()
+    callback.on_chain_end({"answer": 3})
+    assert tracer.flush()
+
+    assert handler.events == [("on_chain_start", {"question": 1}), ("on_chain_end", {"answer": 1})]
+    assert tracer.stats()["dropped_events"] == 2
+    tracer.shutdown()
+
+
+def test_handler_errors_are_counted_not_raised():
+    tracer = Tracer(lambda: RecordingHandler(fail=True))
+    [callback] = tracer.callbacks()
+    callback.on_chain_start({}, {})
+    callback.on_chain_end({})
+    assert tracer.flush()
+    assert tracer.stats()["failed_events"] == 1
+    tracer.shutdown()
+
+
+def test_handler_factory_errors_skip_the_question():
+    def factory():
+        raise RuntimeError("no backend")
+
+    tracer = Tracer(factory)
+    assert tracer.callbacks() == []
+    assert tracer.stats()["skipped"] == 1
+
+
+def test_get_tracer_is_off_without_keys(monkeypatch):
+    monkeypatch.delenv("LANGFUSE_PUBLIC_KEY", raising=False)
+    monkeypatch.setenv("TRACING_SAMPLE_RATE", "0.25")
+    tracer = get_tracer()
+    assert not tracer.enabled
+    assert tracer.sample_rate == 0.25